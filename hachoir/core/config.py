@@ -24,3 +24,19 @@ else:
 # Parser global options
 autofix = True            # Enable Autofix? see hachoir.field.GenericFieldSet
 check_padding_pattern = True   # Check padding fields pattern?
+
+# Map regular files in memory (see hachoir.stream.input.MmapInputStream)
+input_mmap = True
+
+# Input stream cache (see hachoir.stream.input.InputCache)
+input_cache_block_size = 1 << 16  # Size in bytes of a cached block
+input_cache_block_count = 64      # Max. number of cached blocks, 0: no cache
+
+# Max. size in bytes of the data of a non-seekable input kept in memory, older
+# data are written into a temporary file (see hachoir.stream.input.InputPipe)
+input_pipe_max_memory = 16 << 20
+
+# Interval in bytes between two checkpoints of the decompressor of a
+# compressed stream, used to seek backward (see
+# hachoir.field.sub_file.CompressedStream)
+compressed_checkpoint_interval = 4 << 20
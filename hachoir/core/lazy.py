@@ -0,0 +1,45 @@
+"""
+Lazy import of the names exported by a package.
+"""
+import importlib
+import sys
+
+
+def lazyModule(name, exports):
+    """
+    Create the __getattr__() and __dir__() functions of the package 'name'
+    (see PEP 562). 'exports' is a dictionary: exported name => submodule
+    name. The submodule is only imported when the name is read.
+
+    Submodules can also be read as attributes, they are imported on demand.
+
+    Usage in the __init__.py of a package:
+
+        __getattr__, __dir__ = lazyModule(__name__, {"ZipFile": "zip"})
+    """
+    def __getattr__(attr):
+        if attr.startswith("__"):
+            raise AttributeError("module %r has no attribute %r"
+                                 % (name, attr))
+        module = sys.modules[name]
+        submodule = exports.get(attr)
+        if submodule is not None:
+            submodule = importlib.import_module("%s.%s" % (name, submodule))
+            value = getattr(submodule, attr)
+        else:
+            fullname = "%s.%s" % (name, attr)
+            try:
+                value = importlib.import_module(fullname)
+            except ModuleNotFoundError as err:
+                if err.name != fullname:
+                    raise
+                raise AttributeError("module %r has no attribute %r"
+                                     % (name, attr)) from None
+        setattr(module, attr, value)
+        return value
+
+    def __dir__():
+        module = sys.modules[name]
+        return sorted(set(vars(module)) | set(exports))
+
+    return __getattr__, __dir__
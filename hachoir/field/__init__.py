@@ -30,7 +30,7 @@ from hachoir.field.seekable_field_set import SeekableFieldSet, RootSeekableField
 from hachoir.field.field_set import FieldSet  # noqa
 from hachoir.field.static_field_set import StaticFieldSet  # noqa
 from hachoir.field.parser import Parser  # noqa
-from hachoir.field.vector import GenericVector, UserVector  # noqa
+from hachoir.field.vector import GenericVector, UserVector, IntegerArray  # noqa
 
 # Complex types
 from hachoir.field.float import Float32, Float64, Float80  # noqa
@@ -25,6 +25,7 @@ class MatchError(FieldError):
 
 class BasicFieldSet(Field):
     _event_handler = None
+    _field_array_count = None
     is_field_set = True
     endian = None
 
@@ -44,7 +45,6 @@ class BasicFieldSet(Field):
         self._size = size
         self._description = description
         self.stream = stream
-        self._field_array_count = {}
 
         # Set endian
         if not self.endian:
@@ -69,7 +69,7 @@ class BasicFieldSet(Field):
                               (self.path, self._size))
 
     def reset(self):
-        self._field_array_count = {}
+        self._field_array_count = None
 
     def createValue(self):
         return None
@@ -116,6 +116,8 @@ class BasicFieldSet(Field):
 
     def setUniqueFieldName(self, field):
         key = field._name[:-2]
+        if self._field_array_count is None:
+            self._field_array_count = {}
         try:
             self._field_array_count[key] += 1
         except KeyError:
@@ -13,6 +13,9 @@ class RawBits(Field):
     """
     Unknown content with a size in bits.
     """
+    # __dict__ is only created if an attribute is added,
+    # ex: by textHandler()
+    __slots__ = ("__dict__",)
     static_size = staticmethod(lambda *args, **kw: args[1])
 
     def __init__(self, parent, name, size, description=None):
@@ -44,7 +47,7 @@ class Bits(RawBits):
     @see: L{Bit}
     @see: L{RawBits}
     """
-    pass
+    __slots__ = ()
 
 
 class Bit(RawBits):
@@ -53,6 +56,7 @@ class Bit(RawBits):
 
     @see: L{Bits}
     """
+    __slots__ = ()
     static_size = 1
 
     def __init__(self, parent, name, description=None):
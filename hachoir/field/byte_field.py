@@ -16,6 +16,7 @@ class RawBytes(Field):
 
     @see: L{Bytes}
     """
+    __slots__ = ("_display", "__dict__")
     static_size = staticmethod(lambda *args, **kw: args[1] * 8)
 
     def __init__(self, parent, name, length, description="Raw data"):
@@ -69,4 +70,4 @@ class Bytes(RawBytes):
 
     @see: L{RawBytes}
     """
-    pass
+    __slots__ = ()
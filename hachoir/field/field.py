@@ -34,6 +34,12 @@ class MissingField(KeyError, FieldError):
 
 
 class Field(Logger):
+    # Attributes common to all fields are stored in slots to reduce the
+    # memory footprint, value caches are only set when they are computed.
+    # Subclasses without __slots__ get a __dict__ as usual.
+    __slots__ = ("_parent", "_name", "_address", "_size", "_description",
+                 "__value", "__display", "__raw_display", "_sub_istream")
+
     static_size = None
     """(optional) Helper to compute field size.
 
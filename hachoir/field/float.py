@@ -10,6 +10,7 @@ assert struct.unpack(">d", b"\xc0\0\0\0\0\0\0\0")[0] == -2.0
 
 
 class FloatMantissa(Bits):
+    __slots__ = ()
 
     def createValue(self):
         value = Bits.createValue(self)
@@ -20,6 +21,7 @@ class FloatMantissa(Bits):
 
 
 class FloatExponent(Bits):
+    __slots__ = ("bias",)
 
     def __init__(self, parent, name, size):
         Bits.__init__(self, parent, name, size)
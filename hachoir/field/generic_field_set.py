@@ -42,9 +42,16 @@ class GenericFieldSet(BasicFieldSet):
     - write createFields() method using lines like:
          yield Class(self, "name", ...) ;
     - and maybe set endian and static_size class attributes.
+
+    If the size is stored in a header, override createSize() to read it
+    directly from the stream: the parent can then skip the field set
+    without running createFields().
     """
 
     _current_size = 0
+    _array_cache = None
+    max_resident_fields = None   # only used on the root, see Parser
+    _pinned = 0
 
     def __init__(self, parent, name, stream, description=None, size=None):
         """
@@ -64,10 +71,11 @@ class GenericFieldSet(BasicFieldSet):
         BasicFieldSet.__init__(self, parent, name, stream, description, size)
         self._fields = Dict()
         self._field_generator = self.createFields()
-        self._array_cache = {}
         self.__is_feeding = False
 
     def array(self, key):
+        if self._array_cache is None:
+            self._array_cache = {}
         try:
             return self._array_cache[key]
         except KeyError:
@@ -89,7 +97,7 @@ class GenericFieldSet(BasicFieldSet):
         self._fields = Dict()
         self._field_generator = self.createFields()
         self._current_size = 0
-        self._array_cache = {}
+        self._array_cache = None
 
     def __str__(self):
         return '<%s path=%s, current_size=%s, current length=%s>' % \
@@ -109,9 +117,24 @@ class GenericFieldSet(BasicFieldSet):
         return len(self._fields)
     current_length = property(_getCurrentLength)
 
+    def createSize(self):
+        """
+        Override in derived classes to compute the size in bits without
+        creating any field, for example using a length read with
+        self.stream.readBits(). Returns None if the size is unknown.
+        """
+        return None
+
     def _getSize(self):
         if self._size is None:
-            self._feedAll()
+            size = self.createSize()
+            if size is not None:
+                if size <= 0:
+                    raise ParserError("Invalid field set '%s' size: %s"
+                                      % (self.path, size))
+                self._size = size
+            else:
+                self._feedAll()
         return self._size
     size = property(
         _getSize, doc="Size in bits, may create all fields to get size")
@@ -197,9 +220,21 @@ class GenericFieldSet(BasicFieldSet):
             field._name += "[]"
             self.setUniqueFieldName(field)
             self._fields.append(field._name, field)
+        if self.root.max_resident_fields is not None:
+            self.root._fieldAdded(self)
         if ask_stop:
             raise StopIteration()
 
+    def _countResidentFields(self):
+        """
+        Number of fields in memory, including fields of sub-field sets.
+        """
+        count = len(self._fields)
+        for field in self._fields:
+            if field.is_field_set:
+                count += field._countResidentFields()
+        return count
+
     def _fixFieldSize(self, field, new_size):
         if new_size > 0:
             if field.is_field_set and 0 < field.size:
@@ -306,6 +341,8 @@ class GenericFieldSet(BasicFieldSet):
             else:
                 raise ParserError("Invalid parser \"%s\" size!" % self.path)
         self._field_generator = None
+        if self._parent and self.root.max_resident_fields is not None:
+            self.root._fieldSetDone(self)
         return new_field
 
     def _fixFeedError(self, exception):
@@ -377,6 +414,30 @@ class GenericFieldSet(BasicFieldSet):
         Create a generator to iterate on each field, may create new
         fields when needed
         """
+        if self.root.max_resident_fields is None:
+            return self._iterFields()
+        return self._iterPinnedFields()
+
+    def _pin(self, count):
+        """
+        Pin (count=1) or unpin (count=-1) the field set and its parents:
+        pinned field sets are not reset by the bounded memory mode of the
+        root (see Parser).
+        """
+        fieldset = self
+        while fieldset is not None:
+            fieldset._pinned += count
+            fieldset = fieldset._parent
+
+    def _iterPinnedFields(self):
+        # A field set can't be reset while it is iterated
+        self._pin(1)
+        try:
+            yield from self._iterFields()
+        finally:
+            self._pin(-1)
+
+    def _iterFields(self):
         try:
             done = 0
             while True:
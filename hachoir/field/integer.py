@@ -11,6 +11,7 @@ class GenericInteger(Bits):
     """
     Generic integer class used to generate other classes.
     """
+    __slots__ = ("signed",)
 
     def __init__(self, parent, name, signed, size, description=None):
         if not (8 <= size <= 16384):
@@ -27,6 +28,7 @@ class GenericInteger(Bits):
 def integerFactory(name, is_signed, size, doc):
     class Integer(GenericInteger):
         __doc__ = doc
+        __slots__ = ()
         static_size = size
 
         def __init__(self, parent, name, description=None):
@@ -34,6 +36,7 @@ def integerFactory(name, is_signed, size, doc):
                 self, parent, name, is_signed, size, description)
     cls = Integer
     cls.__name__ = name
+    cls.is_signed = is_signed
     return cls
 
 
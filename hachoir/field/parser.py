@@ -2,6 +2,8 @@ from hachoir.core.endian import BIG_ENDIAN, LITTLE_ENDIAN, MIDDLE_ENDIAN
 from hachoir.field import GenericFieldSet
 from hachoir.core.log import Logger
 import hachoir.core.config as config
+from collections import deque
+from weakref import ref as weakref_ref
 
 
 class Parser(GenericFieldSet):
@@ -11,7 +13,17 @@ class Parser(GenericFieldSet):
     - endian: Byte order (L{BIG_ENDIAN}, L{LITTLE_ENDIAN} or L{MIDDLE_ENDIAN}) of input data ;
     - stream: Data input stream (set in L{__init__()}) ;
     - size: Field set size will be size of input stream.
+
+    Bounded memory mode: if max_resident_fields is set, when more fields
+    are in memory, fully parsed field sets are reset (see
+    L{GenericFieldSet.reset()}), oldest first. Their fields are created
+    again from the stream if they are used later. Field sets being iterated
+    or fed, and their parents, are not reset. The limit is a number of
+    fields, not a memory size: the size of field values is not bounded.
     """
+    _resident_fields = 0
+    _done_fieldsets = None
+    _eviction_blocked = False
 
     def __init__(self, stream, description=None):
         """
@@ -49,3 +61,52 @@ class Parser(GenericFieldSet):
 
     # dummy definition to prevent hachoir-core from depending on hachoir-parser
     autofix = property(lambda self: config.autofix)
+
+    def _fieldAdded(self, fieldset):
+        self._resident_fields += 1
+        if self.max_resident_fields < self._resident_fields \
+                and not self._eviction_blocked:
+            self._evictFieldSets(fieldset)
+
+    def _fieldSetDone(self, fieldset):
+        if self._done_fieldsets is None:
+            self._done_fieldsets = deque()
+        self._done_fieldsets.append(weakref_ref(fieldset))
+        self._eviction_blocked = False
+
+    def _evictFieldSets(self, feeding):
+        """
+        Reset done field sets until 3/4 of max_resident_fields is reached.
+        Pinned field sets (see L{GenericFieldSet._pin()}) and the field set
+        being fed with its parents are kept.
+
+        If the target can't be reached, the eviction is stopped until a new
+        field set is done, instead of scanning the same field sets again
+        for each new field.
+        """
+        target = self.max_resident_fields * 3 // 4
+        parents = set()
+        while feeding is not None:
+            parents.add(id(feeding))
+            feeding = feeding._parent
+        queue = self._done_fieldsets or ()
+        for loop in range(len(queue)):
+            if self._resident_fields <= target:
+                return
+            ref = queue.popleft()
+            fieldset = ref()
+            if fieldset is None or not fieldset.done:
+                continue
+            fields = fieldset._parent._fields
+            index = fields.index(fieldset._name)
+            if index is None or fields.values[index] is not fieldset:
+                # the parent has been reset or the field set was replaced
+                continue
+            if fieldset._pinned or id(fieldset) in parents:
+                queue.append(ref)
+                continue
+            count = fieldset._countResidentFields()
+            fieldset.reset()
+            self._resident_fields = max(self._resident_fields - count, 0)
+        if target < self._resident_fields:
+            self._eviction_blocked = True
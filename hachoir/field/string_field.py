@@ -33,6 +33,9 @@ class GenericString(Bytes):
 
     charset have to be in CHARSET_8BIT or in UTF_CHARSET.
     """
+    __slots__ = ("_format", "_strip", "_truncate", "_character_size",
+                 "_charset", "_content_size", "_content_offset", "_length",
+                 "_raw_value")
 
     VALID_FORMATS = ("C", "UnixLine",
                      "fixed", "Pascal8", "Pascal16", "Pascal32")
@@ -108,14 +111,14 @@ class GenericString(Bytes):
         "Pascal32": 4
     }
 
-    # Raw value: with prefix and suffix, not stripped,
-    # and not converted to Unicode
-    _raw_value = None
-
     def __init__(self, parent, name, format, description=None,
                  strip=None, charset=None, nbytes=None, truncate=None):
         Bytes.__init__(self, parent, name, 1, description)
 
+        # Raw value: with prefix and suffix, not stripped,
+        # and not converted to Unicode
+        self._raw_value = None
+
         # Is format valid?
         assert format in self.VALID_FORMATS
 
@@ -358,6 +361,7 @@ class GenericString(Bytes):
 def stringFactory(name, format, doc):
     class NewString(GenericString):
         __doc__ = doc
+        __slots__ = ()
 
         def __init__(self, parent, name, description=None,
                      strip=None, charset=None, truncate=None):
@@ -399,6 +403,7 @@ class String(GenericString):
     String with fixed size (size in bytes).
     See GenericString to get more information.
     """
+    __slots__ = ()
     static_size = staticmethod(lambda *args, **kw: args[1] * 8)
 
     def __init__(self, parent, name, nbytes, description=None,
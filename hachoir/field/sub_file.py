@@ -1,6 +1,8 @@
 from hachoir.field import Bytes
 from hachoir.core.tools import makePrintable, humanFilesize
+from hachoir.core import config
 from hachoir.stream import InputIOStream
+from bisect import bisect_right
 
 
 class SubFile(Bytes):
@@ -33,14 +35,76 @@ class SubFile(Bytes):
 
 
 class CompressedStream:
-    offset = 0
+    """
+    Seekable file object of the data decompressed from a stream.
+
+    decompressor(stream) creates the decompressor, which is called with
+    (size, data) where data is the next chunk of compressed data (or None):
+    it returns the next decompressed bytes, possibly more than size.
 
-    def __init__(self, stream, decompressor):
+    Reading backward restarts the decompression from a checkpoint. If the
+    decompressor has a copy() method returning an independent copy of its
+    state, a checkpoint is recorded every checkpoint_interval bytes of
+    output (default: config.compressed_checkpoint_interval), otherwise the
+    decompression restarts from the beginning.
+
+    size is None until the end of the decompressed data is reached: then
+    set_size(size) is called.
+    """
+    size = None
+    set_size = None
+    # Max. number of bytes decompressed at once to skip data
+    skip_size = 1 << 16
+
+    def __init__(self, stream, decompressor, checkpoint_interval=None):
+        if checkpoint_interval is None:
+            checkpoint_interval = config.compressed_checkpoint_interval
         self.stream = stream
-        self.decompressor = decompressor(stream)
-        self._buffer = b''
+        self.create_decompressor = decompressor
+        self.checkpoint_interval = checkpoint_interval
+        # Checkpoints sorted by position: (position, offset, decompressor,
+        # buffer), and their positions
+        self.checkpoints = []
+        self.checkpoint_positions = []
+        # Seek position
+        self.address = 0
+        # Number of bytes known to be in the decompressed data
+        self.current_size = 0
+        # Number of restarts from a checkpoint or from the beginning
+        self.restarts = 0
+        self._restart()
 
-    def read(self, size):
+    def _restart(self, checkpoint=None):
+        if checkpoint is not None:
+            self.position, self.offset, decompressor, self._buffer = \
+                checkpoint
+            self.decompressor = decompressor.copy()
+        else:
+            # position: offset in the decompressed data of the buffer,
+            # offset: address (in bits) of the next compressed data
+            self.position = 0
+            self.offset = 0
+            self._buffer = b''
+            self.decompressor = self.create_decompressor(self.stream)
+        self.has_copy = hasattr(self.decompressor, "copy")
+
+    def close(self):
+        self.checkpoints = []
+        self.checkpoint_positions = []
+        self.decompressor = None
+
+    def seek(self, address):
+        assert 0 <= address
+        self.address = address
+
+    def tell(self):
+        return self.address
+
+    def _decompress(self, size):
+        """
+        Decompress size bytes at the current position: return less bytes at
+        the end of the decompressed data.
+        """
         d = self._buffer
         data = [d[:size]]
         size -= len(d)
@@ -55,12 +119,47 @@ class CompressedStream:
                     if not n:
                         break
                 d = self.stream.read(self.offset, n)[1]
+                if not d:
+                    break
                 self.offset += 8 * len(d)
                 d = self.decompressor(size, d)
                 data.append(d[:size])
                 size -= len(d)
         self._buffer = d[size + len(d):]
-        return b''.join(data)
+        data = b''.join(data)
+        self.position += len(data)
+        self.current_size = max(self.current_size, self.position)
+        if size > 0 and self.size is None:
+            self.size = self.position
+            if self.set_size:
+                self.set_size(self.size)
+        if self.has_copy:
+            positions = self.checkpoint_positions
+            last = positions[-1] if positions else 0
+            if last + self.checkpoint_interval <= self.position:
+                positions.append(self.position)
+                self.checkpoints.append((self.position, self.offset,
+                                         self.decompressor.copy(),
+                                         self._buffer))
+        return data
+
+    def read(self, size):
+        address = self.address
+        if address < self.position:
+            # Restart from the last checkpoint before address
+            index = bisect_right(self.checkpoint_positions, address)
+            if index:
+                self._restart(self.checkpoints[index - 1])
+            else:
+                self._restart()
+            self.restarts += 1
+        while self.position < address:
+            skip = min(address - self.position, self.skip_size)
+            if len(self._decompress(skip)) < skip:
+                return b''
+        data = self._decompress(size)
+        self.address += len(data)
+        return data
 
 
 def CompressedField(field, decompressor):
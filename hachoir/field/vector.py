@@ -1,4 +1,28 @@
-from hachoir.field import Field, FieldSet, ParserError
+from hachoir.field import Field, FieldSet, ParserError, FieldError
+from hachoir.core.endian import BIG_ENDIAN, LITTLE_ENDIAN
+from array import array
+import sys
+
+# Max. number of items displayed by IntegerArray.display
+MAX_DISPLAY_ITEMS = 8
+
+
+def arrayTypecode(size, signed):
+    """
+    Get the array.array type code of integers of size bytes, or None if
+    the array module has no such type.
+
+    >>> arrayTypecode(4, False)
+    'I'
+    >>> arrayTypecode(3, True) is None
+    True
+    """
+    for typecode in "bhilq":
+        if not signed:
+            typecode = typecode.upper()
+        if array(typecode).itemsize == size:
+            return typecode
+    return None
 
 
 class GenericVector(FieldSet):
@@ -39,3 +63,54 @@ class UserVector(GenericVector):
     def __init__(self, parent, name, nb_items, description=None):
         GenericVector.__init__(self, parent, name, nb_items,
                                self.item_class, self.item_name, description)
+
+
+class IntegerArray(Field):
+    """
+    Table of nb_items integers of the type item_class (eg. UInt32), read
+    at once. No field is created for the items: value is an array.array of
+    the integers, and field[index] is the integer at index.
+    """
+    __slots__ = ("_item_class", "_nb_items")
+
+    def __init__(self, parent, name, nb_items, item_class, description=None):
+        assert isinstance(item_class.static_size, int)
+        if not (0 < nb_items):
+            raise ParserError('Unable to create empty vector "%s" in %s'
+                              % (name, parent.path))
+        Field.__init__(self, parent, name, nb_items * item_class.static_size,
+                       description)
+        self._item_class = item_class
+        self._nb_items = nb_items
+
+    def __len__(self):
+        return self._nb_items
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self.value[key]
+        return Field.__getitem__(self, key)
+
+    def createValue(self):
+        item_size = self._item_class.static_size // 8
+        typecode = arrayTypecode(item_size, self._item_class.is_signed)
+        endian = self._parent.endian
+        if typecode is None or endian not in (BIG_ENDIAN, LITTLE_ENDIAN):
+            raise FieldError("Unable to read %s items in %s endian"
+                             % (self._item_class.__name__, endian))
+        values = array(typecode, self._parent.stream.readBytes(
+            self.absolute_address, self._size // 8))
+        if (endian == LITTLE_ENDIAN) != (sys.byteorder == "little"):
+            values.byteswap()
+        return values
+
+    def createDisplay(self):
+        values = self.value
+        display = ", ".join(str(value)
+                            for value in values[:MAX_DISPLAY_ITEMS])
+        if MAX_DISPLAY_ITEMS < len(values):
+            display += ", ..."
+        return "[%s]" % display
+
+    def createRawDisplay(self):
+        return self.createDisplay()
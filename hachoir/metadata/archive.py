@@ -2,8 +2,6 @@ from hachoir.metadata.metadata_item import QUALITY_BEST, QUALITY_FASTEST
 from hachoir.metadata.safe import fault_tolerant, getValue
 from hachoir.metadata.metadata import (
     RootMetadata, Metadata, MultipleMetadata, registerExtractor)
-from hachoir.parser.archive import (Bzip2Parser, CabFile, GzipParser,
-                                    TarFile, ZipFile, MarFile)
 from hachoir.core.tools import humanUnixAttributes
 
 
@@ -190,9 +188,9 @@ class MarMetadata(MultipleMetadata):
                           "File \"%s\"" % meta.getText('filename'))
 
 
-registerExtractor(CabFile, CabMetadata)
-registerExtractor(GzipParser, GzipMetadata)
-registerExtractor(Bzip2Parser, Bzip2Metadata)
-registerExtractor(TarFile, TarMetadata)
-registerExtractor(ZipFile, ZipMetadata)
-registerExtractor(MarFile, MarMetadata)
+registerExtractor("cab", CabMetadata)
+registerExtractor("gzip", GzipMetadata)
+registerExtractor("bzip2", Bzip2Metadata)
+registerExtractor("tar", TarMetadata)
+registerExtractor("zip", ZipMetadata)
+registerExtractor("mar", MarMetadata)
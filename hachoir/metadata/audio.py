@@ -1,8 +1,5 @@
 from hachoir.metadata.metadata import (registerExtractor, Metadata,
                                        RootMetadata, MultipleMetadata)
-from hachoir.parser.audio import (AuFile, MpegAudioFile, RealAudioFile,
-                                  AiffFile, FlacParser)
-from hachoir.parser.container import OggFile, RealMediaFile
 from hachoir.core.tools import makePrintable, timedelta2seconds, humanBitRate
 from datetime import timedelta
 from hachoir.metadata.metadata_item import (QUALITY_FAST, QUALITY_NORMAL,
@@ -70,9 +67,11 @@ class OggMetadata(MultipleMetadata):
 
     def extract(self, ogg):
         granule_quotient = None
+        granule_serial = None
         for index, page in enumerate(ogg.array("page")):
             if "segments" not in page:
                 continue
+            serial = page["serial"].value
             page = page["segments"]
             if "vorbis_hdr" in page:
                 meta = Metadata(self)
@@ -80,6 +79,7 @@ class OggMetadata(MultipleMetadata):
                 self.addGroup("audio[]", meta, "Audio")
                 if not granule_quotient and meta.has("sample_rate"):
                     granule_quotient = meta.get('sample_rate')
+                    granule_serial = serial
             if "theora_hdr" in page:
                 meta = Metadata(self)
                 self.theoraHeader(page["theora_hdr"], meta)
@@ -90,6 +90,7 @@ class OggMetadata(MultipleMetadata):
                 self.addGroup("video[]", meta, "Video")
                 if not granule_quotient and meta.has("frame_rate"):
                     granule_quotient = meta.get('frame_rate')
+                    granule_serial = serial
             if "comment" in page:
                 readVorbisComment(self, page["comment"])
             if 3 <= index:
@@ -98,7 +99,7 @@ class OggMetadata(MultipleMetadata):
 
         # Compute duration
         if granule_quotient and QUALITY_NORMAL <= self.quality:
-            page = ogg.createLastPage()
+            page = ogg.createLastPage(granule_serial, with_granule=True)
             if page and "abs_granule_pos" in page:
                 try:
                     self.duration = timedelta(seconds=float(
@@ -353,7 +354,15 @@ class MpegAudioMetadata(RootMetadata):
             return
         self.bit_rate = (bit_rate, "%s (constant)" % humanBitRate(bit_rate))
         self.duration = timedelta(seconds=float(
-            frame["/frames"].size) / bit_rate)
+            self.getFramesSize(frame["/frames"])) / bit_rate)
+
+    def getFramesSize(self, frames):
+        # Ignore the data after the last complete frame (tags, truncated frame)
+        if QUALITY_NORMAL <= self.quality:
+            frame = frames.createLastFrame()
+            if frame:
+                return frame.address + frame.getFrameSize() * 8
+        return frames.size
 
     def computeVariableBitrate(self, mp3):
         if self.quality <= QUALITY_FAST:
@@ -380,7 +389,8 @@ class MpegAudioMetadata(RootMetadata):
         bit_rate = total_bit_rate / count
         self.bit_rate = (bit_rate,
                          "%s (Variable bit rate)" % humanBitRate(bit_rate))
-        duration = timedelta(seconds=float(mp3["frames"].size) / bit_rate)
+        duration = timedelta(seconds=float(
+            self.getFramesSize(mp3["frames"])) / bit_rate)
         self.duration = duration
 
 
@@ -410,6 +420,8 @@ class FlacMetadata(RootMetadata):
     def extract(self, flac):
         if "metadata/stream_info/content" in flac:
             self.useStreamInfo(flac["metadata/stream_info/content"])
+        if not self.has("duration") and QUALITY_NORMAL <= self.quality:
+            self.useLastFrame(flac)
         if "metadata/comment/content" in flac:
             readVorbisComment(self, flac["metadata/comment/content"])
 
@@ -423,11 +435,28 @@ class FlacMetadata(RootMetadata):
             sec = float(sec) / info["sample_hertz"].value
             self.duration = timedelta(seconds=sec)
 
-
-registerExtractor(AuFile, AuMetadata)
-registerExtractor(MpegAudioFile, MpegAudioMetadata)
-registerExtractor(OggFile, OggMetadata)
-registerExtractor(RealMediaFile, RealMediaMetadata)
-registerExtractor(RealAudioFile, RealAudioMetadata)
-registerExtractor(AiffFile, AiffMetadata)
-registerExtractor(FlacParser, FlacMetadata)
+    @fault_tolerant
+    def useLastFrame(self, flac):
+        # Total number of samples unknown: use the number of the last frame
+        if not self.has("sample_rate") or not self.get("sample_rate"):
+            return
+        frame = flac.createLastFrame()
+        if not frame:
+            return
+        if "sample_number" in frame:
+            nb_sample = frame["sample_number"].value
+        else:
+            nb_sample = frame["frame_number"].value \
+                * flac["frames/frame[0]"].getBlockSize()
+        nb_sample += frame.getBlockSize()
+        self.duration = timedelta(
+            seconds=float(nb_sample) / self.get("sample_rate"))
+
+
+registerExtractor("sun_next_snd", AuMetadata)
+registerExtractor("mpeg_audio", MpegAudioMetadata)
+registerExtractor("ogg", OggMetadata)
+registerExtractor("real_media", RealMediaMetadata)
+registerExtractor("real_audio", RealAudioMetadata)
+registerExtractor("aiff", AiffMetadata)
+registerExtractor("flac", FlacMetadata)
@@ -0,0 +1,107 @@
+"""
+Persistent cache of metadata extraction results, stored in a SQLite
+database.
+
+Results are keyed by the file identity: absolute path, size, modification
+time and inode number. If one of them changes, the cached result is
+ignored and replaced by the new result.
+"""
+import json
+import os
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    path TEXT NOT NULL,
+    options TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    parser TEXT,
+    result TEXT NOT NULL,
+    PRIMARY KEY (path, options)
+)
+"""
+
+
+def fileIdentity(filename):
+    """
+    Get the identity of a file: (absolute path, size, mtime, inode).
+    The modification time is in nanoseconds.
+    """
+    stat = os.stat(filename)
+    return (os.path.abspath(filename), stat.st_size,
+            stat.st_mtime_ns, stat.st_ino)
+
+
+class MetadataCache:
+    """
+    Cache of results: result is any JSON serializable object.
+
+    options is a string identifying the options used to compute results
+    (eg. output format and priority): results computed with different
+    options are stored separately.
+
+    Writes are committed every commit_interval results and on close().
+    """
+
+    def __init__(self, filename, options="", commit_interval=100):
+        self.filename = filename
+        self.options = options
+        self.commit_interval = commit_interval
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(filename)
+        self.db.execute(SCHEMA)
+
+    def get(self, filename):
+        """
+        Get the cached result of a file: (parser_id, result), or None if
+        the file is not cached or has been modified.
+        """
+        try:
+            path, size, mtime, inode = fileIdentity(filename)
+        except OSError:
+            return None
+        row = self.db.execute(
+            "SELECT size, mtime, inode, parser, result FROM metadata"
+            " WHERE path=? AND options=?", (path, self.options)).fetchone()
+        if not row or row[:3] != (size, mtime, inode):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[3], json.loads(row[4])
+
+    def set(self, filename, parser_id, result):
+        """
+        Store the result of a file.
+        """
+        try:
+            path, size, mtime, inode = fileIdentity(filename)
+        except OSError:
+            return
+        self.db.execute(
+            "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, self.options, size, mtime, inode,
+             parser_id, json.dumps(result)))
+        self.pending += 1
+        if self.commit_interval <= self.pending:
+            self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self.pending = 0
+
+    def close(self):
+        if self.db is None:
+            return
+        self.commit()
+        self.db.close()
+        self.db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -6,7 +6,6 @@ Creation date: 21 february 2017
 """
 
 from hachoir.metadata.metadata import (registerExtractor, RootMetadata)
-from hachoir.parser.image import CR2File
 from hachoir.metadata.safe import fault_tolerant
 
 
@@ -56,4 +55,4 @@ class CR2Metadata(RootMetadata):
         setattr(self, attrname, value)
 
 
-registerExtractor(CR2File, CR2Metadata)
+registerExtractor("cr2", CR2Metadata)
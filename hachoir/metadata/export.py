@@ -0,0 +1,197 @@
+"""
+Streaming export of metadata: write one JSON object (JSON lines) or one CSV
+row per file, as soon as the file has been processed.
+
+Values are typed: integers and floats are kept, dates are written in ISO
+8601 format and durations in seconds.
+"""
+from hachoir.core.tools import makeUnicode
+from hachoir.metadata.metadata import MultipleMetadata
+from hachoir.metadata.metadata_item import MAX_PRIORITY
+from datetime import date, datetime, time, timedelta
+from fnmatch import fnmatch
+from os import fsencode, walk
+from os.path import isdir, join as path_join
+from sys import getfilesystemencoding
+import csv
+import json
+
+# Default columns of the CSV format
+CSV_FIELDS = ("title", "author", "creation_date", "duration",
+              "width", "height", "producer", "mime_type")
+
+
+def exportValue(value):
+    """
+    Convert a metadata value to a JSON compatible value.
+
+    >>> exportValue(timedelta(minutes=1, milliseconds=500))
+    60.5
+    >>> exportValue(datetime(2006, 4, 29, 12, 40, 5))
+    '2006-04-29T12:40:05'
+    >>> exportValue(42)
+    42
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value
+    return makeUnicode(value)
+
+
+def exportValues(metadata, priority=None):
+    """
+    Convert metadata to a dictionary: key => value, or key => list of values
+    if the key has multiple values. Skip data with a priority bigger than
+    priority.
+    """
+    if priority is None:
+        priority = MAX_PRIORITY
+    values = {}
+    for data in sorted(metadata):
+        if priority < data.priority:
+            break
+        if not data.values:
+            continue
+        items = [exportValue(item.value) for item in data.values]
+        if len(items) == 1:
+            values[data.key] = items[0]
+        else:
+            values[data.key] = items
+    return values
+
+
+def exportRecord(filename, parser, metadata, priority=None):
+    """
+    Create the record of a file: a dictionary with the keys "filename",
+    "parser", "metadata" (see exportValues()) and "groups" (metadata of
+    sub-documents, only for MultipleMetadata).
+    """
+    record = {
+        "filename": filename,
+        "parser": parser.PARSER_TAGS["id"],
+        "metadata": exportValues(metadata, priority),
+    }
+    if isinstance(metadata, MultipleMetadata):
+        groups = {}
+        for key, group in metadata.iterGroupItems():
+            values = exportValues(group, priority)
+            if values:
+                groups[key] = values
+        if groups:
+            record["groups"] = groups
+    return record
+
+
+def errorRecord(filename, message, parser_id=None):
+    """
+    Create the record of a file which can't be processed: a dictionary with
+    the keys "filename", "parser" (None if no parser has been found) and
+    "error".
+    """
+    return {
+        "filename": filename,
+        "parser": parser_id,
+        "error": message,
+    }
+
+
+def iterFiles(paths, recursive=False, pattern=None):
+    """
+    Generate filenames: walk into directories if recursive is True, and only
+    keep names of files in directories matching the pattern (eg. "*.doc").
+    """
+    for path in paths:
+        if recursive and isdir(path):
+            for dirpath, dirnames, filenames in walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if pattern and not fnmatch(filename.lower(), pattern):
+                        continue
+                    yield path_join(dirpath, filename)
+        else:
+            yield path
+
+
+def exportFilename(filename):
+    """
+    Make a filename printable: bytes which can't be decoded (stored as
+    surrogates, see os.fsdecode()) are written as backslash escapes.
+    """
+    return fsencode(filename).decode(getfilesystemencoding(),
+                                     "backslashreplace")
+
+
+class JSONLinesExporter:
+    """
+    Write one JSON object per line and per file. Non-ASCII characters are
+    escaped, so undecodable filenames are written as "\\udcXX" escapes which
+    are decoded back by os.fsencode(json.loads(line)["filename"]).
+    """
+
+    def __init__(self, output):
+        self.output = output
+
+    def start(self):
+        pass
+
+    def write(self, record):
+        self.output.write(json.dumps(record) + "\n")
+        self.output.flush()
+
+
+class CSVExporter:
+    """
+    Write one CSV row per file, with the columns "filename", "parser" and
+    then the metadata fields. If a field has multiple values, only the first
+    one is written. Metadata of sub-documents are used for fields missing in
+    the common metadata. Files which can't be processed have an empty
+    parser column.
+    """
+
+    def __init__(self, output, fields=CSV_FIELDS):
+        self.output = output
+        self.fields = tuple(fields)
+        self.writer = csv.writer(output, lineterminator="\n")
+
+    def start(self):
+        self.writer.writerow(("filename", "parser") + self.fields)
+        self.output.flush()
+
+    def getValue(self, record, key):
+        value = record.get("metadata", {}).get(key)
+        if value is None:
+            for group in record.get("groups", {}).values():
+                value = group.get(key)
+                if value is not None:
+                    break
+        if isinstance(value, list):
+            value = value[0]
+        if value is None:
+            return ""
+        return value
+
+    def write(self, record):
+        row = [exportFilename(record["filename"]), record["parser"] or ""]
+        row.extend(self.getValue(record, key) for key in self.fields)
+        self.writer.writerow(row)
+        self.output.flush()
+
+
+def createExporter(format, output, fields=None):
+    """
+    Create an exporter for the format "json" (JSON lines) or "csv".
+    """
+    if format == "json":
+        return JSONLinesExporter(output)
+    if format == "csv":
+        if fields:
+            return CSVExporter(output, fields)
+        return CSVExporter(output)
+    raise ValueError("Unknown export format: %r" % format)
@@ -1,6 +1,5 @@
 from hachoir.metadata.metadata import RootMetadata, registerExtractor
 from hachoir.metadata.safe import fault_tolerant
-from hachoir.parser.file_system import ISO9660
 from datetime import datetime
 
 
@@ -27,4 +26,4 @@ class ISO9660_Metadata(RootMetadata):
         setattr(self, key, value)
 
 
-registerExtractor(ISO9660, ISO9660_Metadata)
+registerExtractor("iso9660", ISO9660_Metadata)
@@ -1,10 +1,5 @@
 from hachoir.metadata.metadata import (registerExtractor, Metadata,
                                        RootMetadata, MultipleMetadata)
-from hachoir.parser.image import (
-    BmpFile, IcoFile, PcxFile, GifFile, PngFile, TiffFile,
-    XcfFile, TargaFile, WMF_File, PsdFile)
-from hachoir.parser.image.png import getBitsPerPixel as pngBitsPerPixel
-from hachoir.parser.image.xcf import XcfProperty
 from hachoir.metadata.safe import fault_tolerant
 
 
@@ -166,6 +161,7 @@ class XcfMetadata(RootMetadata):
 
     @fault_tolerant
     def processProperty(self, prop):
+        from hachoir.parser.image.xcf import XcfProperty
         type = prop["type"].value
         if type == XcfProperty.PROP_PARASITES:
             for field in prop["data"]:
@@ -223,6 +219,7 @@ class PngMetadata(RootMetadata):
 
     @fault_tolerant
     def useHeader(self, header):
+        from hachoir.parser.image.png import getBitsPerPixel as pngBitsPerPixel
         self.width = header["width"].value
         self.height = header["height"].value
 
@@ -324,13 +321,13 @@ class PsdMetadata(RootMetadata):
         self.compression = psd["compression"].display
 
 
-registerExtractor(IcoFile, IcoMetadata)
-registerExtractor(GifFile, GifMetadata)
-registerExtractor(XcfFile, XcfMetadata)
-registerExtractor(TargaFile, TargaMetadata)
-registerExtractor(PcxFile, PcxMetadata)
-registerExtractor(BmpFile, BmpMetadata)
-registerExtractor(PngFile, PngMetadata)
-registerExtractor(TiffFile, TiffMetadata)
-registerExtractor(WMF_File, WmfMetadata)
-registerExtractor(PsdFile, PsdMetadata)
+registerExtractor("ico", IcoMetadata)
+registerExtractor("gif", GifMetadata)
+registerExtractor("xcf", XcfMetadata)
+registerExtractor("targa", TargaMetadata)
+registerExtractor("pcx", PcxMetadata)
+registerExtractor("bmp", BmpMetadata)
+registerExtractor("png", PngMetadata)
+registerExtractor("tiff", TiffMetadata)
+registerExtractor("wmf", WmfMetadata)
+registerExtractor("psd", PsdMetadata)
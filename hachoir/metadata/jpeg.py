@@ -1,10 +1,5 @@
 from hachoir.metadata.metadata import RootMetadata, registerExtractor
 from hachoir.metadata.image import computeComprRate
-from hachoir.parser.image.exif import IFD, BasicIFDEntry
-from hachoir.parser.image.jpeg import (
-    JpegFile, JpegChunk,
-    QUALITY_HASH_COLOR, QUALITY_SUM_COLOR,
-    QUALITY_HASH_GRAY, QUALITY_SUM_GRAY)
 from hachoir.field import MissingField
 from hachoir.core.tools import makeUnicode
 from hachoir.metadata.safe import fault_tolerant
@@ -70,6 +65,7 @@ class JpegMetadata(RootMetadata):
     }
 
     def extract(self, jpeg):
+        from hachoir.parser.image.exif import IFD
         if "start_frame/content" in jpeg:
             self.startOfFrame(jpeg["start_frame/content"])
         elif "start_scan/content/nr_components" in jpeg:
@@ -104,6 +100,7 @@ class JpegMetadata(RootMetadata):
 
     @fault_tolerant
     def startOfFrame(self, sof):
+        from hachoir.parser.image.jpeg import JpegChunk
         # Set compression method
         key = sof["../type"].value
         self.compression = "JPEG (%s)" % JpegChunk.START_OF_FRAME[key]
@@ -123,6 +120,9 @@ class JpegMetadata(RootMetadata):
     def computeQuality(self, jpeg):
         # This function is an adaption to Python of ImageMagick code
         # to compute JPEG quality using quantization tables
+        from hachoir.parser.image.jpeg import (
+            QUALITY_HASH_COLOR, QUALITY_SUM_COLOR,
+            QUALITY_HASH_GRAY, QUALITY_SUM_GRAY)
 
         # Read quantization tables
         qtlist = []
@@ -175,6 +175,7 @@ class JpegMetadata(RootMetadata):
 
     @fault_tolerant
     def processIfdEntry(self, ifd, entry):
+        from hachoir.parser.image.exif import BasicIFDEntry
         # Skip unknown tags
         tag = entry["tag"].display
         if tag not in self.EXIF_KEY:
@@ -301,4 +302,4 @@ class JpegMetadata(RootMetadata):
                 pass
 
 
-registerExtractor(JpegFile, JpegMetadata)
+registerExtractor("jpeg", JpegMetadata)
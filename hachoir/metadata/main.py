@@ -1,22 +1,30 @@
+from hachoir import __version__
 from hachoir.core.error import error
 from hachoir.core.i18n import getTerminalCharset
 from hachoir.core.benchmark import Benchmark
 from hachoir.stream import InputStreamError
 from hachoir.core.tools import makePrintable
 from hachoir.core.cmd_line import displayVersion
-from hachoir.parser import createParser, ParserList
+from hachoir.core.memory import limitedMemory
+from hachoir.core.timeout import limitedTime, Timeout
+from hachoir.parser import createParser, ParserList, HachoirParserList
 import hachoir.core.config as hachoir_config
 from hachoir.metadata import config
 from optparse import OptionParser
 from hachoir.metadata import extractMetadata
+from hachoir.metadata.cache import MetadataCache
+from hachoir.metadata.export import (createExporter, errorRecord,
+                                     exportRecord, iterFiles)
 from hachoir.metadata.metadata import extractors as metadata_extractors
+import multiprocessing
 import sys
 
 
 def displayParserList(*args):
     parser_list = ParserList()
-    for parser in list(metadata_extractors.keys()):
-        parser_list.add(parser)
+    parsers = HachoirParserList.getInstance().bytag["id"]
+    for parser_id in metadata_extractors:
+        parser_list.add(parsers[parser_id][0])
     parser_list.print_("List of metadata extractors.")
     sys.exit(0)
 
@@ -33,6 +41,15 @@ def parseOptions():
                       choices=[str(choice) for choice in range(1, 9 + 1)])
     parser.add_option("--raw", help="Raw output",
                       action="store_true", default=False)
+    parser.add_option("--format",
+                      help="Output format: text, json (one JSON object per line and per file) or csv (default: text)",
+                      action="store", default="text", type="choice",
+                      choices=("text", "json", "csv"))
+    parser.add_option("--fields",
+                      help="Comma separated list of metadata keys written by the csv format (eg. title,creation_date)",
+                      type="str", default=None)
+    parser.add_option("--recursive", "-r", help="Process files of directories recursively",
+                      action="store_true", default=False)
     parser.add_option("--bench", help="Run benchmark",
                       action="store_true", default=False)
     parser.add_option("--force-parser", help="List all parsers then exit",
@@ -47,6 +64,16 @@ def parseOptions():
                       action="store", type="float", default="0.5")
     parser.add_option("--maxlen", help="Maximum string length in characters, 0 means unlimited (default: %s)" % config.MAX_STR_LENGTH,
                       type="int", default=config.MAX_STR_LENGTH)
+    parser.add_option("--jobs", help="Number of worker processes used to process files in parallel (default: 1)",
+                      type="int", default=1)
+    parser.add_option("--unordered", help="With --jobs: display results as soon as they are ready, instead of the input order",
+                      action="store_true", default=False)
+    parser.add_option("--timeout", help="Maximum time in seconds to process a file",
+                      type="float", default=None)
+    parser.add_option("--max-memory", help="Maximum memory in MB used to process a file",
+                      type="int", default=None)
+    parser.add_option("--cache", help="SQLite database used to cache results of unmodified files",
+                      type="str", default=None)
     parser.add_option("--verbose", help="Verbose mode",
                       default=False, action="store_true")
     parser.add_option("--debug", help="Debug mode",
@@ -56,19 +83,46 @@ def parseOptions():
     if len(filename) == 0:
         parser.print_help()
         sys.exit(1)
+    if values.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    return values, filename
 
+
+def setupConfig(values):
     # Update limits
     config.MAX_STR_LENGTH = values.maxlen
     if values.raw:
         config.RAW_OUTPUT = True
 
-    return values, filename
+    if values.debug:
+        hachoir_config.debug = True
+    elif values.verbose:
+        hachoir_config.verbose = True
+    else:
+        hachoir_config.quiet = True
 
 
-def processFile(values, filename,
-                display_filename=False, priority=None, human=True, display=True):
-    charset = getTerminalCharset()
+def extractFailure(values, filename, message, parser_id=None):
+    """
+    Result of extractText() for a file which can't be processed: text is
+    None, or an error record (see errorRecord()) if the output format is
+    not "text".
+    """
+    if values.format == "text":
+        return False, None, None
+    return False, errorRecord(filename, message, parser_id), None
+
+
+def extractText(values, filename, priority=None, human=True):
+    """
+    Parse a file and format its metadata (or its type or MIME type).
 
+    Returns (ok, text, parser_id) where text is a list of lines, or a
+    record (see exportRecord()) if the output format is not "text". On
+    error, parser_id is None and text is None or an error record (see
+    extractFailure()).
+    """
     # Create parser
     try:
         if values.force_parser:
@@ -78,10 +132,11 @@ def processFile(values, filename,
         parser = createParser(filename, tags=tags)
     except InputStreamError as err:
         error(str(err))
-        return False
+        return extractFailure(values, filename, str(err))
     if not parser:
         error("Unable to parse file: %s" % filename)
-        return False
+        return extractFailure(values, filename, "Unable to parse file")
+    parser_id = parser.PARSER_TAGS["id"]
 
     with parser:
         # Extract metadata
@@ -95,42 +150,210 @@ def processFile(values, filename,
             if not metadata:
                 parser.error("Hachoir can't extract metadata, but is able to parse: %s"
                              % filename)
-                return False
-        else:
-            if values.type:
-                result = parser.description
-            else:
-                result = parser.mime_type
-
-    if display:
-        # Display metadatas on stdout
-        if extract_metadata:
+                return extractFailure(values, filename,
+                                      "Unable to extract metadata",
+                                      parser_id)
+            if values.format != "text":
+                text = exportRecord(filename, parser, metadata, priority)
+                return True, text, parser_id
             text = metadata.exportPlaintext(priority=priority, human=human)
             if not text:
                 text = ["(no metadata, priority may be too small)"]
-            if display_filename:
-                for line in text:
-                    line = "%s: %s" % (filename, line)
-                    print(makePrintable(line, charset))
+        elif values.format != "text":
+            key = "description" if values.type else "mime_type"
+            value = getattr(parser, key)
+            text = {"filename": filename,
+                    "parser": parser_id,
+                    "metadata": {key: value}}
+        else:
+            if values.type:
+                text = [parser.description]
             else:
-                for line in text:
-                    print(makePrintable(line, charset))
+                text = [parser.mime_type]
+    return True, text, parser_id
+
+
+def limitedExtractText(values, filename, priority=None, human=True):
+    """
+    Call extractText() with the time and memory limits of the options.
+    """
+    func = extractText
+    args = (values, filename, priority, human)
+    if values.max_memory:
+        args = (values.max_memory * 1024 * 1024, func) + args
+        func = limitedMemory
+    if values.timeout:
+        args = (values.timeout, func) + args
+        func = limitedTime
+    try:
+        return func(*args)
+    except Timeout:
+        error("Timeout: unable to process %s in %s seconds"
+              % (filename, values.timeout))
+        return extractFailure(values, filename,
+                              "Timeout after %s seconds" % values.timeout)
+    except MemoryError:
+        error("Memory limit: unable to process %s with %s MB"
+              % (filename, values.max_memory))
+        return extractFailure(values, filename,
+                              "Memory limit of %s MB" % values.max_memory)
+
+
+def cacheOptions(values, priority, human):
+    """
+    Identifier of the options changing the result of extractText(),
+    used as a key of the cache. The hachoir version is included: a new
+    version can extract different metadata.
+    """
+    return repr((__version__, values.format, values.mime, values.type,
+                 priority, human, values.quality, values.maxlen,
+                 values.force_parser))
+
+
+def getCachedText(cache, filename):
+    """
+    Get the text of a file from the cache, or None if the file is not
+    cached.
+    """
+    cached = cache.get(filename)
+    if cached is None:
+        return None
+    text = cached[1]
+    if isinstance(text, dict):
+        text["filename"] = filename
+    return text
+
+
+def displayText(filename, text, display_filename, exporter=None):
+    # Display metadatas on stdout
+    if exporter:
+        exporter.write(text)
+        return
+    charset = getTerminalCharset()
+    for line in text:
+        if display_filename:
+            line = "%s: %s" % (filename, line)
+        print(makePrintable(line, charset))
+
+
+def processFile(values, filename,
+                display_filename=False, priority=None, human=True, display=True,
+                exporter=None, cache=None):
+    text = None
+    if cache is not None:
+        text = getCachedText(cache, filename)
+    if text is not None:
+        ok = True
+    else:
+        ok, text, parser_id = limitedExtractText(values, filename,
+                                                 priority, human)
+        if ok and cache is not None:
+            cache.set(filename, parser_id, text)
+    if display and text:
+        displayText(filename, text, display_filename, exporter)
+    return ok
+
+
+def _initWorker(values):
+    setupConfig(values)
+
+
+def _processFileWorker(args):
+    values, filename, priority, human = args
+    try:
+        ok, text, parser_id = limitedExtractText(values, filename,
+                                                 priority, human)
+    except Exception as err:
+        error("Error while processing %s: %s" % (filename, err))
+        ok, text, parser_id = extractFailure(values, filename, str(err))
+    return filename, ok, text, parser_id
+
+
+def _mergeCachedResults(filenames, cached, results, ordered):
+    """
+    Generate (filename, ok, text, parser_id) of cached files and of the
+    results of the workers, in the order of filenames if ordered is true.
+    """
+    if not ordered:
+        for filename in filenames:
+            if filename in cached:
+                yield filename, True, cached[filename], None
+        yield from results
+        return
+    for filename in filenames:
+        if filename in cached:
+            yield filename, True, cached[filename], None
         else:
-            text = result
-            if display_filename:
-                text = "%s: %s" % (filename, text)
-            print(text)
-    return True
+            yield next(results)
+
+
+def processFilesParallel(values, filenames, priority, human, display,
+                         exporter=None, cache=None):
+    """
+    Process files in values.jobs worker processes. Results are displayed
+    in the input order, or as soon as they are ready if values.unordered
+    is true.
+
+    The cache is only used by the parent process.
+    """
+    ok = True
+    display_filename = (1 < len(filenames))
+    cached = {}
+    if cache is not None:
+        for filename in filenames:
+            text = getCachedText(cache, filename)
+            if text is not None:
+                cached[filename] = text
+    tasks = [(values, filename, priority, human)
+             for filename in filenames if filename not in cached]
+    with multiprocessing.Pool(values.jobs, _initWorker, (values,)) as pool:
+        if values.unordered:
+            results = pool.imap_unordered(_processFileWorker, tasks)
+        else:
+            results = pool.imap(_processFileWorker, tasks)
+        results = _mergeCachedResults(filenames, cached, results,
+                                      not values.unordered)
+        for filename, file_ok, text, parser_id in results:
+            ok &= file_ok
+            if file_ok and parser_id and cache is not None:
+                cache.set(filename, parser_id, text)
+            if display and text:
+                displayText(filename, text, display_filename, exporter)
+                sys.stdout.flush()
+    return ok
 
 
 def processFiles(values, filenames, display=True):
     human = not values.raw
     ok = True
     priority = int(values.level) * 100 + 99
-    display_filename = (1 < len(filenames))
-    for filename in filenames:
-        ok &= processFile(values, filename, display_filename,
-                          priority, human, display)
+    if values.recursive:
+        filenames = list(iterFiles(filenames, recursive=True))
+    if values.format != "text":
+        fields = None
+        if values.fields:
+            fields = [field.strip() for field in values.fields.split(",")]
+        exporter = createExporter(values.format, sys.stdout, fields)
+        if display:
+            exporter.start()
+    else:
+        exporter = None
+    if values.cache:
+        cache = MetadataCache(values.cache,
+                              cacheOptions(values, priority, human))
+    else:
+        cache = None
+    try:
+        if 1 < values.jobs and 1 < len(filenames):
+            return processFilesParallel(values, filenames, priority, human,
+                                        display, exporter, cache)
+        display_filename = (1 < len(filenames))
+        for filename in filenames:
+            ok &= processFile(values, filename, display_filename,
+                              priority, human, display, exporter, cache)
+    finally:
+        if cache is not None:
+            cache.close()
     return ok
 
 
@@ -148,13 +371,7 @@ def main():
     try:
         # Parser options and initialize Hachoir
         values, filenames = parseOptions()
-
-        if values.debug:
-            hachoir_config.debug = True
-        elif values.verbose:
-            hachoir_config.verbose = True
-        else:
-            hachoir_config.quiet = True
+        setupConfig(values)
 
         if values.profiler:
             ok = profile(values, filenames)
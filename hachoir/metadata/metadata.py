@@ -7,6 +7,7 @@ from hachoir.metadata.metadata_item import (
     MIN_PRIORITY, MAX_PRIORITY, QUALITY_NORMAL)
 from hachoir.metadata.register import registerAllItems
 
+# Parser identifier => metadata extractor class
 extractors = {}
 
 
@@ -245,6 +246,12 @@ class MultipleMetadata(RootMetadata):
     def iterGroups(self):
         return iter(self.__groups.values)
 
+    def iterGroupItems(self):
+        """
+        Iterate on groups: generate (key, metadata) tuples.
+        """
+        return self.__groups.items()
+
     def __bool__(self):
         if RootMetadata.__bool__(self):
             return True
@@ -308,10 +315,23 @@ class MultipleMetadata(RootMetadata):
         return text
 
 
-def registerExtractor(parser, extractor):
-    assert parser not in extractors
+def registerExtractor(parser_id, extractor):
+    """
+    Register the metadata extractor of a parser. The parser is identified
+    by its "id" tag, so the parser module is not imported.
+
+    For backward compatibility, parser_id can also be a parser class: its
+    "id" tag is used.
+    """
+    if not isinstance(parser_id, str):
+        if not hasattr(parser_id, "getParserTags"):
+            raise TypeError("registerExtractor() expects a parser identifier "
+                            "(str) or a parser class, not %s"
+                            % type(parser_id).__name__)
+        parser_id = parser_id.getParserTags()["id"]
+    assert parser_id not in extractors
     assert issubclass(extractor, RootMetadata)
-    extractors[parser] = extractor
+    extractors[parser_id] = extractor
 
 
 def extractMetadata(parser, quality=QUALITY_NORMAL):
@@ -320,7 +340,7 @@ def extractMetadata(parser, quality=QUALITY_NORMAL):
     extractor does exist for the parser class.
     """
     try:
-        extractor = extractors[parser.__class__]
+        extractor = extractors[parser.getParserTags()["id"]]
     except KeyError:
         return None
     metadata = extractor(quality)
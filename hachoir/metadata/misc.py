@@ -1,11 +1,48 @@
 from hachoir.metadata.metadata import RootMetadata, registerExtractor
 from hachoir.metadata.safe import fault_tolerant
-from hachoir.parser.container import SwfFile
-from hachoir.parser.misc import TorrentFile, TrueTypeFontFile, OLE2_File, PcfFile
 from hachoir.field import isString
 from hachoir.core.error import warning
 from hachoir.parser import guessParser
 from hachoir.metadata.setter import normalizeString
+from hachoir.metadata.timezone import createTimezone
+from datetime import datetime, timedelta, timezone
+import re
+
+# PDF date: "D:YYYYMMDDHHmmSSOHH'mm'", all fields after the year are optional
+PDF_DATE_REGEX = re.compile(
+    r"(?:D:)?(\d{4})(\d{2})?(\d{2})?(\d{2})?(\d{2})?(\d{2})?"
+    r"(?:([-+Z])(\d{2})?'?(\d{2})?'?)?")
+
+
+def parsePDFDate(text):
+    """
+    Parse a PDF date string. Return None if the date is invalid.
+
+    >>> parsePDFDate("D:20070301120530+02'00'")
+    datetime.datetime(2007, 3, 1, 12, 5, 30, tzinfo=<Timezone delta=2:00:00, name='+0200'>)
+    >>> parsePDFDate("D:2007")
+    datetime.datetime(2007, 1, 1, 0, 0)
+    """
+    match = PDF_DATE_REGEX.match(text.strip())
+    if not match:
+        return None
+    values = [int(value) if value else default for value, default
+              in zip(match.groups()[:6], (0, 1, 1, 0, 0, 0))]
+    sign, hours, minutes = match.groups()[6:]
+    tzinfo = None
+    if sign:
+        hours = int(hours or 0)
+        minutes = int(minutes or 0)
+        if sign == "-":
+            hours, minutes = -hours, -minutes
+        if minutes:
+            tzinfo = timezone(timedelta(hours=hours, minutes=minutes))
+        else:
+            tzinfo = createTimezone(hours)
+    try:
+        return datetime(*values, tzinfo=tzinfo)
+    except ValueError:
+        return None
 
 
 class TorrentMetadata(RootMetadata):
@@ -261,8 +298,68 @@ class SwfMetadata(RootMetadata):
         self.comment = "Frame count: %s" % swf["frame_count"].value
 
 
-registerExtractor(TorrentFile, TorrentMetadata)
-registerExtractor(TrueTypeFontFile, TTF_Metadata)
-registerExtractor(OLE2_File, OLE2_Metadata)
-registerExtractor(PcfFile, PcfMetadata)
-registerExtractor(SwfFile, SwfMetadata)
+class PdfMetadata(RootMetadata):
+    """
+    Metadata of a PDF document: the document information dictionary and the
+    number of pages (root of the page tree) are read using the
+    cross-reference index, without parsing the document body.
+    """
+    INFO_TO_ATTR = {
+        "Title": "title",
+        "Author": "author",
+        "Subject": "comment",
+        "Keywords": "comment",
+        "Creator": "producer",
+        "Producer": "producer",
+        "CreationDate": "creation_date",
+        "ModDate": "last_modification",
+    }
+
+    def extract(self, pdf):
+        self.useHeader(pdf)
+        self.useInfo(pdf)
+        self.usePages(pdf)
+
+    @fault_tolerant
+    def useHeader(self, pdf):
+        self.format_version = "PDF version %s" % pdf["header/version"].value
+
+    @fault_tolerant
+    def useInfo(self, pdf):
+        from hachoir.parser.misc.pdf import decodeTextString
+        info = pdf.resolve(pdf.trailer_dict.get("Info"))
+        if not isinstance(info, dict):
+            return
+        for key, attr in self.INFO_TO_ATTR.items():
+            value = pdf.resolve(info.get(key))
+            if not isinstance(value, bytes):
+                continue
+            value = normalizeString(decodeTextString(value))
+            if not value:
+                continue
+            if attr in ("creation_date", "last_modification"):
+                value = parsePDFDate(value)
+                if value is None:
+                    continue
+            elif key in ("Subject", "Keywords"):
+                value = "%s: %s" % (key, value)
+            setattr(self, attr, value)
+
+    @fault_tolerant
+    def usePages(self, pdf):
+        catalog = pdf.resolve(pdf.trailer_dict.get("Root"))
+        if not isinstance(catalog, dict):
+            return
+        pages = pdf.resolve(catalog.get("Pages"))
+        if isinstance(pages, dict):
+            count = pdf.resolve(pages.get("Count"))
+            if isinstance(count, int):
+                self.nb_page = count
+
+
+registerExtractor("torrent", TorrentMetadata)
+registerExtractor("ttf", TTF_Metadata)
+registerExtractor("ole2", OLE2_Metadata)
+registerExtractor("pcf", PcfMetadata)
+registerExtractor("pdf", PdfMetadata)
+registerExtractor("swf", SwfMetadata)
@@ -1,5 +1,4 @@
 from hachoir.metadata.metadata import RootMetadata, registerExtractor
-from hachoir.parser.program import ExeFile
 from hachoir.metadata.safe import fault_tolerant, getValue
 
 
@@ -99,4 +98,4 @@ class ExeMetadata(RootMetadata):
                 self.comment = "%s=%s" % (key, value)
 
 
-registerExtractor(ExeFile, ExeMetadata)
+registerExtractor("exe", ExeMetadata)
@@ -5,8 +5,6 @@ Extract metadata from RIFF file format: AVI video and WAV sound.
 from hachoir.metadata.metadata import (Metadata, MultipleMetadata,
                                        registerExtractor)
 from hachoir.metadata.safe import fault_tolerant, getValue
-from hachoir.parser.container.riff import RiffFile
-from hachoir.parser.video.fourcc import UNCOMPRESSED_AUDIO
 from hachoir.core.tools import humanFilesize, makeUnicode, timedelta2seconds
 from hachoir.metadata.audio import computeComprRate as computeAudioComprRate
 from datetime import timedelta
@@ -53,6 +51,7 @@ class RiffMetadata(MultipleMetadata):
 
     @fault_tolerant
     def extractWAVE(self, wav):
+        from hachoir.parser.video.fourcc import UNCOMPRESSED_AUDIO
         format = wav["format"]
 
         # Number of channel, bits/sample, sample rate
@@ -197,4 +196,4 @@ class RiffMetadata(MultipleMetadata):
             self.frame_rate = 60.0 / riff["anim_hdr/jiffie_rate"].value
 
 
-registerExtractor(RiffFile, RiffMetadata)
+registerExtractor("riff", RiffMetadata)
@@ -1,12 +1,8 @@
 from hachoir.field import MissingField
 from hachoir.metadata.metadata import (registerExtractor,
                                        Metadata, RootMetadata, MultipleMetadata)
-from hachoir.metadata.metadata_item import QUALITY_GOOD
+from hachoir.metadata.metadata_item import QUALITY_NORMAL, QUALITY_GOOD
 from hachoir.metadata.safe import fault_tolerant
-from hachoir.parser.video import AsfFile, FlvFile
-from hachoir.parser.video.asf import Descriptor as ASF_Descriptor
-from hachoir.parser.container import MkvFile, MP4File
-from hachoir.parser.container.mkv import dateToDatetime
 from hachoir.core.tools import makeUnicode, makePrintable, timedelta2seconds
 from datetime import timedelta
 
@@ -125,6 +121,7 @@ class MkvMetadata(MultipleMetadata):
         setattr(self, key, value)
 
     def processInfo(self, info):
+        from hachoir.parser.container.mkv import dateToDatetime
         if "TimecodeScale/unsigned" in info:
             duration = self.getDouble(info, "Duration")
             if duration is not None:
@@ -253,6 +250,30 @@ class MP4Metadata(RootMetadata):
                 self.processMovieHeader(field["movie_hdr"])
 
 
+class MpegTSMetadata(RootMetadata):
+
+    def extract(self, ts):
+        if QUALITY_NORMAL <= self.quality:
+            self.computeDuration(ts)
+
+    @fault_tolerant
+    def computeDuration(self, ts):
+        from hachoir.parser.video.mpeg_ts import PCR_FREQUENCY
+        # Difference between the first and the last program clock reference
+        # of the same program: only the start and the end of the file are read
+        first = ts.findPCR()
+        if not first:
+            return
+        pid, start = first
+        last = ts.findPCR(pid, backward=True)
+        if not last:
+            return
+        # the PCR base is a 33 bits counter
+        ticks = (last[1] - start) % ((1 << 33) * 300)
+        if ticks:
+            self.duration = timedelta(seconds=float(ticks) / PCR_FREQUENCY)
+
+
 class AsfMetadata(MultipleMetadata):
     EXT_DESC_TO_ATTR = {
         "Encoder": "producer",
@@ -365,6 +386,7 @@ class AsfMetadata(MultipleMetadata):
 
     @fault_tolerant
     def useExtDescItem(self, desc, data):
+        from hachoir.parser.video.asf import Descriptor as ASF_Descriptor
         if desc["type"].value == ASF_Descriptor.TYPE_BYTE_ARRAY:
             # Skip binary data
             return
@@ -417,7 +439,8 @@ class AsfMetadata(MultipleMetadata):
 #                    meta.compression = text
 
 
-registerExtractor(MP4File, MP4Metadata)
-registerExtractor(AsfFile, AsfMetadata)
-registerExtractor(FlvFile, FlvMetadata)
-registerExtractor(MkvFile, MkvMetadata)
+registerExtractor("mov", MP4Metadata)
+registerExtractor("asf", AsfMetadata)
+registerExtractor("flv", FlvMetadata)
+registerExtractor("matroska", MkvMetadata)
+registerExtractor("mpeg_ts", MpegTSMetadata)
@@ -1,6 +1,7 @@
+from hachoir.core.lazy import lazyModule
 from hachoir.parser.parser import ValidateError, HachoirParser, Parser  # noqa
 from hachoir.parser.parser_list import ParserList, HachoirParserList  # noqa
 from hachoir.parser.guess import QueryParser, guessParser, createParser  # noqa
-from hachoir.parser import (archive, audio, container,  # noqa
-                            file_system, image, game, misc, network, program,
-                            video)
+
+# Parser packages (archive, audio, ...) are imported on demand
+__getattr__, __dir__ = lazyModule(__name__, {})
@@ -161,8 +161,11 @@ class FolderData(FieldSet):
             for unused in self:
                 pass
             if folder["compr_method"].value == 3:  # LZX
+                size = sum(block["uncompressed_size"].value
+                           for block in self.array("block"))
                 self.uncompressed_data = lzx_decompress(
-                    self["block[0]/data"].getSubIStream(), folder["compr_level"].value)
+                    self["block[0]/data"].getSubIStream(), folder["compr_level"].value,
+                    size)
             return StringInputStream(self.uncompressed_data, source=source, **args)
         self.setSubIStream(createInputStream)
         self.files = files
@@ -23,8 +23,8 @@ class GzipParser(Parser):
         "mime": ("application/x-gzip",),
         "min_size": 18 * 8,
         "magic_regex": (
-            # (magic, compression=deflate, <flags>, <mtime>, )
-            (b'\x1F\x8B\x08.{5}[\0\2\4\6][\x00-\x0D]', 0),
+            # (magic, compression=deflate, <flags>, <mtime>, extra flags)
+            (b'\x1F\x8B\x08.{5}[\0\2\4\6]', 0),
         ),
         "description": "gzip archive",
     }
@@ -1,7 +1,7 @@
 """LZX data stream parser.
 
-Also includes a decompression function (slow!!) which can decompress
-LZX data stored in a Hachoir stream.
+Also includes a fast decompressor (LZXDecompressor) which can decompress
+LZX data stored in a Hachoir stream without creating fields.
 
 Author: Robert Xiao
 Creation date: July 18, 2007
@@ -9,10 +9,11 @@ Creation date: July 18, 2007
 from hachoir.parser import Parser
 from hachoir.field import (FieldSet,
                            UInt32, Bit, Bits, PaddingBits,
-                           RawBytes, ParserError)
+                           RawBytes, ParserError, CompressedField)
 from hachoir.core.endian import MIDDLE_ENDIAN, LITTLE_ENDIAN
 from hachoir.core.tools import paddingSize
 from hachoir.parser.archive.zlib import build_tree, HuffmanCode, extend_data
+from copy import copy
 import struct
 
 
@@ -325,9 +326,448 @@ class LZXStream(Parser):
                 break
 
 
-def lzx_decompress(stream, window_bits):
-    data = LZXStream(stream)
-    data.compr_level = window_bits
-    for _ in data:
-        pass
-    return data.uncompressed_data
+# Size in bytes of the uncompressed data of a LZX frame: the bit stream is
+# aligned on 16 bits at the end of each frame
+LZX_FRAME_SIZE = 32768
+
+# Number of elements of the length tree
+LZX_LENGTH_SIZE = 249
+
+# Base position and number of extra bits of position slots
+POSITION_BASE = tuple(LZXBlock.POSITION_SLOTS[slot][0]
+                      for slot in range(len(LZXBlock.POSITION_SLOTS)))
+POSITION_EXTRA = tuple(LZXBlock.POSITION_SLOTS[slot][2]
+                       for slot in range(len(LZXBlock.POSITION_SLOTS)))
+
+
+class LZXDecompressor:
+    """
+    Fast LZX decompressor: decode the compressed data of a stream frame per
+    frame, without creating fields (LZXStream creates the fields to inspect
+    the compressed data).
+
+    window_bits is the base-2 logarithm of the window size (15..21). If
+    reset_interval is non-zero, the decoder state is reset every
+    reset_interval frames (CHM files). Decoding stops after output_size
+    bytes if it is set, at the end of the compressed data otherwise.
+
+    It can be used as decompressor of CompressedField() (see LZX()): the
+    compressed data are read from the stream by the decompressor.
+    """
+    CHUNK_SIZE = 1 << 16   # Number of bytes read at once from the stream
+
+    def __init__(self, stream, window_bits, reset_interval=0,
+                 output_size=None):
+        if window_bits not in LZXBlock.WINDOW_SIZE:
+            raise ParserError("Invalid LZX window size: 2^%s"
+                              % window_bits)
+        if stream.size is None:
+            raise ParserError("LZX: unknown compressed data size")
+        self.stream = stream
+        self.input_size = stream.size // 8
+        self.window_size = 1 << window_bits
+        self.main_size = 256 + LZXBlock.WINDOW_SIZE[window_bits] * 8
+        self.reset_interval = reset_interval
+        self.output_size = output_size
+
+        # Input: data[pos] is the byte at offset data_offset + pos of the
+        # stream. Bits are read by 16-bit little endian words, most
+        # significant bit first. padding is the number of null bits added
+        # after the end of the input.
+        self.data = b''
+        self.data_offset = 0
+        self.pos = 0
+        self.bitbuf = 0
+        self.bitcount = 0
+        self.padding = 0
+
+        # Output: window[0] is the byte at offset window_start of the
+        # uncompressed data
+        self.window = bytearray()
+        self.window_start = 0
+        self.frame = 0
+        self.finished = False
+
+        self.intel_started = False
+        self.intel_filesize = 0
+        self.resetState()
+
+    def resetState(self):
+        self.r0 = self.r1 = self.r2 = 1
+        self.header_read = False
+        self.block_type = None
+        self.block_length = 0
+        self.block_remaining = 0
+        self.main_lengths = [0] * self.main_size
+        self.length_lengths = [0] * LZX_LENGTH_SIZE
+
+    def copy(self):
+        """Independent copy of the decompressor state (see CompressedStream)"""
+        other = copy(self)
+        other.window = bytearray(self.window)
+        other.main_lengths = list(self.main_lengths)
+        other.length_lengths = list(self.length_lengths)
+        return other
+
+    def _fill(self):
+        """
+        Read the next chunk of the stream: return False at the end of the
+        stream. Keep the last bytes which may be stored in the bit buffer.
+        """
+        offset = self.data_offset + len(self.data)
+        size = min(self.CHUNK_SIZE, self.input_size - offset)
+        if size <= 0:
+            return False
+        keep = max(self.pos - 8, 0)
+        self.data = self.data[keep:] + self.stream.readBytes(8 * offset, size)
+        self.data_offset += keep
+        self.pos -= keep
+        return True
+
+    def _refill(self, nbits=32):
+        """
+        Add 16-bit words to the bit buffer until it contains at least nbits
+        bits. Null bits are added after the end of the input.
+        """
+        while self.bitcount < nbits:
+            if len(self.data) < self.pos + 2:
+                self._fill()
+            data = self.data
+            pos = self.pos
+            if pos + 2 <= len(data):
+                word = data[pos] | (data[pos + 1] << 8)
+                self.pos = pos + 2
+            else:
+                if pos < len(data):
+                    word = data[pos]
+                    self.pos = pos + 1
+                    self.padding += 8
+                else:
+                    word = 0
+                    self.padding += 16
+                if 64 < self.padding:
+                    raise ParserError("LZX: unexpected end of data")
+            self.bitbuf = (((self.bitbuf & ((1 << self.bitcount) - 1)) << 16)
+                           | word)
+            self.bitcount += 16
+
+    def bitsLeft(self):
+        """Number of bits of the input not read yet"""
+        consumed = ((self.data_offset + self.pos) * 8 + self.padding
+                    - self.bitcount)
+        return self.input_size * 8 - consumed
+
+    def readBits(self, nbits):
+        if self.bitcount < nbits:
+            self._refill()
+        self.bitcount -= nbits
+        return (self.bitbuf >> self.bitcount) & ((1 << nbits) - 1)
+
+    def readSymbol(self, tree):
+        bits1, table = tree.table()
+        length = tree.max_length
+        if self.bitcount < length:
+            self._refill()
+        bits = (self.bitbuf >> (self.bitcount - length)) & ((1 << length) - 1)
+        entry = table[bits >> (length - bits1)]
+        if isinstance(entry, list):
+            entry = entry[bits & ((1 << (length - bits1)) - 1)]
+        if entry is None:
+            raise ParserError("LZX: invalid Huffman code")
+        self.bitcount -= entry[0]
+        return entry[2]
+
+    def readBytes(self, size):
+        """Read bytes of an uncompressed block"""
+        while len(self.data) < self.pos + size:
+            if not self._fill():
+                raise ParserError("LZX: unexpected end of data")
+        data = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return data
+
+    def alignBytes(self):
+        """
+        Skip 1 to 16 bits to align the input on 16 bits, and drop the bit
+        buffer to read bytes.
+        """
+        if not self.bitcount:
+            self._refill()
+        if self.padding:
+            raise ParserError("LZX: unexpected end of data")
+        self.bitcount -= (self.bitcount % 16) or 16
+        self.pos -= self.bitcount // 8
+        self.bitbuf = self.bitcount = 0
+
+    def readLengths(self, lengths, start, end):
+        """Read the lengths start..end of a tree encoded with a pretree"""
+        pretree = build_tree([self.readBits(4) for i in range(20)])
+        i = start
+        while i < end:
+            code = self.readSymbol(pretree)
+            if code <= 16:
+                lengths[i] = (lengths[i] - code) % 17
+                i += 1
+                continue
+            if code == 17:
+                count = 4 + self.readBits(4)
+                value = 0
+            elif code == 18:
+                count = 20 + self.readBits(5)
+                value = 0
+            else:
+                count = 4 + self.readBits(1)
+                code = self.readSymbol(pretree)
+                if 16 < code:
+                    raise ParserError("LZX: invalid pretree code %s" % code)
+                value = (lengths[i] - code) % 17
+            count = min(count, end - i)
+            lengths[i:i + count] = [value] * count
+            i += count
+
+    def readBlockHeader(self):
+        self.block_type = self.readBits(3)
+        self.block_length = self.block_remaining = self.readBits(24)
+        if self.block_type in (1, 2):
+            if self.block_type == 2:
+                self.aligned_tree = build_tree(
+                    [self.readBits(3) for i in range(8)])
+            self.readLengths(self.main_lengths, 0, 256)
+            self.readLengths(self.main_lengths, 256, self.main_size)
+            self.main_tree = build_tree(self.main_lengths)
+            if self.main_lengths[0xE8]:
+                self.intel_started = True
+            self.readLengths(self.length_lengths, 0, LZX_LENGTH_SIZE)
+            self.length_tree = build_tree(self.length_lengths)
+        elif self.block_type == 3:
+            self.intel_started = True
+            self.alignBytes()
+            self.r0, self.r1, self.r2 = struct.unpack("<3I", self.readBytes(12))
+        else:
+            raise ParserError("Unknown block type %d!" % self.block_type)
+
+    def decodeMatches(self, count):
+        """
+        Decode at least count bytes of a verbatim or aligned offset block
+        into the window. Return the number of decoded bytes: the last match
+        can be longer than count.
+        """
+        window = self.window
+        append = window.append
+        main_bits1, main_table = self.main_tree.table()
+        main_length = self.main_tree.max_length
+        main_shift = main_length - main_bits1
+        main_mask = (1 << main_length) - 1
+        main_mask2 = (1 << main_shift) - 1
+        length_tree = self.length_tree
+        aligned = (self.block_type == 2)
+        r0, r1, r2 = self.r0, self.r1, self.r2
+        data = self.data
+        pos = self.pos
+        end = len(data)
+        bitbuf = self.bitbuf
+        bitcount = self.bitcount
+
+        decoded = 0
+        while decoded < count:
+            # Fill the bit buffer: a match needs at most 53 bits (main and
+            # length symbols: 16 bits each, aligned offset: 14 extra bits and
+            # a 7 bits aligned symbol, verbatim offset: 17 extra bits)
+            while bitcount < 53:
+                if pos + 4 <= end:
+                    bitbuf = ((bitbuf & ((1 << bitcount) - 1)) << 32) \
+                        | (data[pos + 1] << 24) | (data[pos] << 16) \
+                        | (data[pos + 3] << 8) | data[pos + 2]
+                    pos += 4
+                    bitcount += 32
+                else:
+                    self.pos, self.bitbuf, self.bitcount = pos, bitbuf, bitcount
+                    self._refill(53)
+                    data = self.data
+                    pos, bitbuf, bitcount = self.pos, self.bitbuf, self.bitcount
+                    end = len(data)
+
+            bits = (bitbuf >> (bitcount - main_length)) & main_mask
+            entry = main_table[bits >> main_shift]
+            if entry.__class__ is list:
+                entry = entry[bits & main_mask2]
+            if entry is None:
+                raise ParserError("LZX: invalid Huffman code")
+            bitcount -= entry[0]
+            symbol = entry[2]
+            if symbol < 256:
+                append(symbol)
+                decoded += 1
+                continue
+
+            slot, length = divmod(symbol - 256, 8)
+            if length == 7:
+                self.pos, self.bitbuf, self.bitcount = pos, bitbuf, bitcount
+                length = self.readSymbol(length_tree) + 9
+                data = self.data
+                pos, bitbuf, bitcount = self.pos, self.bitbuf, self.bitcount
+                end = len(data)
+            else:
+                length += 2
+
+            if slot < 3:
+                if slot == 0:
+                    position = r0
+                elif slot == 1:
+                    position = r1
+                    r1 = r0
+                    r0 = position
+                else:
+                    position = r2
+                    r2 = r0
+                    r0 = position
+            else:
+                extra = POSITION_EXTRA[slot]
+                position = POSITION_BASE[slot] - 2
+                if aligned and 3 <= extra:
+                    if 3 < extra:
+                        bitcount -= extra - 3
+                        position += ((bitbuf >> bitcount)
+                                     & ((1 << (extra - 3)) - 1)) << 3
+                    self.pos, self.bitbuf, self.bitcount = \
+                        pos, bitbuf, bitcount
+                    position += self.readSymbol(self.aligned_tree)
+                    data = self.data
+                    pos, bitbuf, bitcount = \
+                        self.pos, self.bitbuf, self.bitcount
+                    end = len(data)
+                elif extra:
+                    bitcount -= extra
+                    position += (bitbuf >> bitcount) & ((1 << extra) - 1)
+                r2 = r1
+                r1 = r0
+                r0 = position
+
+            if len(window) < position or not position:
+                raise ParserError("LZX: invalid match position %s" % position)
+            extend_data(window, length, position)
+            decoded += length
+
+        self.r0, self.r1, self.r2 = r0, r1, r2
+        self.pos, self.bitbuf, self.bitcount = pos, bitbuf, bitcount
+        return decoded
+
+    def intelTranslate(self, data, start):
+        """
+        Undo the Intel E8 (CALL) preprocessing on the data of a frame.
+        start is the offset of the frame in the uncompressed data.
+        """
+        filesize = self.intel_filesize
+        end = len(data) - 10
+        index = data.find(b"\xE8", 0, end)
+        while 0 <= index:
+            abs_off, = struct.unpack_from("<i", data, index + 1)
+            current = start + index
+            if -current <= abs_off < filesize:
+                if abs_off < 0:
+                    rel_off = abs_off + filesize
+                else:
+                    rel_off = abs_off - current
+                struct.pack_into("<i", data, index + 1, rel_off)
+            index = data.find(b"\xE8", index + 5, end)
+
+    def decodeFrame(self):
+        """
+        Decode the next frame: return its uncompressed data (bytes), or an
+        empty string at the end.
+        """
+        if self.finished:
+            return b''
+        start = self.frame * LZX_FRAME_SIZE
+        end = start + LZX_FRAME_SIZE
+        if self.output_size is not None:
+            end = min(end, self.output_size)
+        if self.reset_interval and self.frame % self.reset_interval == 0:
+            self.resetState()
+        if not self.header_read:
+            if self.readBits(1):
+                high = self.readBits(16)
+                self.intel_filesize = (high << 16) | self.readBits(16)
+            else:
+                self.intel_filesize = 0
+            self.header_read = True
+
+        window = self.window
+        while self.window_start + len(window) < end:
+            if not self.block_remaining:
+                if self.output_size is None and self.bitsLeft() < 16:
+                    break
+                self.readBlockHeader()
+                continue
+            count = min(self.block_remaining,
+                        end - self.window_start - len(window))
+            if self.block_type == 3:
+                window += self.readBytes(count)
+                self.block_remaining -= count
+                if not self.block_remaining and self.block_length % 2:
+                    self.readBytes(1)
+            else:
+                decoded = self.decodeMatches(count)
+                if self.block_remaining < decoded:
+                    raise ParserError("LZX: match beyond the end of block")
+                self.block_remaining -= decoded
+
+        # Align the input on 16 bits
+        self.bitcount -= self.bitcount % 16
+
+        end = min(end, self.window_start + len(window))
+        if end <= start:
+            self.finished = True
+            return b''
+        data = window[start - self.window_start:end - self.window_start]
+        if self.intel_started and self.intel_filesize \
+                and self.frame < 32768 and 10 < len(data):
+            self.intelTranslate(data, start)
+        self.frame += 1
+        if self.output_size is not None and self.output_size <= end:
+            self.finished = True
+
+        # Forget data older than the window
+        if 2 * self.window_size <= len(window):
+            size = len(window) - self.window_size
+            del window[:size]
+            self.window_start += size
+        return bytes(data)
+
+    def decompress(self):
+        """Decompress all data"""
+        frames = []
+        while True:
+            data = self.decodeFrame()
+            if not data:
+                break
+            frames.append(data)
+        return b''.join(frames)
+
+    def __call__(self, size, data=None):
+        # Decompressor of CompressedField(): data is ignored since the
+        # compressed data are read from the stream
+        frames = []
+        while 0 < size:
+            frame = self.decodeFrame()
+            if not frame:
+                break
+            frames.append(frame)
+            size -= len(frame)
+        return b''.join(frames)
+
+
+def LZX(field, window_bits, reset_interval=0, output_size=None):
+    """
+    Decompress the content of field with LZX: see LZXDecompressor and
+    CompressedField().
+    """
+    def createDecompressor(stream):
+        return LZXDecompressor(stream, window_bits, reset_interval,
+                               output_size)
+    return CompressedField(field, createDecompressor)
+
+
+def lzx_decompress(stream, window_bits, output_size=None):
+    return LZXDecompressor(stream, window_bits,
+                           output_size=output_size).decompress()
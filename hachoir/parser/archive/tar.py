@@ -95,7 +95,10 @@ class TarFile(Parser):
         "file_ext": ("tar",),
         "mime": ("application/x-tar", "application/x-gtar"),
         "min_size": 512 * 8,
-        "magic": ((b"ustar  \0", 257 * 8),),
+        "magic": (
+            (b"ustar\x0000", 257 * 8),  # POSIX
+            (b"ustar  \0", 257 * 8),    # GNU
+        ),
         "subfile": "skip",
         "description": "TAR archive",
     }
@@ -12,6 +12,7 @@ from hachoir.field import (Bit, Bits, Field, UInt16, UInt32,
 from hachoir.core.endian import LITTLE_ENDIAN
 from hachoir.core.text_handler import textHandler, hexadecimal
 from hachoir.core.tools import paddingSize, alignValue
+from hachoir.stream.input import ReadStreamError
 
 
 def extend_data(data: bytearray, length, offset):
@@ -23,10 +24,125 @@ def extend_data(data: bytearray, length, offset):
         data += data[-offset:-offset + length]
 
 
+# Number of bits of the first level of Huffman decoding tables
+HUFFMAN_TABLE_BITS = 9
+
+
+def reverse_bits(value, nbits):
+    """Reverse the order of the nbits lowest bits of value.
+
+    >>> reverse_bits(0b1101, 5)
+    22
+    """
+    result = 0
+    for i in range(nbits):
+        result = (result << 1) | (value & 1)
+        value >>= 1
+    return result
+
+
+class HuffmanTree(dict):
+    """Huffman tree: dictionary (length, code) => value, see build_tree().
+
+    Decoding tables are created on demand: lookup() decodes a code from the
+    max_length next bits of the stream, instead of reading the code bit per
+    bit. The first level table is indexed by the HUFFMAN_TABLE_BITS first
+    bits, codes longer than that are decoded by a second level table.
+    """
+
+    def __init__(self, *args, **kw):
+        dict.__init__(self, *args, **kw)
+        self.max_length = max((length for length, code in self), default=0)
+        self._tables = {}
+
+    def _createTable(self, lsb_first):
+        max_length = self.max_length
+        bits1 = min(max_length, HUFFMAN_TABLE_BITS)
+        bits2 = max_length - bits1
+        table = [None] * (1 << bits1)
+        for (length, code), value in self.items():
+            if code >> length:
+                # over-subscribed lengths (invalid data): the code
+                # can never be read
+                continue
+            entry = (length, code, value)
+            if lsb_first:
+                code = reverse_bits(code, length)
+            if length <= bits1:
+                if lsb_first:
+                    indexes = (code | (x << length)
+                               for x in range(1 << (bits1 - length)))
+                else:
+                    indexes = ((code << (bits1 - length)) | x
+                               for x in range(1 << (bits1 - length)))
+                for index in indexes:
+                    table[index] = entry
+                continue
+            extra = length - bits1
+            if lsb_first:
+                prefix = code & ((1 << bits1) - 1)
+                code >>= bits1
+            else:
+                prefix = code >> extra
+                code &= (1 << extra) - 1
+            subtable = table[prefix]
+            if not isinstance(subtable, list):
+                subtable = table[prefix] = [None] * (1 << bits2)
+            for x in range(1 << (max_length - length)):
+                if lsb_first:
+                    subtable[code | (x << extra)] = entry
+                else:
+                    subtable[(code << (max_length - length)) | x] = entry
+        return (bits1, table)
+
+    def table(self, lsb_first=False):
+        """Get the decoding table: (bits1, table) where table is indexed by
+        the bits1 first bits. An entry is (length, code, value), None for
+        an invalid code, or a second level table (list) indexed by the
+        (max_length - bits1) next bits."""
+        try:
+            return self._tables[lsb_first]
+        except KeyError:
+            table = self._tables[lsb_first] = self._createTable(lsb_first)
+            return table
+
+    def lookup(self, bits, lsb_first=False):
+        """Decode a code from bits, the max_length next bits of the stream.
+        If lsb_first is True, the first bit is the least significant bit of
+        bits, otherwise it is the most significant bit.
+
+        Return (length, code, value), or None if bits don't start with a
+        valid code."""
+        bits1, table = self.table(lsb_first)
+        bits2 = self.max_length - bits1
+        if lsb_first:
+            entry = table[bits & ((1 << bits1) - 1)]
+            if isinstance(entry, list):
+                entry = entry[bits >> bits1]
+        else:
+            entry = table[bits >> bits2]
+            if isinstance(entry, list):
+                entry = entry[bits & ((1 << bits2) - 1)]
+        return entry
+
+    def decode(self, stream, address, endian):
+        """Decode the code at address (in bits) of the stream.
+        Return (length, code, value), or None if the code can't be decoded
+        using the tables (eg. near the end of the stream)."""
+        if not self.max_length:
+            return None
+        try:
+            bits = stream.readBits(address, self.max_length, endian)
+        except ReadStreamError:
+            return None
+        return self.lookup(bits, endian is LITTLE_ENDIAN)
+
+
 def build_tree(lengths):
     """Build a Huffman tree from a list of lengths.
        The ith entry of the input list is the length of the Huffman code corresponding to
-       integer i, or 0 if the integer i is unused."""
+       integer i, or 0 if the integer i is unused.
+       Return a HuffmanTree."""
     max_length = max(lengths) + 1
     bit_counts = [0] * max_length
     next_code = [0] * max_length
@@ -41,7 +157,12 @@ def build_tree(lengths):
         if ln:
             tree[(ln, next_code[ln])] = i
             next_code[ln] += 1
-    return tree
+    return HuffmanTree(tree)
+
+
+# Trees of the fixed Huffman codes of deflate (RFC 1951, 3.2.6)
+FIXED_LENGTH_TREE = build_tree([8] * 144 + [9] * 112 + [7] * 24 + [8] * 8)
+FIXED_DISTANCE_TREE = build_tree([5] * 32)
 
 
 class HuffmanCode(Field):
@@ -54,6 +175,12 @@ class HuffmanCode(Field):
         stream = self.parent.stream
         addr = self.absolute_address
 
+        if isinstance(tree, HuffmanTree):
+            entry = tree.decode(stream, addr, endian)
+            if entry is not None:
+                self._size, self.huffvalue, self.realvalue = entry
+                return
+
         value = 0
         while (self.size, value) not in tree:
             if self.size > 256:
@@ -159,18 +286,8 @@ class DeflateBlock(FieldSet):
                 yield RawBytes(self, "data", self["len"].value, "Uncompressed data")
             return
         elif self["compression_type"].value == 1:  # Fixed Huffman
-            length_tree = {}  # (size, huffman code): value
-            distance_tree = {}
-            for i in range(144):
-                length_tree[(8, i + 48)] = i
-            for i in range(144, 256):
-                length_tree[(9, i + 256)] = i
-            for i in range(256, 280):
-                length_tree[(7, i - 256)] = i
-            for i in range(280, 288):
-                length_tree[(8, i - 88)] = i
-            for i in range(32):
-                distance_tree[(5, i)] = i
+            length_tree = FIXED_LENGTH_TREE
+            distance_tree = FIXED_DISTANCE_TREE
         elif self["compression_type"].value == 2:  # Dynamic Huffman
             yield Bits(self, "huff_num_length_codes", 5, "Number of Literal/Length Codes, minus 257")
             yield Bits(self, "huff_num_distance_codes", 5, "Number of Distance Codes, minus 1")
@@ -10,11 +10,35 @@ Creation date: 2008-04-09
 """
 
 from hachoir.parser import Parser
-from hachoir.field import FieldSet, String, Bit, Bits, UInt16, UInt24, RawBytes, Enum, NullBytes
-from hachoir.stream import BIG_ENDIAN, LITTLE_ENDIAN
+from hachoir.field import (Field, FieldSet, ParserError, createOrphanField,
+                           String, Bit, Bits, UInt8, UInt16, UInt24, RawBytes,
+                           Enum, NullBytes)
+from hachoir.stream import BIG_ENDIAN, LITTLE_ENDIAN, InputStreamError
 from hachoir.core.tools import createDict
+from hachoir.core.text_handler import textHandler, hexadecimal
 from hachoir.parser.container.ogg import parseVorbisComment
 
+# Maximum size in bytes of the end of the file scanned to find the last frame
+MAX_TAIL_SIZE = 4 * 1024 * 1024
+
+
+def crc8(data):
+    """
+    CRC-8 of the frame headers (polynomial x^8 + x^2 + x + 1).
+
+    >>> hex(crc8(b"\\xff\\xf8\\x59\\xa8\\x00"))
+    '0x24'
+    """
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for bit in range(8):
+            if crc & 0x80:
+                crc = ((crc << 1) ^ 0x07) & 0xFF
+            else:
+                crc <<= 1
+    return crc
+
 
 class VorbisComment(FieldSet):
     endian = LITTLE_ENDIAN
@@ -105,6 +129,33 @@ class Metadata(FieldSet):
                 break
 
 
+class UTF8Number(Field):
+    """
+    Frame or sample number coded like an UTF-8 character: up to 36 bits
+    stored in 1 to 7 bytes.
+    """
+
+    def __init__(self, parent, name, description=None):
+        Field.__init__(self, parent, name, description=description)
+        addr = self.absolute_address
+        value = parent.stream.readBits(addr, 8, BIG_ENDIAN)
+        count = 0
+        if value & 0x80:
+            while count < 7 and value & (0x40 >> count):
+                count += 1
+            if not count or count == 7:
+                raise ParserError("FLAC: Invalid frame number coding")
+            value &= 0x3F >> count
+        for index in range(count):
+            addr += 8
+            byte = parent.stream.readBits(addr, 8, BIG_ENDIAN)
+            if byte & 0xC0 != 0x80:
+                raise ParserError("FLAC: Invalid frame number coding")
+            value = (value << 6) | (byte & 0x3F)
+        self._size = (1 + count) * 8
+        self.createValue = lambda: value
+
+
 class Frame(FieldSet):
     SAMPLE_RATES = {
         0: "get from STREAMINFO metadata block",
@@ -133,7 +184,51 @@ class Frame(FieldSet):
         yield Bits(self, "channel_assign", 4)
         yield Bits(self, "sample_size", 3)
         yield Bit(self, "reserved[]")
-        # FIXME: Finish frame header parser
+        if self["blocking_strategy"].value:
+            yield UTF8Number(self, "sample_number", "Number of the first sample")
+        else:
+            yield UTF8Number(self, "frame_number", "Frame number")
+        block_size = self["block_size"].value
+        if block_size == 6:
+            yield UInt8(self, "block_size_value", "Block size minus one")
+        elif block_size == 7:
+            yield UInt16(self, "block_size_value", "Block size minus one")
+        sample_rate = self["sample_rate"].value
+        if sample_rate == 12:
+            yield UInt8(self, "sample_rate_value")
+        elif sample_rate in (13, 14):
+            yield UInt16(self, "sample_rate_value")
+        yield textHandler(UInt8(self, "crc8", "CRC-8 of the frame header"),
+                          hexadecimal)
+        # FIXME: Parse subframes
+
+    def getBlockSize(self):
+        """
+        Get the number of samples of the frame, or None if the block size
+        code is reserved.
+        """
+        block_size = self["block_size"].value
+        if block_size == 1:
+            return 192
+        elif 2 <= block_size <= 5:
+            return 576 << (block_size - 2)
+        elif block_size in (6, 7):
+            return self["block_size_value"].value + 1
+        elif 8 <= block_size:
+            return 256 << (block_size - 8)
+        return None
+
+    def isValid(self):
+        if self["sync"].value != 0x3FFE \
+                or self["reserved[0]"].value or self["reserved[1]"].value:
+            return False
+        if not self["block_size"].value or self["sample_rate"].value == 15 \
+                or 10 < self["channel_assign"].value \
+                or self["sample_size"].value in (3, 7):
+            return False
+        header = self.stream.readBytes(self.absolute_address,
+                                       self.size // 8 - 1)
+        return crc8(header) == self["crc8"].value
 
 
 class Frames(FieldSet):
@@ -168,3 +263,32 @@ class FlacParser(Parser):
         yield String(self, "signature", 4, charset="ASCII", description="FLAC signature: fLaC string")
         yield Metadata(self, "metadata")
         yield Frames(self, "frames")
+
+    def createLastFrame(self):
+        """
+        Find the last frame: the end of the file is scanned backward for a
+        valid frame header, other frames are not read.
+
+        Return None if no frame is found.
+        """
+        size = self.stream.size
+        if size is None or "frames/frame[0]" not in self:
+            return None
+        if self["frames/frame[0]/blocking_strategy"].value:
+            sync = b"\xff\xf9"
+        else:
+            sync = b"\xff\xf8"
+        start = max(self["frames"].absolute_address,
+                    size - MAX_TAIL_SIZE * 8)
+        end = size
+        while True:
+            offset = self.stream.searchBytesBackward(sync, start, end)
+            if offset is None:
+                return None
+            end = offset + 8
+            try:
+                frame = createOrphanField(self, offset, Frame, "frame")
+                if frame.isValid():
+                    return frame
+            except (InputStreamError, ParserError):
+                pass
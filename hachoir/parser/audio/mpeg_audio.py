@@ -20,6 +20,12 @@ from hachoir.stream import InputStreamError
 # Max MP3 filesize: 200 MB
 MAX_FILESIZE = 200 * 1024 * 1024 * 8
 
+# Maximum size in bytes of the end of the frames scanned to find the last frame
+MAX_TAIL_SIZE = 64 * 1024
+
+# Signatures of the tags stored after the frames (ID3v1, APEv2, Lyrics3)
+TRAILING_TAGS = (b"TAG", b"APETAGEX", b"LYRICSBEGIN")
+
 
 class Frame(FieldSet):
     VERSION_NAME = {0: "2.5", 2: "2", 3: "1"}
@@ -247,6 +253,51 @@ class Frames(FieldSet):
                 break
         return True
 
+    def createLastFrame(self):
+        """
+        Find the last complete frame: the end of the frames is scanned
+        backward, other frames are not read. A frame is accepted if it is
+        similar to the first frame and if it is followed by the end of the
+        frames, by another (truncated) frame or by a tag.
+
+        Return None if no frame is found.
+        """
+        stream = self.stream
+        first = self["frame[0]"]
+        address0 = self.absolute_address
+        end = address0 + self.size
+        start = max(address0, end - MAX_TAIL_SIZE * 8)
+        search_end = end
+        candidates = set()
+        while True:
+            address = stream.searchBytesBackward(b"\xff", start, search_end)
+            if address is None:
+                return None
+            search_end = address
+            if end < address + 32:
+                # truncated frame header
+                continue
+            try:
+                frame = createOrphanField(self, address - address0,
+                                          Frame, "frame")
+                if not frame.isValid():
+                    continue
+                for key in ("version", "layer", "sampling_rate"):
+                    if frame[key].value != first[key].value:
+                        break
+                else:
+                    frame_end = address + frame.getFrameSize() * 8
+                    candidates.add(address)
+                    if frame_end == end or frame_end in candidates:
+                        return frame
+                    if frame_end < end and any(
+                            stream.readBytes(frame_end, len(tag)) == tag
+                            for tag in TRAILING_TAGS
+                            if frame_end + len(tag) * 8 <= end):
+                        return frame
+            except (InputStreamError, ParserError):
+                pass
+
     def createFields(self):
         # Find synchronisation bytes
         padding = self.synchronize()
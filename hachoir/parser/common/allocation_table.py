@@ -0,0 +1,76 @@
+"""
+Allocation tables of file systems (FAT, OLE2 compound files): entry N of
+the table is the index of the block following block N, a file is stored in
+a chain of blocks.
+
+Tables are decoded at once into an array.array, chains are then resolved
+without creating a field per entry.
+"""
+from hachoir.core.endian import BIG_ENDIAN, LITTLE_ENDIAN
+from hachoir.field.vector import arrayTypecode
+from array import array
+import sys
+
+
+def readAllocationTable(stream, address, size, entry_size,
+                        endian=LITTLE_ENDIAN, table=None):
+    """
+    Read an allocation table of size bytes at address (in bits) of the
+    stream. Entries are unsigned integers of entry_size bits: 12 (FAT12,
+    little endian), 16 or 32. If the stream is truncated, only the complete
+    entries are read.
+
+    Entries are appended to table if it is set, otherwise a new array is
+    created. Return the table.
+    """
+    if endian not in (BIG_ENDIAN, LITTLE_ENDIAN) \
+            or (entry_size == 12 and endian != LITTLE_ENDIAN):
+        raise ValueError("Unsupported allocation table endian: %s" % endian)
+    if entry_size == 12:
+        typecode = "H"
+    else:
+        typecode = arrayTypecode(entry_size // 8, False)
+    if table is None:
+        table = array(typecode)
+    if stream.size is not None:
+        size = max(0, min(size, (stream.size - address) // 8))
+    shift, data, missing = stream.read(address, size * 8)
+    if entry_size == 12:
+        data = data[:len(data) // 3 * 3]
+        values = array(typecode, bytes(len(data) // 3 * 4))
+        low, middle, high = data[0::3], data[1::3], data[2::3]
+        values[0::2] = array(typecode, (byte0 | (byte1 & 15) << 8
+                                        for byte0, byte1 in zip(low, middle)))
+        values[1::2] = array(typecode, (byte1 >> 4 | byte2 << 4
+                                        for byte1, byte2 in zip(middle, high)))
+        table.extend(values)
+        return table
+    item_size = entry_size // 8
+    values = array(typecode, data[:len(data) // item_size * item_size])
+    if (endian == LITTLE_ENDIAN) != (sys.byteorder == "little"):
+        values.byteswap()
+    table.extend(values)
+    return table
+
+
+def chainExtents(chain):
+    """
+    Merge the consecutive blocks of a chain: generate (first block, number
+    of blocks) tuples. The chain is read lazily, so errors are raised when
+    the extent containing the invalid block is reached.
+
+    >>> list(chainExtents([3, 4, 5, 9, 10, 2]))
+    [(3, 3), (9, 2), (2, 1)]
+    """
+    first = None
+    count = 0
+    for block in chain:
+        if first is not None and block == first + count:
+            count += 1
+            continue
+        if first is not None:
+            yield (first, count)
+        first = block
+        count = 1
+    if first is not None:
+        yield (first, count)
@@ -0,0 +1,159 @@
+"""
+Read the files of a file system without creating fields.
+
+A file is identified by its path ("/dir/file") or by its inode, an object
+identifying a file in the file system (eg. the inode number for EXT2).
+Directories are listed and files are read directly from the stream: only
+the inodes on the path of a file are read.
+"""
+from hachoir.stream import ExtentStream
+
+# Maximum size in bytes of the chunks generated by FileTree.iterFileData()
+READ_CHUNK_SIZE = 1 << 20
+
+
+def mergeExtents(extents):
+    """
+    Merge contiguous extents: (address, size) in bits, address is None for
+    a hole.
+
+    >>> mergeExtents([(0, 8), (8, 16), (None, 8), (None, 8), (80, 8)])
+    [(0, 24), (None, 16), (80, 8)]
+    """
+    merged = []
+    for address, size in extents:
+        if merged:
+            last_address, last_size = merged[-1]
+            if (address is None and last_address is None) \
+                    or (address is not None and last_address is not None
+                        and last_address + last_size == address):
+                merged[-1] = (last_address, last_size + size)
+                continue
+        merged.append((address, size))
+    return merged
+
+
+def truncateExtents(extents, size):
+    """
+    Truncate a list of extents to size bits.
+
+    >>> truncateExtents([(0, 16), (64, 16)], 24)
+    [(0, 16), (64, 8)]
+    """
+    truncated = []
+    for address, extent_size in extents:
+        if size <= 0:
+            break
+        truncated.append((address, min(extent_size, size)))
+        size -= extent_size
+    return truncated
+
+
+class FileTree:
+    """
+    Mixin class of file system parsers giving access to the directory tree
+    and to the content of files. Parsers implement:
+
+    - getRootInode(): inode of the root directory
+    - listDirectory(inode): generate (name, inode, is_directory) for the
+      entries of a directory, except "." and ".."
+    - getInodeExtents(inode): (extents, size) where extents is the list
+      of (address, size) in bits of the data of the file (address is None
+      for a hole) and size is the file size in bits
+    """
+
+    def getRootInode(self):
+        raise NotImplementedError()
+
+    def listDirectory(self, inode):
+        raise NotImplementedError()
+
+    def getInodeExtents(self, inode):
+        raise NotImplementedError()
+
+    def lookup(self, path):
+        """
+        Get the inode of a file from its path, or None if the file doesn't
+        exist. Only the directories of the path are read.
+        """
+        inode = self.getRootInode()
+        is_directory = True
+        for name in path.split("/"):
+            if not name:
+                continue
+            if not is_directory:
+                return None
+            for entry_name, entry_inode, entry_is_directory \
+                    in self.listDirectory(inode):
+                if entry_name == name:
+                    inode = entry_inode
+                    is_directory = entry_is_directory
+                    break
+            else:
+                return None
+        return inode
+
+    def walk(self, path="/"):
+        """
+        Generate (path, inode, is_directory) for the files and directories
+        of the tree starting at path. A directory is generated before its
+        content.
+        """
+        inode = self._getInode(path)
+        directories = [(path.rstrip("/"), inode)]
+        visited = {inode}
+        while directories:
+            path, inode = directories.pop()
+            subdirectories = []
+            for name, entry, is_directory in self.listDirectory(inode):
+                entry_path = "%s/%s" % (path, name)
+                yield (entry_path, entry, is_directory)
+                if is_directory and entry not in visited:
+                    visited.add(entry)
+                    subdirectories.append((entry_path, entry))
+            directories.extend(reversed(subdirectories))
+
+    def _getInode(self, file):
+        if not isinstance(file, str):
+            return file
+        inode = self.lookup(file)
+        if inode is None:
+            raise KeyError("No such file: %s" % file)
+        return inode
+
+    def getFileExtents(self, file):
+        """
+        Get the extents of a file (path or inode): list of (address, size)
+        in bits of contiguous data, address is None for a hole. The sum of
+        the sizes is the file size.
+        """
+        extents, size = self.getInodeExtents(self._getInode(file))
+        return truncateExtents(mergeExtents(extents), size)
+
+    def openFile(self, file):
+        """
+        Create an input stream of the content of a file (path or inode).
+        Raise a NullStreamError if the file is empty.
+        """
+        if isinstance(file, str):
+            source = "%s:%s" % (self.stream.source, file)
+        else:
+            source = "%s:inode %s" % (self.stream.source, file)
+        return ExtentStream(self.stream, self.getFileExtents(file),
+                            source=source)
+
+    def iterFileData(self, file, chunk_size=READ_CHUNK_SIZE):
+        """
+        Generate the content of a file (path or inode) in chunks of at most
+        chunk_size bytes. Contiguous data is read at once.
+        """
+        for address, size in self.getFileExtents(file):
+            size //= 8
+            while size:
+                length = min(size, chunk_size)
+                if address is None:
+                    yield bytes(length)
+                else:
+                    yield self.stream.readBytes(address, length)
+                    address += length * 8
+                size -= length
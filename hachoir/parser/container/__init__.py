@@ -1,7 +1,12 @@
-from hachoir.parser.container.asn1 import ASN1File  # noqa
-from hachoir.parser.container.mkv import MkvFile  # noqa
-from hachoir.parser.container.ogg import OggFile, OggStream  # noqa
-from hachoir.parser.container.riff import RiffFile  # noqa
-from hachoir.parser.container.swf import SwfFile  # noqa
-from hachoir.parser.container.realmedia import RealMediaFile  # noqa
-from hachoir.parser.container.mp4 import MP4File  # noqa
+from hachoir.core.lazy import lazyModule
+
+__getattr__, __dir__ = lazyModule(__name__, {
+    "ASN1File": "asn1",
+    "MkvFile": "mkv",
+    "OggFile": "ogg",
+    "OggStream": "ogg",
+    "RiffFile": "riff",
+    "SwfFile": "swf",
+    "RealMediaFile": "realmedia",
+    "MP4File": "mp4",
+})
@@ -23,7 +23,7 @@ from hachoir.field import (ParserError, FieldSet, MissingField,
                            Enum,
                            Bit, NullBits, Bits, UInt8, Int16, UInt16, UInt24, Int32, UInt32, Int64, UInt64, TimestampMac32,
                            String, PascalString8, PascalString16, CString,
-                           RawBytes, NullBytes)
+                           RawBytes, NullBytes, IntegerArray)
 from hachoir.field.timestamp import timestampFactory
 from hachoir.core.endian import BIG_ENDIAN
 from hachoir.core.text_handler import textHandler
@@ -754,9 +754,10 @@ class SampleDecodeTimeTable(FieldSet):
         yield UInt8(self, "version")
         yield NullBits(self, "flags", 24)
         yield UInt32(self, "count", description="Total entries in sample time table")
-        for i in range(self['count'].value):
-            yield UInt32(self, "sample_count[]", "Number of consecutive samples with this delta")
-            yield UInt32(self, "sample_delta[]", "Decode time delta since last sample, in time-units")
+        if self['count'].value:
+            yield IntegerArray(self, "entries", 2 * self['count'].value, UInt32,
+                               "(sample count, sample delta) pairs: number of consecutive samples with this delta, "
+                               "decode time delta since last sample in time-units")
 
 
 class SampleCompositionTimeTable(FieldSet):
@@ -765,9 +766,10 @@ class SampleCompositionTimeTable(FieldSet):
         yield UInt8(self, "version")
         yield NullBits(self, "flags", 24)
         yield UInt32(self, "count", description="Total entries in sample time table")
-        for i in range(self['count'].value):
-            yield UInt32(self, "sample_count[]", "Number of consecutive samples with this offset")
-            yield UInt32(self, "sample_offset[]", "Difference between decode time and composition time of this sample, in time-units")
+        if self['count'].value:
+            yield IntegerArray(self, "entries", 2 * self['count'].value, UInt32,
+                               "(sample count, sample offset) pairs: number of consecutive samples with this offset, "
+                               "difference between decode time and composition time in time-units")
 
 
 class ChunkOffsetTable(FieldSet):
@@ -776,8 +778,8 @@ class ChunkOffsetTable(FieldSet):
         yield UInt8(self, "version")
         yield NullBits(self, "flags", 24)
         yield UInt32(self, "count", description="Total entries in offset table")
-        for i in range(self['count'].value):
-            yield UInt32(self, "chunk_offset[]")
+        if self['count'].value:
+            yield IntegerArray(self, "chunk_offset", self['count'].value, UInt32)
 
 
 class ChunkOffsetTable64(FieldSet):
@@ -786,8 +788,8 @@ class ChunkOffsetTable64(FieldSet):
         yield UInt8(self, "version")
         yield NullBits(self, "flags", 24)
         yield UInt32(self, "count", description="Total entries in offset table")
-        for i in range(self['count'].value):
-            yield UInt64(self, "chunk_offset[]")
+        if self['count'].value:
+            yield IntegerArray(self, "chunk_offset", self['count'].value, UInt64)
 
 
 # ISO/IEC 14496-14:2003 5.6
@@ -943,8 +945,8 @@ class SyncSampleTable(FieldSet):
         yield UInt8(self, "version")
         yield NullBits(self, "flags", 24)
         yield UInt32(self, "count", description="Number of sync samples")
-        for i in range(self['count'].value):
-            yield UInt32(self, "sample_number[]")
+        if self['count'].value:
+            yield IntegerArray(self, "sample_number", self['count'].value, UInt32)
 
 
 class SampleSizeTable(FieldSet):
@@ -954,9 +956,8 @@ class SampleSizeTable(FieldSet):
         yield NullBits(self, "flags", 24)
         yield UInt32(self, "uniform_size", description="Uniform size of each sample (0 if non-uniform)")
         yield UInt32(self, "count", description="Number of samples")
-        if self['uniform_size'].value == 0:
-            for i in range(self['count'].value):
-                yield UInt32(self, "sample_size[]")
+        if self['uniform_size'].value == 0 and self['count'].value:
+            yield IntegerArray(self, "sample_size", self['count'].value, UInt32)
 
 
 class CompactSampleSizeTable(FieldSet):
@@ -981,10 +982,9 @@ class SampleToChunkTable(FieldSet):
         yield UInt8(self, "version")
         yield NullBits(self, "flags", 24)
         yield UInt32(self, "count", description="Number of samples")
-        for i in range(self['count'].value):
-            yield UInt32(self, "first_chunk[]")
-            yield UInt32(self, "samples_per_chunk[]")
-            yield UInt32(self, "sample_description_index[]")
+        if self['count'].value:
+            yield IntegerArray(self, "entries", 3 * self['count'].value, UInt32,
+                               "(first chunk, samples per chunk, sample description index) triples")
 
 
 # ISO/IEC 14496-12:2012 8.12.1
@@ -1246,6 +1246,18 @@ class Atom(FieldSet):
     tag_handler = [item[0] for item in tag_info]
     tag_desc = [item[1] for item in tag_info]
 
+    def createSize(self):
+        address = self.absolute_address
+        size = self.stream.readBits(address, 32, self.endian)
+        if size == 1:
+            size = self.stream.readBits(address + 64, 64, self.endian)
+            if size < 16:
+                return None
+        elif size < 8:
+            # unbounded (0) or invalid atom
+            return None
+        return size * 8
+
     def createFields(self):
         yield UInt32(self, "size")
         yield String(self, "tag", 4, charset="ASCII")
@@ -1288,7 +1300,12 @@ class MP4File(Parser):
         "file_ext": ("mov", "qt", "mp4", "m4v", "m4a", "m4p", "m4b"),
         "mime": ("video/quicktime", 'video/mp4'),
         "min_size": 8 * 8,
-        "magic": ((b"moov", 4 * 8),),
+        "magic": (
+            (b"ftyp", 4 * 8),
+            (b"moov", 4 * 8),
+            (b"free", 4 * 8),
+            (b"skip", 4 * 8),
+        ),
         "description": "Apple QuickTime movie"
     }
     BRANDS = {
@@ -13,9 +13,18 @@ from hachoir.stream import FragmentedStream, InputStreamError
 from hachoir.core.endian import LITTLE_ENDIAN, BIG_ENDIAN
 from hachoir.core.tools import humanDurationNanosec
 from hachoir.core.text_handler import textHandler, hexadecimal
+from struct import Struct
 
+# Maximum size in bytes of the end of the file scanned to find the last page
+MAX_TAIL_SIZE = 8 * 1024 * 1024
+
+# Maximum size in bytes of a physical stream, see findStreamEnd()
 MAX_FILESIZE = 1000 * 1024 * 1024
 
+# Page header: capture pattern, version, flags, granule position, serial,
+# page number, checksum, lacing size
+PAGE_HEADER = Struct("<4sBBqIIIB")
+
 
 class XiphInt(Field):
     """
@@ -319,34 +328,92 @@ class OggFile(Parser):
         while not self.eof:
             yield OggPage(self, "page[]")
 
-    def createLastPage(self):
-        start = self[0].size
-        end = MAX_FILESIZE * 8
-        if True:
-            # FIXME: This doesn't work on all files (eg. some Ogg/Theora)
-            offset = self.stream.searchBytes(b"OggS\0\5", start, end)
-            if offset is None:
-                offset = self.stream.searchBytes(b"OggS\0\4", start, end)
+    def createLastPage(self, serial=None, with_granule=False):
+        """
+        Find the last complete page: the end of the file is scanned backward,
+        other pages are not read. If serial is set, only consider the pages
+        of this logical stream. If with_granule is True, skip the pages
+        without granule position (no packet ends in the page).
+
+        Return None if no page is found.
+        """
+        stream = self.stream
+        size = stream.size
+        if size is None:
+            return None
+        start = max(0, size - MAX_TAIL_SIZE * 8)
+        end = size
+        while True:
+            offset = stream.searchBytesBackward(b"OggS\0", start, end)
             if offset is None:
                 return None
+            end = offset + 4 * 8
+            header = self.readPageHeader(offset)
+            if header is None:
+                continue
+            flags, granule, page_serial, page_size = header
+            if (serial is not None and page_serial != serial) \
+                    or (with_granule and granule == -1):
+                continue
             return createOrphanField(self, offset, OggPage, "page")
-        else:
-            # Very slow version
-            page = None
-            while True:
-                offset = self.stream.searchBytes(b"OggS\0", start, end)
+
+    def readPageHeader(self, offset):
+        """
+        Read the header of the page at offset (in bits) without creating
+        fields. Return (flags, granule position, serial, page size in bits),
+        or None if there is no valid and complete page at offset.
+        """
+        stream = self.stream
+        if not stream.sizeGe(offset + PAGE_HEADER.size * 8):
+            return None
+        signature, version, flags, granule, serial, page_number, \
+            checksum, lacing_size = PAGE_HEADER.unpack(
+                stream.readBytes(offset, PAGE_HEADER.size))
+        if signature != b"OggS" or version != 0 or flags & ~7:
+            return None
+        size = PAGE_HEADER.size + lacing_size
+        if not stream.sizeGe(offset + size * 8):
+            return None
+        size += sum(stream.readBytes(offset + PAGE_HEADER.size * 8,
+                                     lacing_size))
+        if not stream.sizeGe(offset + size * 8):
+            return None
+        return flags, granule, serial, size * 8
+
+    def findStreamEnd(self):
+        """
+        Find the end (address in bits) of the physical stream starting at
+        the beginning of the input: the end of the page closing the last
+        logical stream opened by the first pages. Pages are walked forward
+        by reading their header; data which is not a page is skipped.
+
+        Return None if the streams are not closed (eg. truncated file).
+        """
+        stream = self.stream
+        end = MAX_FILESIZE * 8
+        serials = set()
+        offset = 0
+        while offset < end:
+            header = self.readPageHeader(offset)
+            if header is None:
+                offset = stream.searchBytes(b"OggS\0", offset + 8, end)
                 if offset is None:
-                    break
-                page = createOrphanField(self, offset, OggPage, "page")
-                start += page.size
-            return page
+                    return None
+                continue
+            flags, granule, serial, size = header
+            offset += size
+            if flags & 2:
+                # first page of a logical stream
+                serials.add(serial)
+            if flags & 4:
+                # last page of a logical stream
+                serials.discard(serial)
+                if not serials:
+                    return offset
+        return None
 
     def createContentSize(self):
-        page = self.createLastPage()
-        if page:
-            return page.absolute_address + page.size
-        else:
-            return None
+        return self.findStreamEnd()
 
 
 class OggStream(Parser):
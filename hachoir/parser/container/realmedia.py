@@ -154,7 +154,11 @@ class RealMediaFile(Parser):
             "audio/x-real-audio",
             "application/vnd.rn-realmedia"),
         "min_size": len(MAGIC) * 8,  # just the identifier
-        "magic": ((MAGIC, 0),),
+        "magic": (
+            (MAGIC, 0),
+            # version=0
+            (MAGIC[:-1] + b'\0', 0),
+        ),
         "description": "RealMedia (rm) Container File",
     }
     endian = BIG_ENDIAN
@@ -386,13 +386,7 @@ class RiffFile(Parser):
         "file_ext": ("avi", "cda", "wav", "ani"),
         "min_size": 16 * 8,
         "mime": ("video/x-msvideo", "audio/x-wav", "audio/x-cda"),
-        # FIXME: Use regex "RIFF.{4}(WAVE|CDDA|AVI )"
-        "magic": (
-            (b"AVI LIST", 8 * 8),
-            (b"WAVEfmt ", 8 * 8),
-            (b"CDDAfmt ", 8 * 8),
-            (b"ACONanih", 8 * 8),
-        ),
+        "magic_regex": ((b"RIFF.{4}(?:WAVE|CDDA|AVI |ACON)", 0),),
         "description": "Microsoft RIFF container"
     }
     VALID_TYPES = {
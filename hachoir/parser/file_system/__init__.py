@@ -1,7 +1,13 @@
-from hachoir.parser.file_system.ext2 import EXT2_FS  # noqa
-from hachoir.parser.file_system.fat import FAT12, FAT16, FAT32  # noqa
-from hachoir.parser.file_system.mbr import MSDos_HardDrive  # noqa
-from hachoir.parser.file_system.ntfs import NTFS  # noqa
-from hachoir.parser.file_system.iso9660 import ISO9660  # noqa
-from hachoir.parser.file_system.reiser_fs import REISER_FS  # noqa
-from hachoir.parser.file_system.linux_swap import LinuxSwapFile  # noqa
+from hachoir.core.lazy import lazyModule
+
+__getattr__, __dir__ = lazyModule(__name__, {
+    "EXT2_FS": "ext2",
+    "FAT12": "fat",
+    "FAT16": "fat",
+    "FAT32": "fat",
+    "MSDos_HardDrive": "mbr",
+    "NTFS": "ntfs",
+    "ISO9660": "iso9660",
+    "REISER_FS": "reiser_fs",
+    "LinuxSwapFile": "linux_swap",
+})
@@ -20,7 +20,23 @@ from hachoir.field import (RootSeekableFieldSet, SeekableFieldSet, FieldSet, Par
 from hachoir.core.tools import (humanDuration, humanFilesize)
 from hachoir.core.endian import LITTLE_ENDIAN
 from hachoir.core.text_handler import textHandler
+from hachoir.parser.common.allocation_table import readAllocationTable
+from hachoir.parser.common.file_tree import FileTree
 from .linux_swap import UUID
+from struct import unpack_from
+
+# Inode number of the root directory
+ROOT_INODE = 2
+
+# Inode flags
+EXTENTS_FL = 0x80000
+INLINE_DATA_FL = 0x10000000
+
+# Magic number of an extent tree node
+EXTENT_MAGIC = 0xF30A
+
+# Maximum depth of an extent tree
+MAX_EXTENT_DEPTH = 5
 
 
 class DirectoryEntry(FieldSet):
@@ -717,10 +733,12 @@ class Group(SeekableFieldSet):
                 pass
 
 
-class EXT2_FS(HachoirParser, RootSeekableFieldSet):
+class EXT2_FS(FileTree, HachoirParser, RootSeekableFieldSet):
     """
     Parse an EXT2 or EXT3 partition.
 
+    Files are identified by their inode number (see FileTree).
+
     Attributes:
        * block_size: Size of a block (in bytes)
 
@@ -733,14 +751,9 @@ class EXT2_FS(HachoirParser, RootSeekableFieldSet):
         "category": "file_system",
         "description": "EXT2/EXT3 file system",
         "min_size": (1024 * 2) * 8,
-        "magic": (
-            # (magic, state=valid)
-            (b"\x53\xEF\1\0", 1080 * 8),
-            # (magic, state=error)
-            (b"\x53\xEF\2\0", 1080 * 8),
-            # (magic, state=error)
-            (b"\x53\xEF\4\0", 1080 * 8),
-        ),
+        # (magic, state=valid|error|orphans)
+        "magic": tuple((b"\x53\xEF" + bytes((state, 0)), 1080 * 8)
+                       for state in range(8)),
     }
     endian = LITTLE_ENDIAN
 
@@ -807,3 +820,152 @@ class EXT2_FS(HachoirParser, RootSeekableFieldSet):
         return desc + " file system: total=%s, used=%s, block=%s" % (
             humanFilesize(total), humanFilesize(used),
             humanFilesize(block_size))
+
+    def getInodeAddress(self, inode):
+        """
+        Get the address (in bits) of an inode from its number.
+        """
+        superblock = self["superblock"]
+        group, index = divmod(inode - 1, superblock["inodes_per_group"].value)
+        desc_size = GroupDescriptor.static_size // 8
+        if superblock["feature_incompat/64bit"].value:
+            desc_size = max(desc_size, superblock["desc_size"].value)
+        address = self["group_desc"].absolute_address + group * desc_size * 8
+        table = self.stream.readBits(address + 8 * 8, 32, LITTLE_ENDIAN)
+        if 64 <= desc_size:
+            table += self.stream.readBits(
+                address + 0x28 * 8, 32, LITTLE_ENDIAN) << 32
+        inode_size = superblock["inode_size"].value or 128
+        return (table * self.block_size + index * inode_size) * 8
+
+    def getRootInode(self):
+        return ROOT_INODE
+
+    def listDirectory(self, inode):
+        flags = self.stream.readBits(
+            self.getInodeAddress(inode) + 32 * 8, 32, LITTLE_ENDIAN)
+        data = b"".join(self.iterFileData(inode))
+        filetype = self["superblock/feature_incompat/filetype"].value
+        if flags & INLINE_DATA_FL:
+            # Inline directory: parent inode number and then the entries
+            pos = 4
+        else:
+            pos = 0
+        while pos + 8 <= len(data):
+            entry, rec_len, name_len, file_type = unpack_from(
+                "<IHBB", data, pos)
+            if rec_len < 8:
+                break
+            name = data[pos + 8:pos + 8 + name_len]
+            pos += rec_len
+            if not entry or name in (b".", b".."):
+                continue
+            if filetype:
+                is_directory = (file_type == 2)
+            else:
+                mode = self.stream.readBits(
+                    self.getInodeAddress(entry), 16, LITTLE_ENDIAN)
+                is_directory = (mode >> 12 == 4)
+            yield (name.decode("UTF-8", "surrogateescape"), entry,
+                   is_directory)
+
+    def getInodeExtents(self, inode):
+        address = self.getInodeAddress(inode)
+        data = self.stream.readBytes(address, 128)
+        mode, size = unpack_from("<H2xI", data, 0)
+        blocks, flags = unpack_from("<II", data, 28)
+        file_acl, size_high = unpack_from("<II", data, 104)
+        if mode >> 12 == 8:
+            size += size_high << 32
+        block_size = self.block_size * 8
+        if flags & INLINE_DATA_FL:
+            if 60 < size:
+                raise ParserError("EXT2: inline data stored in extended "
+                                  "attributes is not supported")
+            return [(address + 40 * 8, 60 * 8)], size * 8
+        if mode >> 12 == 10 and size <= 60:
+            acl_blocks = 0
+            if file_acl:
+                acl_blocks = 2 << self["superblock/log_block_size"].value
+            if blocks == acl_blocks:
+                # Fast symbolic link: target stored in the inode
+                return [(address + 40 * 8, 60 * 8)], size * 8
+        if flags & EXTENTS_FL:
+            extents = []
+            next_block = 0
+            for logical, length, physical in sorted(self._readExtentTree(data[40:100])):
+                if next_block < logical:
+                    extents.append((None, (logical - next_block) * block_size))
+                if physical is not None:
+                    physical *= block_size
+                extents.append((physical, length * block_size))
+                next_block = logical + length
+        else:
+            count = (size + self.block_size - 1) // self.block_size
+            extents = [(block * block_size if block else None, block_size)
+                       for block in self._readBlockMap(data[40:100], count)]
+        missing = size * 8 - sum(extent[1] for extent in extents)
+        if 0 < missing:
+            extents.append((None, missing))
+        return extents, size * 8
+
+    def _readExtentTree(self, node, depth=0):
+        """
+        Generate (logical block, number of blocks, physical block) of the
+        leaves of an extent tree. The physical block is None for
+        uninitialized extents (read as null bytes).
+        """
+        magic, entries, max_entries, tree_depth = unpack_from("<4H", node)
+        if magic != EXTENT_MAGIC or MAX_EXTENT_DEPTH < depth:
+            raise ParserError("EXT2: invalid extent tree node")
+        for index in range(entries):
+            offset = 12 + 12 * index
+            if tree_depth:
+                logical, leaf_low, leaf_high = unpack_from(
+                    "<IIH", node, offset)
+                child = self.stream.readBytes(
+                    ((leaf_high << 32) + leaf_low) * self.block_size * 8,
+                    self.block_size)
+                yield from self._readExtentTree(child, depth + 1)
+            else:
+                logical, length, start_high, start_low = unpack_from(
+                    "<IHHI", node, offset)
+                if 32768 < length:
+                    yield (logical, length - 32768, None)
+                else:
+                    yield (logical, length, (start_high << 32) + start_low)
+
+    def _readBlockMap(self, data, count):
+        """
+        Get the list of the first count blocks of the block map of an
+        inode: 12 direct blocks and then single, double and triple indirect
+        blocks. Block 0 is a hole.
+        """
+        pointers = unpack_from("<15I", data)
+        blocks = list(pointers[:min(12, count)])
+        for level, pointer in enumerate(pointers[12:], 1):
+            if count <= len(blocks):
+                break
+            self._readIndirectBlocks(pointer, level, count - len(blocks),
+                                     blocks)
+        return blocks
+
+    def _readIndirectBlocks(self, pointer, level, count, blocks):
+        per_block = self.block_size // 4
+        span = per_block ** (level - 1)
+        count = min(count, per_block * span)
+        if not pointer:
+            blocks.extend([0] * count)
+            return
+        table = readAllocationTable(self.stream, pointer * self.block_size * 8,
+                                    self.block_size, 32)
+        for entry in table:
+            if count <= 0:
+                break
+            if level == 1:
+                blocks.append(entry)
+                count -= 1
+            else:
+                length = min(count, span)
+                self._readIndirectBlocks(entry, level - 1, length, blocks)
+                count -= length
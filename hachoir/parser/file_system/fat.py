@@ -7,12 +7,18 @@ from hachoir.field.integer import GenericInteger
 from hachoir.core.endian import LITTLE_ENDIAN
 from hachoir.core.text_handler import textHandler, hexadecimal
 from hachoir.core.error import error
-from hachoir.core.tools import humanFilesize, makePrintable
+from hachoir.core.tools import humanFilesize, makePrintable, alignValue
+from hachoir.parser.common.allocation_table import (
+    readAllocationTable, chainExtents)
+from hachoir.parser.common.file_tree import FileTree
 import datetime
 import re
 
 strip_index = re.compile(r'\[[^]]+]$')
 
+# Inode of the root directory of FAT12 and FAT16 (see FAT_FS.getRootInode)
+ROOT_DIRECTORY = (0, None)
+
 
 class Boot(FieldSet):
     static_size = 512 * 8
@@ -325,8 +331,14 @@ class InodeGen:
         return field
 
 
-class FAT_FS(Parser):
+class FAT_FS(FileTree, Parser):
+    """
+    FAT file system. Files are identified by (first cluster, size in bytes)
+    tuples, the size is None for directories (see FileTree).
+    """
     endian = LITTLE_ENDIAN
+    _fat_table = None
+    data_start = None
     PARSER_TAGS = {
         "category": "file_system",
         "min_size": 512 * 8,
@@ -340,23 +352,131 @@ class FAT_FS(Parser):
             return "Invalid BIOS signature"
         return True
 
-    def clusters(self, cluster_func):
+    @property
+    def fat_table(self):
+        """
+        Entries of the first FAT, decoded at once into an array.
+        """
+        if self._fat_table is None:
+            fat = self["fat[0]"]
+            self._fat_table = readAllocationTable(
+                self.stream, fat.absolute_address, fat.size // 8,
+                self.version)
+        return self._fat_table
+
+    def getChain(self, cluster):
+        """
+        Generate the clusters of the chain starting at cluster.
+        """
         max_entry = (1 << min(28, self.version)) - 16
-        cluster = cluster_func()
-        if 1 < cluster < max_entry:
-            clus_nb = 1
-            next = cluster
-            while True:
-                next = self.fat[next / 1000][next % 1000].value
-                if not 1 < next < max_entry:
-                    break
-                if cluster + clus_nb == next:
-                    clus_nb += 1
-                else:
-                    yield self.data_start + cluster * self.cluster_size, clus_nb * self.cluster_size, False
-                    cluster = next
-                    clus_nb = 1
-            yield self.data_start + cluster * self.cluster_size, clus_nb * self.cluster_size, True
+        table = self.fat_table
+        cluster_set = set()
+        while 1 < cluster < max_entry:
+            if cluster in cluster_set:
+                error("(FAT) loop in the cluster chain (cluster %u)" % cluster)
+                break
+            cluster_set.add(cluster)
+            yield cluster
+            try:
+                cluster = table[cluster]
+            except IndexError:
+                break
+
+    def getExtents(self, cluster):
+        """
+        Get the extents of the chain starting at cluster: list of
+        (address, size) in bits of consecutive clusters.
+        """
+        return [(self.data_start + first * self.cluster_size,
+                 count * self.cluster_size)
+                for first, count in chainExtents(self.getChain(cluster))]
+
+    def clusters(self, cluster_func):
+        extents = self.getExtents(cluster_func())
+        for index, (address, size) in enumerate(extents):
+            yield address, size, index == len(extents) - 1
+
+    def _initLayout(self):
+        """
+        Compute the location of the root directory (FAT12 and FAT16) and of
+        the clusters: cluster N is at data_start + N * cluster_size.
+        """
+        boot = self["boot"]
+        sector_size = boot["sector_size"].value
+        fat_size = boot["fat_size"].value
+        if fat_size == 0:
+            fat_size = boot["fat32_size"].value
+        self.cluster_size = boot["cluster_size"].value * sector_size * 8
+        self.root_start = (boot["reserved_sectors"].value
+                           + boot["fat_nb"].value * fat_size) * sector_size * 8
+        self.root_size = boot["max_root"].value * 32 * 8
+        self.data_start = self.root_start \
+            + alignValue(self.root_size, sector_size * 8) \
+            - 2 * self.cluster_size
+
+    def getRootInode(self):
+        if self.version == 32:
+            return (self["boot/root_start"].value, None)
+        return ROOT_DIRECTORY
+
+    def listDirectory(self, inode):
+        data = b"".join(self.iterFileData(inode))
+        long_name = []
+        for pos in range(0, len(data) - 31, 32):
+            entry = data[pos:pos + 32]
+            status = entry[0]
+            if status == 0:
+                break
+            attr = entry[11]
+            if status == 0xE5:
+                long_name = []
+                continue
+            if attr & 0x3F == 0x0F:
+                # Long filename part, stored in reverse order
+                if status & 0x40:
+                    long_name = []
+                long_name.insert(0, entry[1:11] + entry[14:26] + entry[28:32])
+                continue
+            if attr & 0x08:
+                # Volume label
+                long_name = []
+                continue
+            if long_name:
+                name = b"".join(long_name).decode("UTF-16-LE", "replace")
+                name = name.split("\0", 1)[0]
+                long_name = []
+            else:
+                name = entry[:8].rstrip(b" ")
+                if name[:1] == b"\x05":
+                    name = b"\xE5" + name[1:]
+                ext = entry[8:11].rstrip(b" ")
+                if ext:
+                    name += b"." + ext
+                name = name.decode("cp437")
+            if name in (".", ".."):
+                continue
+            cluster = entry[26] + (entry[27] << 8)
+            if self.version == 32:
+                cluster += (entry[20] << 16) + (entry[21] << 24)
+            if attr & 0x10:
+                yield (name, (cluster, None), True)
+            else:
+                size = entry[28] + (entry[29] << 8) + (entry[30] << 16) \
+                    + (entry[31] << 24)
+                yield (name, (cluster, size), False)
+
+    def getInodeExtents(self, inode):
+        if self.data_start is None:
+            self._initLayout()
+        if inode == ROOT_DIRECTORY:
+            return [(self.root_start, self.root_size)], self.root_size
+        cluster, size = inode
+        extents = self.getExtents(cluster) if cluster else []
+        if size is None:
+            size = sum(extent[1] for extent in extents)
+        else:
+            size *= 8
+        return extents, size
 
     def createFields(self):
         # Read boot seector
@@ -369,7 +489,7 @@ class FAT_FS(Parser):
                 (boot["inf_sector"].value, lambda: FSInfo(self, "fsinfo")),
                 (boot["boot_copy"].value, lambda: Boot(
                     self, "bkboot", "Copy of the boot sector")),
-            )):
+            ), key=lambda field: field[0]):
                 if field[0]:
                     padding = self.seekByte(field[0] * self.sector_size)
                     if padding:
@@ -389,15 +509,15 @@ class FAT_FS(Parser):
             yield FAT(self, "fat[]", "File Allocation Table", size=fat_size)
 
         # Read inode table (Directory)
-        self.cluster_size = boot["cluster_size"].value * self.sector_size * 8
+        self._initLayout()
         self.fat = self["fat[0]"]
         if "root_start" in boot and boot["root_start"].value != 2:
             self.target_size = 0
             self.getCluster = lambda: boot["root_start"].value
-            yield InodeLink(self, "root", "root")
+            root = InodeLink(self, "root", "root")
         else:
-            yield Directory(self, "root[]", size=max(boot["max_root"].value * 32 * 8, boot["cluster_size"].value * self.sector_size * 8))
-        self.data_start = self.current_size - 2 * self.cluster_size
+            root = Directory(self, "root[]", size=max(boot["max_root"].value * 32 * 8, boot["cluster_size"].value * self.sector_size * 8))
+        yield root
         sectors = boot["sectors1"].value
         if not sectors:
             sectors = boot["sectors2"].value
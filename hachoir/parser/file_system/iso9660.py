@@ -14,6 +14,19 @@ from hachoir.field import (FieldSet, ParserError,
                            UInt8, UInt32, UInt64, Enum,
                            NullBytes, RawBytes, String)
 from hachoir.core.endian import LITTLE_ENDIAN, BIG_ENDIAN
+from hachoir.parser.common.file_tree import FileTree
+from struct import unpack_from
+
+# Directory records don't cross the boundaries of logical sectors
+LOGICAL_SECTOR_SIZE = 2048
+
+# Escape sequences of the Joliet supplementary volume descriptor (UCS-2)
+JOLIET_ESCAPES = (b"%/@", b"%/C", b"%/E")
+
+# Flags of directory records
+FLAG_DIRECTORY = 0x02
+FLAG_ASSOCIATED = 0x04
+FLAG_MULTI_EXTENT = 0x80
 
 
 class PrimaryVolumeDescriptor(FieldSet):
@@ -98,8 +111,15 @@ class Volume(FieldSet):
             yield RawBytes(self, "raw_content", 2048 - 7)
 
 
-class ISO9660(Parser):
+class ISO9660(FileTree, Parser):
+    """
+    ISO 9660 file system. Files are identified by a tuple of (block, size in
+    bytes) extents (see FileTree). Names are read from the Joliet
+    descriptor if the volume has one, otherwise from the primary volume
+    descriptor.
+    """
     endian = LITTLE_ENDIAN
+    root_record = None
     MAGIC = b"\x01CD001"
     NULL_BYTES = 0x8000
     PARSER_TAGS = {
@@ -126,3 +146,76 @@ class ISO9660(Parser):
 
         if self.current_size < self._size:
             yield self.seekBit(self._size, "end")
+
+    def _initLayout(self):
+        """
+        Read the block size and the root directory record of the volume
+        descriptor used to list directories.
+        """
+        address = self.NULL_BYTES
+        while address + LOGICAL_SECTOR_SIZE <= self.stream.size // 8:
+            descriptor = self.stream.readBytes(address * 8, 190)
+            if descriptor[1:6] != b"CD001" \
+                    or descriptor[0] == Volume.TERMINATOR:
+                break
+            address += LOGICAL_SECTOR_SIZE
+            if descriptor[0] == 1 and self.root_record is None:
+                joliet = False
+            elif descriptor[0] == 2 and descriptor[88:91] in JOLIET_ESCAPES:
+                joliet = True
+            else:
+                continue
+            self.block_size = unpack_from("<H", descriptor, 128)[0]
+            self.root_record = descriptor[156:190]
+            self.joliet = joliet
+            if joliet:
+                break
+        if self.root_record is None:
+            raise ParserError("ISO9660: no primary volume descriptor")
+
+    def getRootInode(self):
+        if self.root_record is None:
+            self._initLayout()
+        return (unpack_from("<I", self.root_record, 2)
+                + unpack_from("<I", self.root_record, 10),)
+
+    def listDirectory(self, inode):
+        data = b"".join(self.iterFileData(inode))
+        extents = []
+        pos = 0
+        while pos < len(data):
+            length = data[pos]
+            if not length:
+                # Skip the padding up to the next logical sector
+                pos = (pos // LOGICAL_SECTOR_SIZE + 1) * LOGICAL_SECTOR_SIZE
+                continue
+            record = data[pos:pos + length]
+            pos += length
+            flags = record[25]
+            name = record[33:33 + record[32]]
+            if name in (b"\0", b"\1") or flags & FLAG_ASSOCIATED:
+                continue
+            extents.append(unpack_from("<I", record, 2)
+                           + unpack_from("<I", record, 10))
+            if flags & FLAG_MULTI_EXTENT:
+                # The file continues in the next record
+                continue
+            if self.joliet:
+                name = name.decode("UTF-16-BE", "replace")
+            else:
+                name = name.decode("ISO-8859-1")
+            is_directory = bool(flags & FLAG_DIRECTORY)
+            if not is_directory:
+                # Strip the version number and the empty extension
+                name = name.split(";", 1)[0]
+                if name.endswith("."):
+                    name = name[:-1]
+            yield (name, tuple(extents), is_directory)
+            extents = []
+
+    def getInodeExtents(self, inode):
+        if self.root_record is None:
+            self._initLayout()
+        extents = [(block * self.block_size * 8, size * 8)
+                   for block, size in inode]
+        return extents, sum(extent[1] for extent in extents)
@@ -12,7 +12,7 @@ Author: Victor Stinner
 """
 
 from hachoir.parser import Parser
-from hachoir.field import (FieldSet, Enum,
+from hachoir.field import (FieldSet, ParserError, Enum,
                            UInt8, UInt16, UInt32, UInt64, TimestampWin64,
                            String, Bytes, Bit, Bits,
                            NullBits, NullBytes, PaddingBytes, RawBytes)
@@ -20,9 +20,88 @@ from hachoir.core.endian import LITTLE_ENDIAN
 from hachoir.core.text_handler import textHandler, hexadecimal, filesizeHandler
 from hachoir.core.tools import humanFilesize, createDict
 from hachoir.parser.common.msdos import MSDOSFileAttr32
+from hachoir.parser.common.file_tree import FileTree, truncateExtents
+from hachoir.stream import ExtentStream
+from struct import unpack_from
 
 SECTOR_SIZE = 512
 
+# MFT record numbers
+MFT_RECORD = 0
+ROOT_RECORD = 5
+
+# Attribute types
+ATTR_LIST = 0x20
+ATTR_FILENAME = 0x30
+ATTR_DATA = 0x80
+ATTR_INDEX_ROOT = 0x90
+ATTR_INDEX_ALLOCATION = 0xA0
+ATTR_BITMAP = 0xB0
+ATTR_END = 0xFFFFFFFF
+
+# Name of the filename index of directories
+INDEX_NAME = "$I30"
+
+# Attribute flags
+ATTR_COMPRESSED = 0x0001
+
+# Filename namespace of DOS (8.3) names
+NAMESPACE_DOS = 2
+
+# Flag of a directory in a FILE_NAME attribute
+FILE_NAME_DIRECTORY = 0x10000000
+
+# Flag of the last entry of an index node
+INDEX_ENTRY_END = 0x02
+
+
+def decodeRunList(data, offset=0):
+    """
+    Decode a runlist: list of (first cluster, number of clusters), the
+    first cluster is None for a sparse run.
+
+    >>> decodeRunList(bytes((0x21, 0x18, 0x34, 0x56, 0x01, 0x10, 0x21, 0x08, 0xF0, 0xFF, 0x00)))
+    [(22068, 24), (None, 16), (22052, 8)]
+    """
+    runs = []
+    cluster = 0
+    while offset < len(data) and data[offset]:
+        header = data[offset]
+        length_size = header & 15
+        offset_size = header >> 4
+        offset += 1
+        length = int.from_bytes(data[offset:offset + length_size], "little")
+        offset += length_size
+        if offset_size:
+            cluster += int.from_bytes(data[offset:offset + offset_size],
+                                      "little", signed=True)
+            runs.append((cluster, length))
+        else:
+            runs.append((None, length))
+        offset += offset_size
+    return runs
+
+
+def applyFixups(data, magic):
+    """
+    Check the magic string of a multi-sector record (MFT record or index
+    block) and restore the last two bytes of its sectors, stored in the
+    update sequence array.
+    """
+    if data[:4] != magic:
+        raise ParserError("NTFS: invalid record signature (%r)" % data[:4])
+    usa_offset, usa_count = unpack_from("<HH", data, 4)
+    data = bytearray(data)
+    usn = data[usa_offset:usa_offset + 2]
+    for index in range(1, usa_count):
+        end = index * SECTOR_SIZE
+        if len(data) < end:
+            break
+        if data[end - 2:end] != usn:
+            raise ParserError("NTFS: invalid update sequence number")
+        data[end - 2:end] = data[usa_offset + 2 * index:usa_offset + 2 * index + 2]
+    return bytes(data)
+
 
 class BiosParameterBlock(FieldSet):
     """
@@ -359,7 +438,11 @@ class File(FieldSet):
         return text
 
 
-class NTFS(Parser):
+class NTFS(FileTree, Parser):
+    """
+    NTFS file system. Files are identified by their MFT record number (see
+    FileTree).
+    """
     MAGIC = b"\xEB\x52\x90NTFS    "
     PARSER_TAGS = {
         "id": "ntfs",
@@ -370,6 +453,7 @@ class NTFS(Parser):
     }
     endian = LITTLE_ENDIAN
     _cluster_size = None
+    mft = None
 
     def validate(self):
         if self.stream.readBytes(0, len(self.MAGIC)) != self.MAGIC:
@@ -395,3 +479,212 @@ class NTFS(Parser):
         size = (self.size - self.current_size) // 8
         if size:
             yield RawBytes(self, "end", size)
+
+    def _recordSize(self, clusters):
+        # Size in bytes of a MFT record or of an index block
+        if 128 <= clusters:
+            return 1 << (256 - clusters)
+        return clusters * self.cluster_size
+
+    def _initLayout(self):
+        bios = self["mbr/bios"]
+        self.cluster_size = bios["sectors_per_cluster"].value * \
+            bios["bytes_per_sector"].value
+        self.record_size = self._recordSize(self["mbr/cluster_per_mft"].value)
+        # The first records are used to read the MFT record of the MFT
+        address = self["mbr/mft_cluster"].value * self.cluster_size * 8
+        self.mft = ExtentStream(self.stream,
+                                [(address, 16 * self.record_size * 8)])
+        attrs = self.getAttributes(MFT_RECORD, ATTR_DATA)
+        if not attrs or not attrs[0][2][8]:
+            raise ParserError("NTFS: unable to locate the MFT")
+        extents, size = self._getDataExtents(attrs)
+        self.mft = ExtentStream(self.stream, truncateExtents(extents, size))
+
+    def readRecord(self, record):
+        """
+        Read a MFT record (bytes), the update sequence is applied.
+        """
+        if self.mft is None:
+            self._initLayout()
+        data = self.mft.readBytes(record * self.record_size * 8,
+                                  self.record_size)
+        return applyFixups(data, b"FILE")
+
+    def _iterAttributes(self, data):
+        # Generate (type, offset, attribute) of the attributes of a record
+        offset = unpack_from("<H", data, 20)[0]
+        while offset + 16 <= len(data):
+            attr_type, length = unpack_from("<II", data, offset)
+            if attr_type == ATTR_END or length < 16 \
+                    or len(data) < offset + length:
+                break
+            yield attr_type, offset, data[offset:offset + length]
+            offset += length
+
+    def _attrName(self, attr):
+        name_length = attr[9]
+        name_offset = unpack_from("<H", attr, 10)[0]
+        return attr[name_offset:name_offset + name_length * 2] \
+            .decode("UTF-16-LE")
+
+    def getAttributes(self, record, attr_type, name=""):
+        """
+        Get the attributes of a MFT record with the specified type and
+        name, including the attributes stored in other records (listed in
+        the attribute list): list of (record, offset in the record,
+        attribute bytes).
+        """
+        data = self.readRecord(record)
+        attrs = []
+        attr_list = None
+        for current_type, offset, attr in self._iterAttributes(data):
+            if current_type == ATTR_LIST:
+                attr_list = attr
+            elif current_type == attr_type and self._attrName(attr) == name:
+                attrs.append((record, offset, attr))
+        if attr_list is None:
+            return attrs
+        attr_list = self._readAttribute(attr_list)
+        records = []
+        offset = 0
+        while offset + 26 <= len(attr_list):
+            current_type, length, name_length, name_offset = unpack_from(
+                "<IHBB", attr_list, offset)
+            if length < 26:
+                break
+            current_name = attr_list[offset + name_offset:
+                                     offset + name_offset + name_length * 2]
+            reference = unpack_from("<Q", attr_list, offset + 16)[0] \
+                & 0xFFFFFFFFFFFF
+            if current_type == attr_type \
+                    and current_name.decode("UTF-16-LE") == name \
+                    and reference not in records:
+                records.append(reference)
+            offset += length
+        attrs = []
+        for reference in records:
+            if reference == record:
+                extension = data
+            else:
+                extension = self.readRecord(reference)
+            for current_type, offset, attr in self._iterAttributes(extension):
+                if current_type == attr_type \
+                        and self._attrName(attr) == name:
+                    attrs.append((reference, offset, attr))
+        return attrs
+
+    def _getDataExtents(self, attrs):
+        """
+        Get (extents, size in bits) of the content of a non-resident
+        attribute, stored in one or more attributes (see getAttributes()).
+        """
+        attrs = sorted((attr for record, offset, attr in attrs),
+                       key=lambda attr: unpack_from("<Q", attr, 16)[0])
+        extents = []
+        cluster_size = self.cluster_size * 8
+        for attr in attrs:
+            if unpack_from("<H", attr, 12)[0] & ATTR_COMPRESSED:
+                raise ParserError("NTFS: compressed files are not supported")
+            runlist_offset = unpack_from("<H", attr, 32)[0]
+            for cluster, length in decodeRunList(attr, runlist_offset):
+                if cluster is not None:
+                    cluster *= cluster_size
+                extents.append((cluster, length * cluster_size))
+        size, initialized_size = unpack_from("<QQ", attrs[0], 48)
+        if initialized_size < size:
+            extents = truncateExtents(extents, initialized_size * 8)
+            extents.append((None, (size - initialized_size) * 8))
+        return extents, size * 8
+
+    def _getResidentExtents(self, record, attr_offset, attr):
+        """
+        Get (extents, size in bits) of the value of a resident attribute.
+        The last two bytes of each sector of the record are stored in the
+        update sequence array of the record.
+        """
+        value_length, value_offset = unpack_from("<IH", attr, 16)
+        start = record * self.record_size
+        usa_offset = self.mft.readBits((start + 4) * 8, 16, LITTLE_ENDIAN)
+        extents = []
+        pos = attr_offset + value_offset
+        end = pos + value_length
+        while pos < end:
+            sector, sector_pos = divmod(pos, SECTOR_SIZE)
+            if SECTOR_SIZE - 2 <= sector_pos:
+                offset = usa_offset + 2 * (sector + 1) \
+                    + sector_pos - (SECTOR_SIZE - 2)
+                length = min(end - pos, SECTOR_SIZE - sector_pos)
+            else:
+                offset = pos
+                length = min(end - pos, SECTOR_SIZE - 2 - sector_pos)
+            extents.extend(self.mft.getExtents((start + offset) * 8,
+                                               length * 8))
+            pos += length
+        return extents, value_length * 8
+
+    def _readAttribute(self, attr):
+        # Read the content of an attribute (bytes)
+        if not attr[8]:
+            value_length, value_offset = unpack_from("<IH", attr, 16)
+            return attr[value_offset:value_offset + value_length]
+        extents, size = self._getDataExtents([(None, None, attr)])
+        if not size:
+            return b""
+        stream = ExtentStream(self.stream, truncateExtents(extents, size))
+        return stream.readBytes(0, size // 8)
+
+    def getRootInode(self):
+        return ROOT_RECORD
+
+    def getInodeExtents(self, inode):
+        attrs = self.getAttributes(inode, ATTR_DATA)
+        if not attrs:
+            return [], 0
+        if not attrs[0][2][8]:
+            return self._getResidentExtents(*attrs[0])
+        return self._getDataExtents(attrs)
+
+    def listDirectory(self, inode):
+        roots = self.getAttributes(inode, ATTR_INDEX_ROOT, INDEX_NAME)
+        if not roots:
+            return
+        root = self._readAttribute(roots[0][2])
+        block_size = unpack_from("<I", root, 8)[0]
+        entries_offset, index_size = unpack_from("<II", root, 16)
+        nodes = [root[16 + entries_offset:16 + index_size]]
+        allocations = self.getAttributes(inode, ATTR_INDEX_ALLOCATION,
+                                         INDEX_NAME)
+        if allocations:
+            bitmaps = self.getAttributes(inode, ATTR_BITMAP, INDEX_NAME)
+            bitmap = self._readAttribute(bitmaps[0][2]) if bitmaps else b""
+            extents, size = self._getDataExtents(allocations)
+            stream = ExtentStream(self.stream, truncateExtents(extents, size))
+            for index in range(size // 8 // block_size):
+                if len(bitmap) <= index // 8 \
+                        or not bitmap[index // 8] & (1 << (index % 8)):
+                    # Unused index block
+                    continue
+                block = applyFixups(stream.readBytes(
+                    index * block_size * 8, block_size), b"INDX")
+                entries_offset, index_size = unpack_from("<II", block, 24)
+                nodes.append(block[24 + entries_offset:24 + index_size])
+        for node in nodes:
+            pos = 0
+            while pos + 16 <= len(node):
+                reference, length, key_length, flags = unpack_from(
+                    "<QHHI", node, pos)
+                if flags & INDEX_ENTRY_END or length < 16:
+                    break
+                key = node[pos + 16:pos + 16 + key_length]
+                pos += length
+                record = reference & 0xFFFFFFFFFFFF
+                if len(key) < 66 or record == inode:
+                    continue
+                file_flags = unpack_from("<I", key, 56)[0]
+                name_length, namespace = key[64], key[65]
+                if namespace == NAMESPACE_DOS:
+                    continue
+                name = key[66:66 + name_length * 2].decode("UTF-16-LE",
+                                                           "surrogatepass")
+                yield (name, record, bool(file_flags & FILE_NAME_DIRECTORY))
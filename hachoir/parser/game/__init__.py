@@ -1,4 +1,9 @@
-from hachoir.parser.game.zsnes import ZSNESFile  # noqa
-from hachoir.parser.game.spider_man_video import SpiderManVideoFile  # noqa
-from hachoir.parser.game.laf import LafFile  # noqa
-from hachoir.parser.game.blp import BLP1File, BLP2File  # noqa
+from hachoir.core.lazy import lazyModule
+
+__getattr__, __dir__ = lazyModule(__name__, {
+    "ZSNESFile": "zsnes",
+    "SpiderManVideoFile": "spider_man_video",
+    "LafFile": "laf",
+    "BLP1File": "blp",
+    "BLP2File": "blp",
+})
@@ -13,6 +13,7 @@ import weakref
 class QueryParser(object):
     fallback = None
     other = None
+    other_index = None
 
     def __init__(self, tags):
         self.validate = True
@@ -28,9 +29,9 @@ class QueryParser(object):
             if self.fallback is None:
                 self.fallback = len(parsers) == 1
         if self.parsers:
-            other = len(parsers)
+            self.other_index = len(parsers)
             parsers += list(self.parsers)
-            self.other = parsers[other]
+            self.other = parsers[self.other_index]
         self.parsers = parsers
 
     def __iter__(self):
@@ -92,10 +93,29 @@ class QueryParser(object):
             stream._cached_parser = weakref.ref(parser)
         return parser
 
+    def sortParsers(self, stream):
+        """
+        Sort candidate parsers using their magic (see MagicIndex). Parsers
+        selected by tags stay before the other parsers, which are skipped
+        if they declare a magic not matching the stream.
+        """
+        index = self.db.getMagicIndex()
+        if self.other_index is None:
+            return index.sortParsers(stream, self.parsers)
+        tagged = index.sortParsers(stream, self.parsers[:self.other_index])
+        other = index.sortParsers(stream, self.parsers[self.other_index:],
+                                  mismatch=False)
+        self.other = other[0] if other else None
+        return tagged + other
+
     def doparse(self, stream, fallback=True):
         fb = None
         warn = warning
-        for parser in self.parsers:
+        if self.validate and 1 < len(self.parsers):
+            parsers = self.sortParsers(stream)
+        else:
+            parsers = self.parsers
+        for parser in parsers:
             try:
                 parser_obj = parser(stream, validate=self.validate)
                 if self.parser_args:
@@ -43,7 +43,7 @@ class CR2File(RootSeekableFieldSet, Parser):
         "file_ext": ("cr2",),
         "mime": ("image/x-canon-cr2",),
         "min_size": 15,
-        "magic": ((b"CR", 8),),
+        "magic": ((b"CR", 64),),
         "description": "Canon CR2 raw image data, version 2.0"
     }
 
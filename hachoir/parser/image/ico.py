@@ -73,17 +73,14 @@ class IcoFile(Parser):
         "file_ext": ("ico", "cur"),
         "mime": ("image/x-ico",),
         "min_size": (22 + 40) * 8,
-        #        "magic": (
-        #            (b"\0\0\1\0", 0), # Icon
-        #            (b"\0\0\2\0", 0), # Cursor
-        #        ),
         "magic_regex": ((
-            # signature=0, type=(1|2), count in 1..20,
-            b"\0\0[\1\2]\0[\x01-\x14]."
-            # size=(16x16|32x32|48x48|64x64),
-            b"(\x10\x10|\x20\x20|\x30\x30|\x40\x40)"
-            # nb_color=0 or 16; nb_plane=(0|1|4), bpp=(0|8|24|32)
-            b"[\x00\x10]\0[\0\1\4][\0\x08\x18\x20]\0",
+            # signature=0, type=(1|2), count >= 1, <width, height>,
+            b"\0\0[\1\2]\0(?:[^\0].|.[^\0]).."
+            # first header valid (see IconHeader.isValid):
+            # nb_color=0, <reserved>, (planes=1, bpp=(8|24|32)|planes=bpp=0|planes=4, bpp=0)
+            b"(?:\0.(?:\1\0[\x08\x18\x20]\0|[\0\4]\0\0\0)"
+            # nb_color=16, <reserved>, (planes=1, bpp=(4|16)|planes=bpp=0)
+            b"|\x10.(?:\1\0[\x04\x10]\0|\0\0\0\0))",
             0),),
         "description": "Microsoft Windows icon or cursor",
     }
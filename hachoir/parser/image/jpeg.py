@@ -24,11 +24,20 @@ from hachoir.core.endian import BIG_ENDIAN
 from hachoir.core.text_handler import textHandler, hexadecimal
 from hachoir.parser.image.exif import Exif
 from hachoir.parser.image.photoshop_metadata import PhotoshopMetadata
-from hachoir.parser.archive.zlib import build_tree
+from hachoir.parser.archive.zlib import build_tree, HuffmanTree
+from hachoir.stream import InputStreamError
 from hachoir.core.tools import paddingSize, alignValue
+from bisect import bisect_left
+import re
 
 MAX_FILESIZE = 100 * 1024 * 1024
 
+# Size in bytes of the blocks read to search the end of entropy-coded data
+SCAN_BLOCK_SIZE = 1 << 20
+
+# Marker: 0xFF followed by a non-null byte (0xFF 0x00 is a stuffed 0xFF byte)
+MARKER_REGEX = re.compile(b"\xff[^\x00]")
+
 # The four tables (hash/sum for color/grayscale JPEG) comes
 # from ImageMagick project
 QUALITY_HASH_COLOR = (
@@ -277,9 +286,8 @@ class HuffmanTable(FieldSet):
                 yield field
                 remap[len(lengths)] = field.value
                 lengths.append(i)
-        self.tree = {}
-        for i, j in build_tree(lengths).items():
-            self.tree[i] = remap[j]
+        self.tree = HuffmanTree((i, remap[j])
+                                for i, j in build_tree(lengths).items())
 
 
 class DefineHuffmanTable(FieldSet):
@@ -299,6 +307,12 @@ class HuffmanCode(Field):
         stream = self.parent.stream
         addr = self.absolute_address
 
+        entry = self.lookup(stream, addr, tree)
+        if entry is not None:
+            self._size, value, self.realvalue = entry
+            self.createValue = lambda: value
+            return
+
         value = 0
         met_ff = False
         while (self.size, value) not in tree:
@@ -322,6 +336,30 @@ class HuffmanCode(Field):
         if met_ff:
             self._size += 8
 
+    @staticmethod
+    def lookup(stream, addr, tree):
+        """
+        Decode the code at addr using the decoding table of the tree, if
+        the code is not near a stuffed byte (0xFF 0x00).
+
+        Return (length, code, value), or None if the code has to be read
+        bit per bit.
+        """
+        if not isinstance(tree, HuffmanTree) or not tree.max_length \
+                or addr < 8:
+            return None
+        first = addr // 8 - 1
+        last = (addr + tree.max_length - 1) // 8
+        try:
+            data = stream.readBytes(first * 8, last - first + 1)
+        except InputStreamError:
+            return None
+        if b"\xFF" in data:
+            return None
+        bits = int.from_bytes(data, "big") \
+            >> ((last + 1) * 8 - addr - tree.max_length)
+        return tree.lookup(bits & ((1 << tree.max_length) - 1))
+
 
 class JpegHuffmanImageUnit(FieldSet):
     """8x8 block of sample/coefficient values"""
@@ -373,6 +411,43 @@ class JpegHuffmanImageUnit(FieldSet):
                 data.append(0)
 
 
+def scanEntropyCodedData(stream, address, end_address=None):
+    """
+    Find the end of the entropy-coded data starting at address (in bits):
+    search the first marker which is not a restart marker (RSTn) in a
+    single pass over large blocks. Stuffed bytes (FF 00) are skipped.
+
+    Return (end, restart_markers): end is the address of the marker, or
+    None if there is no marker before end_address or the end of the stream
+    (truncated image); restart_markers is the list of the addresses of the
+    restart markers.
+    """
+    restart_markers = []
+    pos = address // 8
+    end_pos = None
+    if end_address is not None:
+        end_pos = end_address // 8
+    if stream.size is not None and (end_pos is None or stream.size // 8 < end_pos):
+        end_pos = stream.size // 8
+    while True:
+        size = SCAN_BLOCK_SIZE
+        if end_pos is not None:
+            size = min(size, end_pos - pos)
+        if size < 2:
+            return None, restart_markers
+        data = stream.read(8 * pos, 8 * size)[1]
+        for match in MARKER_REGEX.finditer(data):
+            index = match.start()
+            if 0xD0 <= data[index + 1] <= 0xD7:
+                restart_markers.append(8 * (pos + index))
+            else:
+                return 8 * (pos + index), restart_markers
+        if len(data) < size:
+            return None, restart_markers
+        # the last byte may be the first byte of a marker
+        pos += size - 1
+
+
 class JpegImageData(FieldSet):
 
     def __init__(self, parent, name, frame, scan, restart_interval, restart_offset=0, *args, **kwargs):
@@ -381,24 +456,24 @@ class JpegImageData(FieldSet):
         self.scan = scan
         self.restart_interval = restart_interval
         self.restart_offset = restart_offset
-        # try to figure out where this field ends
+        # try to figure out where this field ends: the entropy-coded data
+        # of the scan is scanned once, the restart markers are stored in
+        # the parent (restart_markers and scan_end attributes)
         start = self.absolute_address
-        while True:
-            end = self.stream.searchBytes(b"\xff", start, MAX_FILESIZE * 8)
-            if end is None:
-                # this is a bad sign, since it means there is no terminator
-                # this likely means a truncated image:
-                # set the size to the remaining length of the stream
-                # to avoid being forced to parse subfields to calculate size
-                self._size = self.stream._size - self.absolute_address
-                break
-            if self.stream.readBytes(end, 2) == b'\xff\x00':
-                # padding: false alarm
-                start = end + 16
-                continue
-            else:
-                self._size = end - self.absolute_address
-                break
+        if not restart_offset or not hasattr(parent, "restart_markers"):
+            parent.scan_end, parent.restart_markers = \
+                scanEntropyCodedData(self.stream, start, MAX_FILESIZE * 8)
+        index = bisect_left(parent.restart_markers, start)
+        if index < len(parent.restart_markers):
+            self._size = parent.restart_markers[index] - start
+        elif parent.scan_end is not None:
+            self._size = parent.scan_end - start
+        else:
+            # this is a bad sign, since it means there is no terminator
+            # this likely means a truncated image:
+            # set the size to the remaining length of the stream
+            # to avoid being forced to parse subfields to calculate size
+            self._size = self.stream._size - start
 
     def createFields(self):
         if self.frame["../type"].value in [0xC0, 0xC1]:
@@ -555,11 +630,8 @@ class JpegFile(Parser):
         "category": "image",
         "file_ext": ("jpg", "jpeg"),
         "mime": ("image/jpeg",),
-        "magic": (
-            (b"\xFF\xD8\xFF\xE0", 0),   # (Start Of Image, APP0)
-            (b"\xFF\xD8\xFF\xE1", 0),   # (Start Of Image, EXIF)
-            (b"\xFF\xD8\xFF\xEE", 0),   # (Start Of Image, Adobe)
-        ),
+        # (Start Of Image, start of the next chunk)
+        "magic": ((b"\xFF\xD8\xFF", 0),),
         "min_size": 22 * 8,
         "description": "JPEG picture",
         "subfile": "skip",
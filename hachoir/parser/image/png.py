@@ -20,6 +20,7 @@ from hachoir.parser.image.common import RGB
 from hachoir.core.text_handler import textHandler, hexadecimal
 from hachoir.core.endian import NETWORK_ENDIAN
 from hachoir.core.tools import humanFilesize
+from copy import copy
 from datetime import datetime
 
 MAX_FILESIZE = 500 * 1024 * 1024  # 500 MB
@@ -37,6 +38,11 @@ try:
                 data = self.gzip.unconsumed_tail
             return self.gzip.decompress(data, size)
 
+        def copy(self):
+            other = copy(self)
+            other.gzip = self.gzip.copy()
+            return other
+
     has_deflate = True
 except ImportError:
     has_deflate = False
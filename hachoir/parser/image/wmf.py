@@ -532,6 +532,9 @@ class WMF_File(Parser):
             (b"\0\0\x09\0\0\3", 0),
             # WMF: file_type=disk, header size=9, version=3.0
             (b"\1\0\x09\0\0\3", 0),
+            # WMF: file_type=memory|disk, header size=9, version=1.0
+            (b"\0\0\x09\0\0\1", 0),
+            (b"\1\0\x09\0\0\1", 0),
         ),
         "min_size": 40 * 8,
         "description": "Microsoft Windows Metafile (WMF)",
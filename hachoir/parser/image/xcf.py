@@ -358,10 +358,7 @@ class XcfFile(Parser):
         "mime": ("image/x-xcf", "application/x-gimp-image"),
         # header+empty property+layer offset+channel offset
         "min_size": (26 + 8 + 4 + 4) * 8,
-        "magic": (
-            (b'gimp xcf file\0', 0),
-            (b'gimp xcf v002\0', 0),
-        ),
+        "magic": ((b'gimp xcf ', 0),),
         "description": "Gimp (XCF) picture"
     }
     endian = NETWORK_ENDIAN
@@ -0,0 +1,959 @@
+"""
+List of parsers with their tags, used to load parsers on demand.
+
+File generated by tools/gen_parser_manifest.py, don't edit it.
+"""
+
+PARSERS = [
+    ('hachoir.parser.archive.ace',
+     'AceFile',
+     {'category': 'archive',
+      'description': 'ACE archive',
+      'file_ext': ('ace',),
+      'id': 'ace',
+      'mime': ('application/x-ace-compressed',),
+      'min_size': 400}),
+    ('hachoir.parser.archive.ar',
+     'ArchiveFile',
+     {'category': 'archive',
+      'description': 'Unix archive',
+      'file_ext': ('a', 'deb'),
+      'id': 'unix_archive',
+      'magic': ((b'!<arch>\n', 0),),
+      'mime': ('application/x-debian-package',
+               'application/x-archive',
+               'application/x-dpkg'),
+      'min_size': 168}),
+    ('hachoir.parser.archive.arj',
+     'ArjParser',
+     {'category': 'archive',
+      'description': 'ARJ archive',
+      'file_ext': ('arj',),
+      'id': 'arj',
+      'min_size': 32}),
+    ('hachoir.parser.archive.bomstore',
+     'BomFile',
+     {'category': 'archive',
+      'description': 'Apple bill-of-materials file',
+      'file_ext': ('bom', 'car'),
+      'id': 'bom_store',
+      'magic': ((b'BOMStore', 0),),
+      'min_size': 256}),
+    ('hachoir.parser.archive.bzip2_parser',
+     'Bzip2Parser',
+     {'category': 'archive',
+      'description': 'bzip2 archive',
+      'file_ext': ('bz2',),
+      'id': 'bzip2',
+      'magic': ((b'BZh', 0),),
+      'mime': ('application/x-bzip2',),
+      'min_size': 80}),
+    ('hachoir.parser.archive.cab',
+     'CabFile',
+     {'category': 'archive',
+      'description': 'Microsoft Cabinet archive',
+      'file_ext': ('cab',),
+      'id': 'cab',
+      'magic': ((b'MSCF', 0),),
+      'mime': ('application/vnd.ms-cab-compressed',),
+      'min_size': 8}),
+    ('hachoir.parser.archive.gzip_parser',
+     'GzipParser',
+     {'category': 'archive',
+      'description': 'gzip archive',
+      'file_ext': ('gz',),
+      'id': 'gzip',
+      'magic_regex': ((b'\x1f\x8b\x08.{5}[\x00\x02\x04\x06]', 0),),
+      'mime': ('application/x-gzip',),
+      'min_size': 144}),
+    ('hachoir.parser.archive.mar',
+     'MarFile',
+     {'category': 'archive',
+      'description': 'Microsoft Archive',
+      'file_ext': ('mar',),
+      'id': 'mar',
+      'magic': ((b'MARC', 0),),
+      'min_size': 640}),
+    ('hachoir.parser.archive.mozilla_ar',
+     'MozillaArchive',
+     {'category': 'archive',
+      'description': 'Mozilla Archive',
+      'file_ext': ('mar',),
+      'id': 'mozilla_ar',
+      'magic': ((b'MAR1', 0),),
+      'min_size': 200}),
+    ('hachoir.parser.archive.prs_pak',
+     'PRSPakFile',
+     {'category': 'archive',
+      'description': 'Parallel Realities Starfighter .pak archive',
+      'file_ext': ('pak',),
+      'id': 'prs_pak',
+      'magic': ((b'PACK', 0),),
+      'mime': ('application/octet-stream',),
+      'min_size': 32}),
+    ('hachoir.parser.archive.rar',
+     'RarFile',
+     {'category': 'archive',
+      'description': 'Roshal archive (RAR)',
+      'file_ext': ('rar',),
+      'id': 'rar',
+      'magic': ((b'Rar!\x1a\x07\x00', 0),),
+      'mime': ('application/x-rar-compressed',),
+      'min_size': 56}),
+    ('hachoir.parser.archive.rpm',
+     'RpmFile',
+     {'category': 'archive',
+      'description': 'RPM package',
+      'file_ext': ('rpm',),
+      'id': 'rpm',
+      'magic': ((b'\xed\xab\xee\xdb', 0),),
+      'mime': ('application/x-rpm',),
+      'min_size': 1024}),
+    ('hachoir.parser.archive.sevenzip',
+     'SevenZipParser',
+     {'category': 'archive',
+      'description': 'Compressed archive in 7z format',
+      'file_ext': ('7z',),
+      'id': '7zip',
+      'magic': ((b"7z\xbc\xaf'\x1c", 0),),
+      'mime': ('application/x-7z-compressed',),
+      'min_size': 256}),
+    ('hachoir.parser.archive.tar',
+     'TarFile',
+     {'category': 'archive',
+      'description': 'TAR archive',
+      'file_ext': ('tar',),
+      'id': 'tar',
+      'magic': ((b'ustar\x0000', 2056), (b'ustar  \x00', 2056)),
+      'mime': ('application/x-tar', 'application/x-gtar'),
+      'min_size': 4096,
+      'subfile': 'skip'}),
+    ('hachoir.parser.archive.zip',
+     'ZipFile',
+     {'category': 'archive',
+      'description': 'ZIP archive',
+      'file_ext': ('zip',
+                   'zip',
+                   'jar',
+                   'jar',
+                   'apk',
+                   'sxc',
+                   'sxd',
+                   'sxi',
+                   'sxw',
+                   'sxm',
+                   'stc',
+                   'std',
+                   'sti',
+                   'stw',
+                   'sxg',
+                   'odc',
+                   'odi',
+                   'odb',
+                   'odf',
+                   'odg',
+                   'odp',
+                   'ods',
+                   'odt',
+                   'odm',
+                   'otg',
+                   'otp',
+                   'ots',
+                   'ott'),
+      'id': 'zip',
+      'magic': ((b'PK\x03\x04', 0),),
+      'mime': ('application/zip',
+               'application/x-zip',
+               'application/x-jar',
+               'application/java-archive',
+               'application/vnd.android.package-archive',
+               'application/vnd.sun.xml.calc',
+               'application/vnd.sun.xml.draw',
+               'application/vnd.sun.xml.impress',
+               'application/vnd.sun.xml.writer',
+               'application/vnd.sun.xml.math',
+               'application/vnd.sun.xml.calc.template',
+               'application/vnd.sun.xml.draw.template',
+               'application/vnd.sun.xml.impress.template',
+               'application/vnd.sun.xml.writer.template',
+               'application/vnd.sun.xml.writer.global',
+               'application/vnd.oasis.opendocument.chart',
+               'application/vnd.oasis.opendocument.image',
+               'application/vnd.oasis.opendocument.database',
+               'application/vnd.oasis.opendocument.formula',
+               'application/vnd.oasis.opendocument.graphics',
+               'application/vnd.oasis.opendocument.presentation',
+               'application/vnd.oasis.opendocument.spreadsheet',
+               'application/vnd.oasis.opendocument.text',
+               'application/vnd.oasis.opendocument.text-master',
+               'application/vnd.oasis.opendocument.graphics-template',
+               'application/vnd.oasis.opendocument.presentation-template',
+               'application/vnd.oasis.opendocument.spreadsheet-template',
+               'application/vnd.oasis.opendocument.text-template'),
+      'min_size': 240,
+      'subfile': 'skip'}),
+    ('hachoir.parser.archive.zlib',
+     'ZlibData',
+     {'category': 'archive',
+      'description': 'ZLIB Data',
+      'file_ext': ('zlib',),
+      'id': 'zlib',
+      'min_size': 64}),
+    ('hachoir.parser.audio.aiff',
+     'AiffFile',
+     {'category': 'audio',
+      'description': 'Audio Interchange File Format (AIFF)',
+      'file_ext': ('aif', 'aiff', 'aifc'),
+      'id': 'aiff',
+      'magic_regex': ((b'FORM.{4}AIF[CF]', 0),),
+      'mime': ('audio/x-aiff',),
+      'min_size': 96}),
+    ('hachoir.parser.audio.au',
+     'AuFile',
+     {'category': 'audio',
+      'description': 'Sun/NeXT audio',
+      'file_ext': ('au', 'snd'),
+      'id': 'sun_next_snd',
+      'magic': ((b'.snd', 0),),
+      'mime': ('audio/basic',),
+      'min_size': 192}),
+    ('hachoir.parser.audio.flac',
+     'FlacParser',
+     {'category': 'audio',
+      'description': 'FLAC audio',
+      'file_ext': ('flac',),
+      'id': 'flac',
+      'magic': ((b'fLaC\x00', 0),),
+      'mime': ('audio/x-flac',),
+      'min_size': 32}),
+    ('hachoir.parser.audio.itunesdb',
+     'ITunesDBFile',
+     {'category': 'audio',
+      'description': 'iPod iTunesDB file',
+      'id': 'itunesdb',
+      'magic': ((b'mhbd', 0),),
+      'min_size': 352}),
+    ('hachoir.parser.audio.midi',
+     'MidiFile',
+     {'category': 'audio',
+      'description': 'MIDI audio',
+      'file_ext': ['mid', 'midi'],
+      'id': 'midi',
+      'magic': ((b'MThd', 0),),
+      'mime': ('audio/mime',),
+      'min_size': 64}),
+    ('hachoir.parser.audio.mod',
+     'AmigaModule',
+     {'category': 'audio',
+      'description': 'Uncompressed amiga module',
+      'file_ext': ('mod', 'nst', 'wow', 'oct', 'sd0'),
+      'id': 'mod',
+      'mime': ('audio/mod', 'audio/x-mod', 'audio/mod', 'audio/x-mod'),
+      'min_size': 8672}),
+    ('hachoir.parser.audio.mpeg_audio',
+     'MpegAudioFile',
+     {'category': 'audio',
+      'description': 'MPEG audio version 1, 2, 2.5',
+      'file_ext': ('mpa', 'mp1', 'mp2', 'mp3'),
+      'id': 'mpeg_audio',
+      'mime': ('audio/mpeg',),
+      'min_size': 32,
+      'subfile': 'skip'}),
+    ('hachoir.parser.audio.real_audio',
+     'RealAudioFile',
+     {'category': 'audio',
+      'description': 'Real audio (.ra)',
+      'file_ext': ['ra'],
+      'id': 'real_audio',
+      'magic': ((b'.ra\xfd', 0),),
+      'mime': ('audio/x-realaudio', 'audio/x-pn-realaudio'),
+      'min_size': 48}),
+    ('hachoir.parser.audio.s3m',
+     'PTMModule',
+     {'category': 'audio',
+      'description': 'PolyTracker module (v1.17)',
+      'file_ext': ('ptm',),
+      'id': 'ptm',
+      'min_size': 512}),
+    ('hachoir.parser.audio.s3m',
+     'S3MModule',
+     {'category': 'audio',
+      'description': 'ScreamTracker3 module',
+      'file_ext': ('s3m',),
+      'id': 's3m',
+      'mime': ('audio/s3m', 'audio/x-s3m'),
+      'min_size': 512}),
+    ('hachoir.parser.audio.xm',
+     'XMModule',
+     {'category': 'audio',
+      'description': 'FastTracker2 module',
+      'file_ext': ('xm',),
+      'id': 'fasttracker2',
+      'magic': ((b'Extended Module: ', 0),),
+      'mime': ('audio/xm',
+               'audio/x-xm',
+               'audio/module-xm',
+               'audio/mod',
+               'audio/x-mod'),
+      'min_size': 2920}),
+    ('hachoir.parser.container.asn1',
+     'ASN1File',
+     {'category': 'container',
+      'description': 'Abstract Syntax Notation One (ASN.1)',
+      'file_ext': ('der',),
+      'id': 'asn1',
+      'min_size': 16}),
+    ('hachoir.parser.container.mkv',
+     'MkvFile',
+     {'category': 'container',
+      'description': 'Matroska multimedia container',
+      'file_ext': ('mka', 'mkv', 'webm'),
+      'id': 'matroska',
+      'magic': ((b'\x1aE\xdf\xa3', 0),),
+      'mime': ('video/x-matroska',
+               'audio/x-matroska',
+               'video/webm',
+               'audio/webm'),
+      'min_size': 40}),
+    ('hachoir.parser.container.mp4',
+     'MP4File',
+     {'category': 'video',
+      'description': 'Apple QuickTime movie',
+      'file_ext': ('mov', 'qt', 'mp4', 'm4v', 'm4a', 'm4p', 'm4b'),
+      'id': 'mov',
+      'magic': ((b'ftyp', 32), (b'moov', 32), (b'free', 32), (b'skip', 32)),
+      'mime': ('video/quicktime', 'video/mp4'),
+      'min_size': 64}),
+    ('hachoir.parser.container.ogg',
+     'OggFile',
+     {'category': 'container',
+      'description': 'Ogg multimedia container',
+      'file_ext': ('ogg', 'ogm'),
+      'id': 'ogg',
+      'magic': ((b'OggS', 0),),
+      'mime': ('application/ogg',
+               'application/x-ogg',
+               'audio/ogg',
+               'audio/x-ogg',
+               'video/ogg',
+               'video/x-ogg',
+               'video/theora',
+               'video/x-theora'),
+      'min_size': 224,
+      'subfile': 'skip'}),
+    ('hachoir.parser.container.ogg',
+     'OggStream',
+     {'category': 'container',
+      'description': 'Ogg logical stream',
+      'id': 'ogg_stream',
+      'min_size': 56,
+      'subfile': 'skip'}),
+    ('hachoir.parser.container.realmedia',
+     'RealMediaFile',
+     {'category': 'container',
+      'description': 'RealMedia (rm) Container File',
+      'file_ext': ('rm',),
+      'id': 'real_media',
+      'magic': ((b'.RMF\x00\x00\x00\x12\x00\x01', 0),
+                (b'.RMF\x00\x00\x00\x12\x00\x00', 0)),
+      'mime': ('video/x-pn-realvideo',
+               'audio/x-pn-realaudio',
+               'audio/x-pn-realaudio-plugin',
+               'audio/x-real-audio',
+               'application/vnd.rn-realmedia'),
+      'min_size': 80}),
+    ('hachoir.parser.container.riff',
+     'RiffFile',
+     {'category': 'container',
+      'description': 'Microsoft RIFF container',
+      'file_ext': ('avi', 'cda', 'wav', 'ani'),
+      'id': 'riff',
+      'magic_regex': ((b'RIFF.{4}(?:WAVE|CDDA|AVI |ACON)', 0),),
+      'mime': ('video/x-msvideo', 'audio/x-wav', 'audio/x-cda'),
+      'min_size': 128}),
+    ('hachoir.parser.container.swf',
+     'SwfFile',
+     {'category': 'container',
+      'description': 'Macromedia Flash data',
+      'file_ext': ['swf'],
+      'id': 'swf',
+      'magic': [(b'FWS\x01', 0),
+                (b'CWS\x01', 0),
+                (b'FWS\x02', 0),
+                (b'CWS\x02', 0),
+                (b'FWS\x03', 0),
+                (b'CWS\x03', 0),
+                (b'FWS\x04', 0),
+                (b'CWS\x04', 0),
+                (b'FWS\x05', 0),
+                (b'CWS\x05', 0),
+                (b'FWS\x06', 0),
+                (b'CWS\x06', 0),
+                (b'FWS\x07', 0),
+                (b'CWS\x07', 0),
+                (b'FWS\x08', 0),
+                (b'CWS\x08', 0),
+                (b'FWS\t', 0),
+                (b'CWS\t', 0),
+                (b'FWS\n', 0),
+                (b'CWS\n', 0)],
+      'mime': ('application/x-shockwave-flash',),
+      'min_size': 64}),
+    ('hachoir.parser.file_system.ext2',
+     'EXT2_FS',
+     {'category': 'file_system',
+      'description': 'EXT2/EXT3 file system',
+      'id': 'ext2',
+      'magic': ((b'S\xef\x00\x00', 8640),
+                (b'S\xef\x01\x00', 8640),
+                (b'S\xef\x02\x00', 8640),
+                (b'S\xef\x03\x00', 8640),
+                (b'S\xef\x04\x00', 8640),
+                (b'S\xef\x05\x00', 8640),
+                (b'S\xef\x06\x00', 8640),
+                (b'S\xef\x07\x00', 8640)),
+      'min_size': 16384}),
+    ('hachoir.parser.file_system.fat',
+     'FAT12',
+     {'category': 'file_system',
+      'description': 'FAT12 filesystem',
+      'file_ext': ('',),
+      'id': 'fat12',
+      'magic': ((b'FAT12   ', 432),),
+      'min_size': 4096}),
+    ('hachoir.parser.file_system.fat',
+     'FAT16',
+     {'category': 'file_system',
+      'description': 'FAT16 filesystem',
+      'file_ext': ('',),
+      'id': 'fat16',
+      'magic': ((b'FAT16   ', 432),),
+      'min_size': 4096}),
+    ('hachoir.parser.file_system.fat',
+     'FAT32',
+     {'category': 'file_system',
+      'description': 'FAT32 filesystem',
+      'file_ext': ('',),
+      'id': 'fat32',
+      'magic': ((b'FAT32   ', 656),),
+      'min_size': 4096}),
+    ('hachoir.parser.file_system.iso9660',
+     'ISO9660',
+     {'category': 'file_system',
+      'description': 'ISO 9660 file system',
+      'id': 'iso9660',
+      'magic': ((b'\x01CD001', 262144),),
+      'min_size': 262192}),
+    ('hachoir.parser.file_system.linux_swap',
+     'LinuxSwapFile',
+     {'category': 'file_system',
+      'description': 'Linux swap file',
+      'file_ext': ('',),
+      'id': 'linux_swap',
+      'magic': ((b'SWAP-SPACE', 32688),
+                (b'SWAPSPACE2', 32688),
+                (b'S1SUSPEND\x00', 32688)),
+      'min_size': 32768}),
+    ('hachoir.parser.file_system.mbr',
+     'MSDos_HardDrive',
+     {'category': 'file_system',
+      'description': 'MS-DOS hard drive with Master Boot Record (MBR)',
+      'file_ext': ('',),
+      'id': 'msdos_harddrive',
+      'min_size': 4096}),
+    ('hachoir.parser.file_system.ntfs',
+     'NTFS',
+     {'category': 'file_system',
+      'description': 'NTFS file system',
+      'id': 'ntfs',
+      'magic': ((b'\xebR\x90NTFS    ', 0),),
+      'min_size': 8192}),
+    ('hachoir.parser.file_system.reiser_fs',
+     'REISER_FS',
+     {'category': 'file_system',
+      'description': 'ReiserFS file system',
+      'id': 'reiserfs',
+      'min_size': 2637824}),
+    ('hachoir.parser.game.blp',
+     'BLP1File',
+     {'category': 'game',
+      'description': 'Blizzard Image Format, version 1',
+      'file_ext': ('blp',),
+      'id': 'blp1',
+      'magic': ((b'BLP1', 0),),
+      'mime': ('application/x-blp',),
+      'min_size': 224}),
+    ('hachoir.parser.game.blp',
+     'BLP2File',
+     {'category': 'game',
+      'description': 'Blizzard Image Format, version 2',
+      'file_ext': ('blp',),
+      'id': 'blp2',
+      'magic': ((b'BLP2', 0),),
+      'mime': ('application/x-blp',),
+      'min_size': 160}),
+    ('hachoir.parser.game.laf',
+     'LafFile',
+     {'category': 'game',
+      'description': 'LucasArts Font',
+      'file_ext': ('laf',),
+      'id': 'lucasarts_font',
+      'min_size': 256}),
+    ('hachoir.parser.game.spider_man_video',
+     'SpiderManVideoFile',
+     {'category': 'game',
+      'description': 'The Amazing Spider-Man vs. The Kingpin (Sega CD) FMV '
+                     'video',
+      'file_ext': ('bin',),
+      'id': 'spiderman_video',
+      'min_size': 64}),
+    ('hachoir.parser.game.zsnes',
+     'ZSNESFile',
+     {'category': 'game',
+      'description': 'ZSNES Save State File (only version 143)',
+      'file_ext': ('zst',
+                   'zs1',
+                   'zs2',
+                   'zs3',
+                   'zs4',
+                   'zs5',
+                   'zs6',
+                   'zs7',
+                   'zs8',
+                   'zs9'),
+      'id': 'zsnes',
+      'min_size': 24728}),
+    ('hachoir.parser.image.bmp',
+     'BmpFile',
+     {'category': 'image',
+      'description': 'Microsoft bitmap (BMP) picture',
+      'file_ext': ('bmp',),
+      'id': 'bmp',
+      'magic_regex': ((b'BM.{4}.{8}[\x0c(l]\x00{3}', 0),),
+      'mime': ('image/x-ms-bmp', 'image/x-bmp'),
+      'min_size': 240}),
+    ('hachoir.parser.image.cr2',
+     'CR2File',
+     {'category': 'image',
+      'description': 'Canon CR2 raw image data, version 2.0',
+      'file_ext': ('cr2',),
+      'id': 'cr2',
+      'magic': ((b'CR', 64),),
+      'mime': ('image/x-canon-cr2',),
+      'min_size': 15}),
+    ('hachoir.parser.image.gif',
+     'GifFile',
+     {'category': 'image',
+      'description': 'GIF picture',
+      'file_ext': ('gif',),
+      'id': 'gif',
+      'magic': ((b'GIF87a', 0), (b'GIF89a', 0)),
+      'mime': ('image/gif',),
+      'min_size': 184}),
+    ('hachoir.parser.image.ico',
+     'IcoFile',
+     {'category': 'image',
+      'description': 'Microsoft Windows icon or cursor',
+      'file_ext': ('ico', 'cur'),
+      'id': 'ico',
+      'magic_regex': ((b'\x00\x00[\x01\x02]\x00(?:[^\x00].|.[^\x00])..(?:\x00'
+                       b'.(?:\x01\x00[\x08\x18 ]\x00|[\x00\x04]\x00\x00\x00'
+                       b')|\x10.(?:\x01\x00[\x04\x10]\x00|\x00\x00\x00\x00))',
+                       0),),
+      'mime': ('image/x-ico',),
+      'min_size': 496}),
+    ('hachoir.parser.image.jpeg',
+     'JpegFile',
+     {'category': 'image',
+      'description': 'JPEG picture',
+      'file_ext': ('jpg', 'jpeg'),
+      'id': 'jpeg',
+      'magic': ((b'\xff\xd8\xff', 0),),
+      'mime': ('image/jpeg',),
+      'min_size': 176,
+      'subfile': 'skip'}),
+    ('hachoir.parser.image.pcx',
+     'PcxFile',
+     {'category': 'image',
+      'description': 'PC Paintbrush (PCX) picture',
+      'file_ext': ('pcx',),
+      'id': 'pcx',
+      'mime': ('image/x-pcx',),
+      'min_size': 1024}),
+    ('hachoir.parser.image.png',
+     'PngFile',
+     {'category': 'image',
+      'description': 'Portable Network Graphics (PNG) picture',
+      'file_ext': ('png',),
+      'id': 'png',
+      'magic': [(b'\x89PNG\r\n\x1a\n', 0)],
+      'mime': ('image/png', 'image/x-png'),
+      'min_size': 64}),
+    ('hachoir.parser.image.psd',
+     'PsdFile',
+     {'category': 'image',
+      'description': 'Photoshop (PSD) picture',
+      'file_ext': ('psd',),
+      'id': 'psd',
+      'magic': ((b'8BPS', 0),),
+      'mime': ('image/psd', 'image/photoshop', 'image/x-photoshop'),
+      'min_size': 32}),
+    ('hachoir.parser.image.tga',
+     'TargaFile',
+     {'category': 'image',
+      'description': 'Truevision Targa Graphic (TGA)',
+      'file_ext': ('tga',),
+      'id': 'targa',
+      'mime': ('image/targa', 'image/tga', 'image/x-tga'),
+      'min_size': 144}),
+    ('hachoir.parser.image.tiff',
+     'TiffFile',
+     {'category': 'image',
+      'description': 'TIFF picture',
+      'file_ext': ('tif', 'tiff'),
+      'id': 'tiff',
+      'magic': ((b'II*\x00', 0), (b'MM\x00*', 0)),
+      'mime': ('image/tiff',),
+      'min_size': 64}),
+    ('hachoir.parser.image.wmf',
+     'WMF_File',
+     {'category': 'image',
+      'description': 'Microsoft Windows Metafile (WMF)',
+      'file_ext': ('wmf', 'apm', 'emf'),
+      'id': 'wmf',
+      'magic': ((b'\xd7\xcd\xc6\x9a\x00\x00', 0),
+                (b' EMF\x00\x00', 320),
+                (b'\x00\x00\t\x00\x00\x03', 0),
+                (b'\x01\x00\t\x00\x00\x03', 0),
+                (b'\x00\x00\t\x00\x00\x01', 0),
+                (b'\x01\x00\t\x00\x00\x01', 0)),
+      'mime': ('image/wmf',
+               'image/x-wmf',
+               'image/x-win-metafile',
+               'application/x-msmetafile',
+               'application/wmf',
+               'application/x-wmf',
+               'image/x-emf'),
+      'min_size': 320}),
+    ('hachoir.parser.image.xcf',
+     'XcfFile',
+     {'category': 'image',
+      'description': 'Gimp (XCF) picture',
+      'file_ext': ('xcf',),
+      'id': 'xcf',
+      'magic': ((b'gimp xcf ', 0),),
+      'mime': ('image/x-xcf', 'application/x-gimp-image'),
+      'min_size': 336}),
+    ('hachoir.parser.misc.bplist',
+     'BPList',
+     {'category': 'misc',
+      'description': 'Apple/NeXT Binary Property List',
+      'file_ext': ('plist',),
+      'id': 'bplist',
+      'magic': ((b'bplist00', 0),),
+      'min_size': 40}),
+    ('hachoir.parser.misc.chm',
+     'ChmFile',
+     {'category': 'misc',
+      'description': "Microsoft's HTML Help (.chm)",
+      'file_ext': ('chm',),
+      'id': 'chm',
+      'magic': ((b'ITSF\x03\x00\x00\x00', 0),),
+      'min_size': 32}),
+    ('hachoir.parser.misc.dsstore',
+     'DSStore',
+     {'category': 'misc',
+      'description': 'Mac OS X DS_Store',
+      'file_ext': ('DS_Store',),
+      'id': 'dsstore',
+      'magic': ((b'\x00\x00\x00\x01Bud1', 0),),
+      'min_size': 36}),
+    ('hachoir.parser.misc.file_3do',
+     'File3do',
+     {'category': 'misc',
+      'description': 'renderdroid 3d model.',
+      'file_ext': ('3do',),
+      'id': '3do',
+      'mime': ('image/x-3do',),
+      'min_size': 32}),
+    ('hachoir.parser.misc.file_3ds',
+     'File3ds',
+     {'category': 'misc',
+      'description': '3D Studio Max model',
+      'file_ext': ('3ds',),
+      'id': '3ds',
+      'mime': ('image/x-3ds',),
+      'min_size': 128}),
+    ('hachoir.parser.misc.fit',
+     'FITFile',
+     {'category': 'misc',
+      'description': 'Garmin binary fit format',
+      'file_ext': ('fit',),
+      'id': 'fit',
+      'mime': ('application/fit',),
+      'min_size': 112}),
+    ('hachoir.parser.misc.git_pack',
+     'GitPackFile',
+     {'category': 'misc',
+      'description': 'Git pack file',
+      'file_ext': ('.pack',),
+      'id': 'git_pack',
+      'magic': ((b'PACK', 0),),
+      'mime': ('application/octet-stream',),
+      'min_size': 96}),
+    ('hachoir.parser.misc.git_pack',
+     'GitPackIndexFile',
+     {'category': 'misc',
+      'description': 'Git pack index file',
+      'file_ext': ('idx',),
+      'id': 'git_pack_idx',
+      'magic': ((b'\xfftOc', 0),),
+      'min_size': 8576}),
+    ('hachoir.parser.misc.gnome_keyring',
+     'GnomeKeyring',
+     {'category': 'misc',
+      'description': 'Gnome keyring',
+      'id': 'gnomekeyring',
+      'magic': ((b'GnomeKeyring\n\r\x00\n', 0),),
+      'min_size': 376}),
+    ('hachoir.parser.misc.hlp',
+     'HlpFile',
+     {'category': 'misc',
+      'description': 'Microsoft Windows Help (HLP)',
+      'file_ext': ('hlp',),
+      'id': 'hlp',
+      'min_size': 32}),
+    ('hachoir.parser.misc.lnk',
+     'LnkFile',
+     {'category': 'misc',
+      'description': 'Windows Shortcut (.lnk)',
+      'file_ext': ('lnk',),
+      'id': 'lnk',
+      'magic': ((b'L\x00\x00\x00\x01\x14\x02\x00\x00\x00\x00\x00'
+                 b'\xc0\x00\x00\x00\x00\x00\x00F',
+                 0),),
+      'mime': ('application/x-ms-shortcut',),
+      'min_size': 160}),
+    ('hachoir.parser.misc.mapsforge_map',
+     'MapsforgeMapFile',
+     {'category': 'misc',
+      'description': 'Mapsforge map file',
+      'file_ext': ('map',),
+      'id': 'mapsforge_map',
+      'min_size': 496}),
+    ('hachoir.parser.misc.mstask',
+     'MSTaskFile',
+     {'category': 'misc',
+      'description': ".job 'at' file parser from ms windows",
+      'file_ext': ('job',),
+      'id': 'mstask',
+      'min_size': 100}),
+    ('hachoir.parser.misc.ole2',
+     'OLE2_File',
+     {'category': 'misc',
+      'description': 'Microsoft Office document',
+      'file_ext': ('db',
+                   'doc',
+                   'dot',
+                   'ppt',
+                   'ppz',
+                   'pps',
+                   'pot',
+                   'xls',
+                   'xla',
+                   'msi'),
+      'id': 'ole2',
+      'magic': ((b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 0),),
+      'mime': ('application/msword',
+               'application/msexcel',
+               'application/mspowerpoint'),
+      'min_size': 4096}),
+    ('hachoir.parser.misc.pcf',
+     'PcfFile',
+     {'category': 'misc',
+      'description': 'X11 Portable Compiled Font (pcf)',
+      'file_ext': ('pcf',),
+      'id': 'pcf',
+      'magic': ((b'\x01fcp', 0),),
+      'min_size': 32}),
+    ('hachoir.parser.misc.pdf',
+     'PDFDocument',
+     {'category': 'misc',
+      'description': 'Portable Document Format (PDF) document',
+      'file_ext': ('pdf',),
+      'id': 'pdf',
+      'magic': ((b'%PDF-', 0),),
+      'mime': ('application/pdf',),
+      'min_size': 72}),
+    ('hachoir.parser.misc.pifv',
+     'PIFVFile',
+     {'category': 'program',
+      'description': 'EFI Platform Initialization Firmware Volume',
+      'file_ext': ('bin', ''),
+      'id': 'pifv',
+      'magic_regex': ((b'\x00{16}.{24}_FVH', 0),),
+      'min_size': 512}),
+    ('hachoir.parser.misc.torrent',
+     'TorrentFile',
+     {'category': 'misc',
+      'description': 'Torrent metainfo file',
+      'file_ext': ('torrent',),
+      'id': 'torrent',
+      'magic': ((b'd8:announce', 0),),
+      'mime': ('application/x-bittorrent',),
+      'min_size': 400}),
+    ('hachoir.parser.misc.ttf',
+     'TrueTypeFontFile',
+     {'category': 'misc',
+      'description': 'TrueType font',
+      'file_ext': ('ttf',),
+      'id': 'ttf',
+      'min_size': 80}),
+    ('hachoir.parser.misc.word_2',
+     'Word2DocumentParser',
+     {'description': 'Microsoft Office Word Version 2.0 document',
+      'file_ext': ('doc',),
+      'id': 'word_v2_document',
+      'magic': ((b'\xdb\xa5', 0),),
+      'min_size': 8}),
+    ('hachoir.parser.misc.word_doc',
+     'WordDocumentParser',
+     {'description': 'Microsoft Office Word document',
+      'id': 'word_document',
+      'magic': ((b'\xec\xa5', 0),),
+      'min_size': 8}),
+    ('hachoir.parser.network.tcpdump',
+     'TcpdumpFile',
+     {'category': 'misc',
+      'description': 'Tcpdump file (network)',
+      'id': 'tcpdump',
+      'magic': ((b'\xd4\xc3\xb2\xa1', 0),),
+      'min_size': 192}),
+    ('hachoir.parser.program.elf',
+     'ElfFile',
+     {'category': 'program',
+      'description': 'ELF Unix/BSD program/library',
+      'file_ext': ('so', ''),
+      'id': 'elf',
+      'magic': ((b'\x7fELF', 0),),
+      'mime': ('application/x-executable',
+               'application/x-object',
+               'application/x-sharedlib',
+               'application/x-executable-file',
+               'application/x-coredump'),
+      'min_size': 416}),
+    ('hachoir.parser.program.exe',
+     'ExeFile',
+     {'category': 'program',
+      'description': 'Microsoft Windows Portable Executable',
+      'file_ext': ('exe', 'dll', 'ocx', 'pyd', 'scr'),
+      'id': 'exe',
+      'magic_regex': ((b'MZ.[\x00\x01].{4}(?:[^\x00\x01\x02\x03].|.[^\x00])',
+                       0),),
+      'mime': ('application/x-dosexec',),
+      'min_size': 512}),
+    ('hachoir.parser.program.java',
+     'JavaCompiledClassFile',
+     {'category': 'program',
+      'description': 'Compiled Java class',
+      'file_ext': ('class',),
+      'id': 'java_class',
+      'mime': ('application/java-vm',),
+      'min_size': 80}),
+    ('hachoir.parser.program.java_serialized',
+     'JavaSerializedFile',
+     {'category': 'program',
+      'description': 'Serialized Java object',
+      'file_ext': ('ser',),
+      'id': 'java_serialized',
+      'magic': ((b'\xac\xed', 0),),
+      'mime': ('application/java-serialized-object',),
+      'min_size': 16}),
+    ('hachoir.parser.program.macho',
+     'MachoFatFile',
+     {'category': 'program',
+      'description': 'Mach-O fat program/library',
+      'file_ext': ('dylib', 'bundle', ''),
+      'id': 'macho_fat',
+      'magic': ((b'\xbe\xba\xfe\xca', 0), (b'\xca\xfe\xba\xbe', 0)),
+      'mime': ('application/x-executable',
+               'application/x-object',
+               'application/x-sharedlib',
+               'application/x-executable-file',
+               'application/x-coredump'),
+      'min_size': 33440}),
+    ('hachoir.parser.program.macho',
+     'MachoFile',
+     {'category': 'program',
+      'description': 'Mach-O program/library',
+      'file_ext': ('dylib', 'bundle', 'o', ''),
+      'id': 'macho',
+      'magic': ((b'\xfe\xed\xfa\xce', 0),
+                (b'\xce\xfa\xed\xfe', 0),
+                (b'\xfe\xed\xfa\xcf', 0),
+                (b'\xcf\xfa\xed\xfe', 0)),
+      'mime': ('application/x-executable',
+               'application/x-object',
+               'application/x-sharedlib',
+               'application/x-executable-file',
+               'application/x-coredump'),
+      'min_size': 672}),
+    ('hachoir.parser.program.nds',
+     'NdsFile',
+     {'category': 'program',
+      'description': 'Nintendo DS game file',
+      'file_ext': ('nds',),
+      'id': 'nds_file',
+      'mime': ('application/octet-stream',),
+      'min_size': 2816}),
+    ('hachoir.parser.program.prc',
+     'PRCFile',
+     {'category': 'program',
+      'description': 'Palm Resource File',
+      'file_ext': ('prc', ''),
+      'id': 'prc',
+      'mime': ('application/x-pilot-prc', 'application/x-palmpilot'),
+      'min_size': 80}),
+    ('hachoir.parser.program.python',
+     'PythonCompiledFile',
+     {'category': 'program',
+      'description': 'Compiled Python script (.pyc/.pyo files)',
+      'file_ext': ('pyc', 'pyo'),
+      'id': 'python',
+      'min_size': 72}),
+    ('hachoir.parser.video.asf',
+     'AsfFile',
+     {'category': 'video',
+      'description': 'Advanced Streaming Format (ASF), used for WMV (video) '
+                     'and WMA (audio)',
+      'file_ext': ('wmv', 'wma', 'asf'),
+      'id': 'asf',
+      'magic': ((b'0&\xb2u\x8ef\xcf\x11\xa6\xd9\x00\xaa\x00b\xcel', 0),),
+      'mime': ('video/x-ms-asf', 'video/x-ms-wmv', 'audio/x-ms-wma'),
+      'min_size': 192}),
+    ('hachoir.parser.video.flv',
+     'FlvFile',
+     {'category': 'video',
+      'description': 'Macromedia Flash video',
+      'file_ext': ('flv',),
+      'id': 'flv',
+      'magic_regex': ((b'FLV..\x00\x00\x00\t', 0),),
+      'mime': ('video/x-flv',),
+      'min_size': 36}),
+    ('hachoir.parser.video.mpeg_ts',
+     'MPEG_TS',
+     {'category': 'video',
+      'description': 'MPEG-2 Transport Stream',
+      'file_ext': ('ts', 'm2ts', 'mts'),
+      'id': 'mpeg_ts',
+      'mime': ('video/MP2T',),
+      'min_size': 1504}),
+    ('hachoir.parser.video.mpeg_video',
+     'MPEGVideoFile',
+     {'category': 'video',
+      'description': 'MPEG video, version 1 or 2',
+      'file_ext': ('mpeg', 'mpg', 'mpe', 'vob'),
+      'id': 'mpeg_video',
+      'mime': ('video/mpeg', 'video/mp2p'),
+      'min_size': 96}),
+]
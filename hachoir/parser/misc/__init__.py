@@ -1,20 +1,25 @@
-from hachoir.parser.misc.file_3do import File3do  # noqa
-from hachoir.parser.misc.file_3ds import File3ds  # noqa
-from hachoir.parser.misc.torrent import TorrentFile  # noqa
-from hachoir.parser.misc.ttf import TrueTypeFontFile  # noqa
-from hachoir.parser.misc.chm import ChmFile  # noqa
-from hachoir.parser.misc.lnk import LnkFile  # noqa
-from hachoir.parser.misc.pcf import PcfFile  # noqa
-from hachoir.parser.misc.ole2 import OLE2_File  # noqa
-from hachoir.parser.misc.pdf import PDFDocument  # noqa
-from hachoir.parser.misc.pifv import PIFVFile  # noqa
-from hachoir.parser.misc.hlp import HlpFile  # noqa
-from hachoir.parser.misc.gnome_keyring import GnomeKeyring  # noqa
-from hachoir.parser.misc.bplist import BPList  # noqa
-from hachoir.parser.misc.dsstore import DSStore  # noqa
-from hachoir.parser.misc.word_doc import WordDocumentParser  # noqa
-from hachoir.parser.misc.word_2 import Word2DocumentParser  # noqa
-from hachoir.parser.misc.mstask import MSTaskFile  # noqa
-from hachoir.parser.misc.mapsforge_map import MapsforgeMapFile  # noqa
-from hachoir.parser.misc.fit import FITFile  # noqa
-from hachoir.parser.misc.git_pack import GitPackFile  # noqa
+from hachoir.core.lazy import lazyModule
+
+__getattr__, __dir__ = lazyModule(__name__, {
+    "File3do": "file_3do",
+    "File3ds": "file_3ds",
+    "TorrentFile": "torrent",
+    "TrueTypeFontFile": "ttf",
+    "ChmFile": "chm",
+    "LnkFile": "lnk",
+    "PcfFile": "pcf",
+    "OLE2_File": "ole2",
+    "PDFDocument": "pdf",
+    "PIFVFile": "pifv",
+    "HlpFile": "hlp",
+    "GnomeKeyring": "gnome_keyring",
+    "BPList": "bplist",
+    "DSStore": "dsstore",
+    "WordDocumentParser": "word_doc",
+    "Word2DocumentParser": "word_2",
+    "MSTaskFile": "mstask",
+    "MapsforgeMapFile": "mapsforge_map",
+    "FITFile": "fit",
+    "GitPackFile": "git_pack",
+    "GitPackIndexFile": "git_pack",
+})
@@ -18,9 +18,10 @@ Creation date: 2007-03-04
 from hachoir.field import (Field, FieldSet, ParserError, RootSeekableFieldSet,
                            Int32, UInt16, UInt32, UInt64,
                            RawBytes, PaddingBytes,
-                           Enum, String)
+                           Enum, String, CompressedField)
 from hachoir.core.endian import LITTLE_ENDIAN
 from hachoir.parser import HachoirParser
+from hachoir.parser.archive.lzx import LZXDecompressor, LZX_FRAME_SIZE
 from hachoir.parser.common.win32 import GUID
 from hachoir.parser.common.win32_lang_id import LANGUAGE_ID
 from hachoir.core.text_handler import textHandler, hexadecimal, filesizeHandler
@@ -335,8 +336,10 @@ class ChmFile(HachoirParser, RootSeekableFieldSet):
                     elif name.endswith('/Transform/{7FC28940-9D31-11D0-9B27-00A0C91E9C7C}/InstanceData/ResetTable'):
                         yield ResetTable(self, "%s_reset_table" % sectname, "LZX Reset Table", size=entry["length"].value * 8)
                     elif name.endswith('/Content'):
-                        # eventually, a LZX wrapper will appear here, we hope!
-                        yield RawBytes(self, "%s_content" % sectname, entry["length"].value, "Content for the %s section" % sectname)
+                        field = RawBytes(self, "%s_content" % sectname, entry["length"].value, "Content for the %s section" % sectname)
+                        if sectname == "MSCompressed":
+                            field = CompressedField(field, self.createLZXDecompressor)
+                        yield field
                     else:
                         yield RawBytes(self, "entry_data[]", entry["length"].value, name)
                 elif name == "/#SYSTEM":
@@ -344,6 +347,26 @@ class ChmFile(HachoirParser, RootSeekableFieldSet):
                 else:
                     yield RawBytes(self, "entry_data[]", entry["length"].value, name)
 
+    def createLZXDecompressor(self, stream):
+        """Create the decompressor of the MSCompressed section content"""
+        control = self["MSCompressed_controldata"]
+        if control["type"].value != 'LZXC':
+            raise ParserError("Unknown compression: %r" % control["type"].value)
+        reset_interval = control["reset_interval"].value
+        window_size = control["window_size"].value
+        if control["version"].value != 1:
+            reset_interval *= LZX_FRAME_SIZE
+            window_size *= LZX_FRAME_SIZE
+        window_bits = window_size.bit_length() - 1
+        if window_size != (1 << window_bits):
+            raise ParserError("Invalid LZX window size: %s" % window_size)
+        if "MSCompressed_spaninfo" in self:
+            output_size = self["MSCompressed_spaninfo"].value
+        else:
+            output_size = None
+        return LZXDecompressor(stream, window_bits,
+                               reset_interval // LZX_FRAME_SIZE, output_size)
+
     def getFile(self, filename):
         page = 0
         if 'pmgi' in self['/dir']:
@@ -6,13 +6,23 @@ See https://git-scm.com/docs/gitformat-pack
 FIXME: there are probably still some endianness bugs in this parser.
 """
 
-from hachoir.parser import Parser
-from hachoir.field import (UInt8, UInt32, String, SubFile, FieldSet, Bit, Bits, RawBytes, Enum, GenericInteger)
+from hachoir.parser import Parser, ValidateError
+from hachoir.field import (UInt8, UInt32, UInt64, String, SubFile, FieldSet, Bit, Bits, Bytes, RawBytes, Enum, GenericInteger,
+                           IntegerArray, ParserError, MissingField, createOrphanField)
 from hachoir.core.endian import LITTLE_ENDIAN, BIG_ENDIAN
 from hachoir.core.text_handler import textHandler, hexadecimal
 from hachoir.parser.common.deflate import Deflate
+from hachoir.stream import FileInputStream, StringInputStream
+from bisect import bisect_left
+from collections import OrderedDict
+import os
 import zlib
 
+# Max. size in bytes of the decompressed data of an object kept after finding
+# the end of its compressed data, and max. total size of these data
+MAX_CACHED_OBJECT_SIZE = 1 << 20
+MAX_OBJECT_CACHE_SIZE = 16 << 20
+
 
 class ObjCommitParser(Parser):
     PARSER_TAGS = {
@@ -175,7 +185,8 @@ class ObjectEntry(FieldSet):
 
         if type_and_size["typ"].value == 6:
             yield VarLengthInt(self, "offset")
-        # FIXME: for OBJ_REF_DELTA objects the parser needs to add another field; but I haven't been able to create such test files yet.
+        elif type_and_size["typ"].value == 7:
+            yield textHandler(GenericInteger(self, "base_object", False, 20 * 8, "SHA1 of the base object"), hexadecimal)
 
         parser_for_sub_field = None
         if type_and_size["typ"].value == 1:
@@ -184,27 +195,56 @@ class ObjectEntry(FieldSet):
             parser_for_sub_field = ObjOfsDeltaParser
         # FIXME: add parsers for other object types
 
-        num_compressed_bytes = self._determine_zlib_data_size(self.stream, self.absolute_address + self.current_size)
-        yield Deflate(SubFile(self, "compressed_data", num_compressed_bytes, parser_class=parser_for_sub_field), False)
+        if self._size is not None:
+            # size given by the pack index
+            num_compressed_bytes = (self._size - self.current_size) // 8
+        else:
+            num_compressed_bytes = self._determine_zlib_data_size(self.stream, self.absolute_address + self.current_size)
+        self.parser_class = parser_for_sub_field
+        field = Deflate(SubFile(self, "compressed_data", num_compressed_bytes, parser_class=parser_for_sub_field), False)
+        field.setSubIStream(self._createDataStream)
+        yield field
 
     def createDescription(self):
         return self["type_and_size"].description
 
+    def _createDataStream(self, cis, source=None, **args):
+        # Reuse the data decompressed by _determine_zlib_data_size()
+        data = self.root.object_cache.pop(self.absolute_address, None)
+        if data is None:
+            return cis(source=source, **args)
+        if self.parser_class:
+            args.setdefault("tags", []).append(("class", self.parser_class))
+        if source is None:
+            source = "Compressed source: '%s' (offset=%s)" % (
+                self.stream.source, self["compressed_data"].absolute_address)
+        return StringInputStream(data, source=source, **args)
+
     def _determine_zlib_data_size(self, stream, start_addr_in_bits):
         # This file format does not store the size of the compressed data.
         # Workaround: try to parse the compressed data until the parser has reached an end, to find the size of the compressed section.
-        # The parsed data is thrown away.
+        # Small decompressed data are kept in the object cache of the parser to not decompress them again.
         decompressor = zlib.decompressobj()
         read_addr_in_bits = start_addr_in_bits
         total_bytes_read = 0
+        chunk_size = 4096
+        keep = (self["type_and_size"].decoded_size <= MAX_CACHED_OBJECT_SIZE)
+        data = []
         while not decompressor.eof:
             max_remaining_bytes = (stream.size - read_addr_in_bits) // 8
-            num_bytes_to_read = min(1000, max_remaining_bytes)
+            num_bytes_to_read = min(chunk_size, max_remaining_bytes)
+            if num_bytes_to_read <= 0:
+                raise ParserError("Truncated compressed data")
             bytes_read = stream.readBytes(read_addr_in_bits, num_bytes_to_read)
             total_bytes_read += len(bytes_read)
             read_addr_in_bits += (len(bytes_read) * 8)
-            decompressor.decompress(bytes_read)
+            output = decompressor.decompress(bytes_read)
+            if keep:
+                data.append(output)
+            chunk_size = min(2 * chunk_size, 1 << 20)
 
+        if keep:
+            self.root.cacheObject(self.absolute_address, b"".join(data))
         return total_bytes_read - len(decompressor.unused_data)
 
 
@@ -216,12 +256,18 @@ class GitPackFile(Parser):
         "file_ext": (".pack",),
         "mime": (u"application/octet-stream",),
         "min_size": (4 + 4 + 4) * 8,  # just the header
-        "magic": ((b'PACK',),),
+        "magic": ((b'PACK', 0),),
         "description": "Git pack file",
     }
 
     endian = BIG_ENDIAN
 
+    # Index of the pack (GitPackIndexFile): if it is not set, the companion
+    # .idx file is used if it exists (see getPackIndex())
+    pack_index = None
+    # Parser of the companion .idx file opened by getPackIndex()
+    _index_file = None
+
     def validate(self):
         return (self.stream.readBytes(0, 4) == b"PACK"
                 and self["version"].value in (2, 3))
@@ -231,7 +277,214 @@ class GitPackFile(Parser):
         yield UInt32(self, "version")
         yield UInt32(self, "num_objects")
 
+        offsets = self.getObjectOffsets()
         for i in range(self["num_objects"].value):
-            yield ObjectEntry(self, "object[]")
+            if offsets:
+                yield ObjectEntry(self, "object[]", size=self._objectSize(offsets, i))
+            else:
+                yield ObjectEntry(self, "object[]")
+
+        yield textHandler(GenericInteger(self, "checksum", False, 20 * 8, "SHA1 checksum of all previous data"), hexadecimal)
+
+    @property
+    def object_cache(self):
+        """
+        Decompressed data of the last objects (address in bits => bytes),
+        see ObjectEntry._determine_zlib_data_size()
+        """
+        try:
+            return self._object_cache
+        except AttributeError:
+            self._object_cache = OrderedDict()
+            self._object_cache_size = 0
+            return self._object_cache
+
+    def cacheObject(self, address, data):
+        cache = self.object_cache
+        old = cache.pop(address, None)
+        if old is not None:
+            self._object_cache_size -= len(old)
+        cache[address] = data
+        self._object_cache_size += len(data)
+        while MAX_OBJECT_CACHE_SIZE < self._object_cache_size:
+            address, data = cache.popitem(last=False)
+            self._object_cache_size -= len(data)
+
+    def getPackIndex(self):
+        """
+        Get the index of the pack: the pack_index attribute, or the parser of
+        the companion .idx file (eg. "pack-xxx.idx" for "pack-xxx.pack").
+        Return None if there is no index.
+        """
+        if self.pack_index is None and not hasattr(self, "_index_searched"):
+            self._index_searched = True
+            for tag, filename in self.stream.tags:
+                if tag == "filename" and filename.endswith(".pack"):
+                    filename = filename[:-5] + ".idx"
+                    if os.path.isfile(filename):
+                        stream = FileInputStream(filename)
+                        try:
+                            index = GitPackIndexFile(stream, validate=True)
+                        except ValidateError as err:
+                            stream.close()
+                            self.warning("Invalid pack index %s: %s" % (filename, err))
+                        else:
+                            self.pack_index = self._index_file = index
+                    break
+        return self.pack_index
+
+    def close(self):
+        """
+        Close the stream of the pack, and the companion .idx file if it has
+        been opened by getPackIndex().
+        """
+        if self._index_file is not None:
+            self._index_file.close()
+            if self.pack_index is self._index_file:
+                self.pack_index = None
+            self._index_file = None
+        Parser.close(self)
+
+    def getObjectOffsets(self):
+        """
+        Get the sorted list of the offsets in bytes of the objects, or None
+        if the pack has no index.
+        """
+        try:
+            return self._object_offsets
+        except AttributeError:
+            index = self.getPackIndex()
+            if index is not None:
+                if index.count != self["num_objects"].value:
+                    self.warning("The pack index doesn't match the pack")
+                    index = None
+                else:
+                    self._object_offsets = sorted(index.getOffsets())
+            if index is None:
+                self._object_offsets = None
+            return self._object_offsets
+
+    def _objectSize(self, offsets, index):
+        if index + 1 < len(offsets):
+            end = offsets[index + 1]
+        else:
+            end = self.size // 8 - 20
+        return (end - offsets[index]) * 8
+
+    def getObject(self, index):
+        """
+        Get the object number index (in pack order). If the pack has an
+        index, the object is read directly from its offset, without parsing
+        the previous objects.
+        """
+        name = "object[%u]" % index
+        offsets = self.getObjectOffsets()
+        if offsets is None or name in self._fields:
+            return self[name]
+        if not (0 <= index < len(offsets)):
+            raise MissingField(self, name)
+        return createOrphanField(self, offsets[index] * 8, ObjectEntry, name,
+                                 size=self._objectSize(offsets, index))
+
+    def findObject(self, sha1):
+        """
+        Find an object by its SHA-1 (hexadecimal string or 20 bytes) using
+        the pack index. Return None if the object doesn't exist.
+        """
+        index = self.getPackIndex()
+        if index is None:
+            raise ParserError("Unable to find an object without pack index")
+        offset = index.findOffset(sha1)
+        if offset is None:
+            return None
+        return self.getObject(bisect_left(self.getObjectOffsets(), offset))
+
+    def _getField(self, name, const):
+        field = Parser._getField(self, name, True)
+        if field is None and not const and name.startswith("object[") \
+                and name[7:-1].isdigit() and self.getObjectOffsets():
+            field = self.getObject(int(name[7:-1]))
+        if field is None:
+            field = Parser._getField(self, name, const)
+        return field
+
+
+class GitPackIndexFile(Parser):
+    """
+    Index of a Git pack file (version 2): SHA-1 and offset of the objects.
+    """
+
+    PARSER_TAGS = {
+        "id": "git_pack_idx",
+        "category": "misc",
+        "file_ext": ("idx",),
+        "min_size": (4 + 4 + 256 * 4 + 20 + 20) * 8,
+        "magic": ((b'\xfftOc', 0),),
+        "description": "Git pack index file",
+    }
+
+    endian = BIG_ENDIAN
+
+    def validate(self):
+        if self.stream.readBytes(0, 4) != b"\xfftOc":
+            return "Invalid magic"
+        if self["version"].value != 2:
+            return "Unsupported version"
+        return True
 
+    def createFields(self):
+        yield Bytes(self, "magic", 4)
+        yield UInt32(self, "version")
+        yield IntegerArray(self, "fanout", 256, UInt32, "Number of objects with a SHA-1 first byte less than or equal to the index")
+        count = self["fanout"][255]
+        if count:
+            yield RawBytes(self, "sha1", count * 20, "Sorted SHA-1 of the objects")
+            yield IntegerArray(self, "crc32", count, UInt32, "CRC-32 of the packed objects")
+            yield IntegerArray(self, "offset", count, UInt32, "Offset of the objects in the pack file")
+            large = sum(1 for offset in self["offset"].value if offset & 0x80000000)
+            if large:
+                yield IntegerArray(self, "large_offset", large, UInt64, "Offsets of 2 GB or more")
+        yield textHandler(GenericInteger(self, "pack_checksum", False, 20 * 8, "SHA1 checksum of the pack file"), hexadecimal)
         yield textHandler(GenericInteger(self, "checksum", False, 20 * 8, "SHA1 checksum of all previous data"), hexadecimal)
+
+    @property
+    def count(self):
+        return self["fanout"][255]
+
+    def getOffsets(self):
+        """Offsets of the objects in SHA-1 order"""
+        if not self.count:
+            return []
+        offsets = self["offset"].value.tolist()
+        if "large_offset" in self:
+            large_offsets = self["large_offset"].value
+            for index, offset in enumerate(offsets):
+                if offset & 0x80000000:
+                    offsets[index] = large_offsets[offset & 0x7fffffff]
+        return offsets
+
+    def findOffset(self, sha1):
+        """
+        Get the offset of an object from its SHA-1 (hexadecimal string or
+        20 bytes), or None if the object is not in the pack.
+        """
+        if isinstance(sha1, str):
+            sha1 = bytes.fromhex(sha1)
+        first = sha1[0]
+        fanout = self["fanout"].value
+        low = fanout[first - 1] if first else 0
+        high = fanout[first]
+        names = self["sha1"].value if high else b""
+        while low < high:
+            middle = (low + high) // 2
+            name = names[middle * 20:middle * 20 + 20]
+            if name < sha1:
+                low = middle + 1
+            elif sha1 < name:
+                high = middle
+            else:
+                offset = self["offset"][middle]
+                if offset & 0x80000000:
+                    offset = self["large_offset"][offset & 0x7fffffff]
+                return offset
+        return None
@@ -43,45 +43,21 @@ class RootEntry(OLE2FragmentParser):
         if property["size"].value >= ole2["header/threshold"].value:
             return
         name = "%s[]" % name_prefix
-        first = None
-        previous = None
-        size = 0
         fragment_group = None
-        chain = ole2.getChain(property["start"].value, ole2.ss_fat)
-        while True:
-            try:
-                block = next(chain)
-                contiguous = False
-                if first is None:
-                    first = block
-                    contiguous = True
-                if previous is not None and block == (previous + 1):
-                    contiguous = True
-                if contiguous:
-                    previous = block
-                    size += ole2.ss_size
-                    continue
-            except StopIteration:
-                block = None
-            if first is None:
-                break
+        for first, count in ole2.getExtents(property["start"].value, True):
             self.seekSBlock(first)
             desc = "Small blocks %s..%s (%s)" % (
-                first, previous, previous - first + 1)
+                first, first + count - 1, count)
             desc += " of %s bytes" % (ole2.ss_size // 8)
             field = CustomFragment(
-                self, name, size, parser, desc, fragment_group)
+                self, name, count * ole2.ss_size, parser, desc,
+                fragment_group)
             yield field
             if not fragment_group:
                 fragment_group = field.group
                 fragment_group.args["ole2"] = field.root
                 fragment_group.args["datasize"] = property["size"].value
                 fragment_group.args["ole2name"] = property["name"].value
-            if block is None:
-                break
-            first = block
-            previous = block
-            size = ole2.ss_size
 
 
 class Pictures(OLE2FragmentParser):
@@ -27,7 +27,10 @@ from hachoir.field import (
     Bytes, NullBytes, String, CustomFragment)
 from hachoir.core.text_handler import filesizeHandler
 from hachoir.core.endian import LITTLE_ENDIAN
+from array import array
 from hachoir.parser.common.win32 import GUID
+from hachoir.parser.common.allocation_table import (
+    readAllocationTable, chainExtents)
 from hachoir.parser.misc.msoffice import PROPERTY_NAME, RootEntry, RawParser
 
 MIN_BIG_BLOCK_LOG2 = 6   # 512 bytes
@@ -190,6 +193,11 @@ class OLE2_File(HachoirParser, RootSeekableFieldSet):
     }
     endian = LITTLE_ENDIAN
 
+    # Decoded FAT and small block FAT (array of block indexes), set when
+    # all their fields are parsed: see bb_fat_table and ss_fat_table
+    _bb_fat_table = None
+    _ss_fat_table = None
+
     def __init__(self, stream, **args):
         RootSeekableFieldSet.__init__(
             self, None, "root", stream, None, stream.askSize(self))
@@ -270,60 +278,58 @@ class OLE2_File(HachoirParser, RootSeekableFieldSet):
         if property["size"].value < self["header/threshold"].value and name_prefix != 'root':
             return
         name = "%s[]" % name_prefix
-        first = None
-        previous = None
-        size = 0
         fragment_group = None
-        chain = self.getChain(property["start"].value)
-        while True:
-            try:
-                block = next(chain)
-                contiguous = False
-                if first is None:
-                    first = block
-                    contiguous = True
-                if previous is not None and block == (previous + 1):
-                    contiguous = True
-                if contiguous:
-                    previous = block
-                    size += self.sector_size
-                    continue
-            except StopIteration:
-                block = None
-            if first is None:
-                break
+        for first, count in self.getExtents(property["start"].value):
             self.seekBlock(first)
             desc = "Big blocks %s..%s (%s)" % (
-                first, previous, previous - first + 1)
+                first, first + count - 1, count)
             desc += " of %s bytes" % (self.sector_size // 8)
             field = CustomFragment(
-                self, name, size, parser, desc, fragment_group)
+                self, name, count * self.sector_size, parser, desc,
+                fragment_group)
             if not fragment_group:
                 fragment_group = field.group
                 fragment_group.args["ole2"] = field.root
                 fragment_group.args["datasize"] = property["size"].value
                 fragment_group.args["ole2name"] = property["name"].value
             yield field
-            if block is None:
-                break
-            first = block
-            previous = block
-            size = self.sector_size
+
+    def _readTable(self, name):
+        # Parse the fields until the table is decoded
+        while getattr(self, name) is None and self.readMoreFields(1):
+            pass
+        table = getattr(self, name)
+        if table is None:
+            raise ParserError("OLE2: unable to read the allocation table")
+        return table
+
+    @property
+    def bb_fat_table(self):
+        """Decoded FAT: the FAT fields are parsed if needed"""
+        return self._readTable("_bb_fat_table")
+
+    @property
+    def ss_fat_table(self):
+        """Decoded small block FAT: the SFAT fields are parsed if needed"""
+        return self._readTable("_ss_fat_table")
 
     def getChain(self, start, use_sfat=False):
+        """
+        Generate the blocks of the chain starting at block start, using the
+        small block FAT if use_sfat is True.
+        """
         if use_sfat:
-            fat = self.ss_fat
-            items_per_fat = self.items_per_ssfat
+            fat = self.ss_fat_table
             err_prefix = "SFAT chain"
         else:
-            fat = self.bb_fat
-            items_per_fat = self.items_per_bbfat
+            fat = self.bb_fat_table
             err_prefix = "BFAT chain"
+        specials = SECT.SPECIALS
         block = start
         block_set = set()
         previous = block
         while block != SECT.END_OF_CHAIN:
-            if block in SECT.SPECIALS:
+            if block in specials:
                 raise ParserError("%s: Invalid block index (0x%08x), previous=%s" % (
                     err_prefix, block, previous))
             if block in block_set:
@@ -332,14 +338,21 @@ class OLE2_File(HachoirParser, RootSeekableFieldSet):
             block_set.add(block)
             yield block
             previous = block
-            index = block // items_per_fat
             try:
-                block = fat[index]["index[%u]" % block].value
-            except LookupError:
+                block = fat[block]
+            except IndexError:
                 break
 
+    def getExtents(self, start, use_sfat=False):
+        """
+        Generate the extents of the chain starting at block start:
+        (first block, number of blocks) tuples of consecutive blocks.
+        """
+        return chainExtents(self.getChain(start, use_sfat))
+
     def readBFAT(self):
         self.bb_fat = []
+        table = array("I")
         start = 0
         count = self.items_per_bbfat
         for index, block in enumerate(self.array("difat/index")):
@@ -354,13 +367,18 @@ class OLE2_File(HachoirParser, RootSeekableFieldSet):
             field = SectFat(self, "bbfat[]", start, count, desc)
             yield field
             self.bb_fat.append(field)
+            readAllocationTable(self.stream, field.absolute_address,
+                                field.size // 8, SECT.static_size,
+                                table=table)
 
             start += count
+        self._bb_fat_table = table
 
     def readSFAT(self):
         chain = self.getChain(self["header/sb_start"].value)
         start = 0
         self.ss_fat = []
+        table = array("I")
         count = self.items_per_ssfat
         for index, block in enumerate(chain):
             self.seekBlock(block)
@@ -370,15 +388,17 @@ class OLE2_File(HachoirParser, RootSeekableFieldSet):
                             (1 + index, self["header/sb_count"].value, block))
             yield field
             self.ss_fat.append(field)
+            readAllocationTable(self.stream, field.absolute_address,
+                                field.size // 8, SECT.static_size,
+                                table=table)
             start += count
+        self._ss_fat_table = table
 
     def createContentSize(self):
         max_block = 0
-        for fat in self.array("bbfat"):
-            for entry in fat:
-                block = entry.value
-                if block not in SECT.SPECIALS:
-                    max_block = max(block, max_block)
+        for block in self.bb_fat_table:
+            if block not in SECT.SPECIALS:
+                max_block = max(block, max_block)
         if max_block in SECT.SPECIALS:
             return None
         else:
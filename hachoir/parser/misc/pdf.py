@@ -14,9 +14,334 @@ from hachoir.field import (
     RawBytes)
 from hachoir.core.endian import LITTLE_ENDIAN
 from hachoir.core.text_handler import textHandler, hexadecimal
+from base64 import a85decode
+from collections import namedtuple
+import re
+import zlib
 
 MAGIC = b"%PDF-"
 ENDMAGIC = b"%%EOF"
+STARTXREF = b"startxref"
+
+# The end of the file is searched for "startxref"
+STARTXREF_SEARCH_SIZE = 1024
+
+# Size in bytes of the blocks read to rebuild the cross-reference index
+# when startxref is invalid
+SCAN_BLOCK_SIZE = 1024 * 1024
+
+# Size in bytes of the data read to parse an object, multiplied by 4 while
+# the object is truncated
+OBJECT_READ_SIZE = 4096
+
+WHITESPACE = b"\0\t\n\x0c\r "
+SPACE = rb"[\0\t\n\x0c\r ]"
+DELIMITER = rb"[\0\t\n\x0c\r ()<>\[\]{}/%]"
+REGULAR_REGEX = re.compile(rb"[^\0\t\n\x0c\r ()<>\[\]{}/%]*")
+NAME_ESCAPE_REGEX = re.compile(rb"#([0-9a-fA-F]{2})")
+REFERENCE_REGEX = re.compile(SPACE + rb"+(\d+)" + SPACE + rb"+R(?=" + DELIMITER + rb")")
+# Truncated data which may be the end of a reference: "generation R"
+PARTIAL_REFERENCE_REGEX = re.compile(SPACE + rb"*(?:\d+(?:" + SPACE + rb"+R?)?)?")
+OBJECT_REGEX = re.compile(SPACE + rb"*(\d+)" + SPACE + rb"+(\d+)" + SPACE + rb"*obj")
+# "number generation obj" keyword anywhere in the file
+OBJECT_SCAN_REGEX = re.compile(rb"(?<![^\0\t\n\x0c\r ()<>\[\]{}/%])(\d{1,10})"
+                               + SPACE + rb"+(\d{1,5})" + SPACE + rb"+obj(?="
+                               + DELIMITER + rb")")
+XREF_ENTRY_REGEX = re.compile(rb"(\d{1,10}) +(\d{1,5}) +([nf])")
+XREF_SUBSECTION_REGEX = re.compile(SPACE + rb"*(\d+)" + SPACE + rb"+(\d+)[\0\t\x0c ]*[\r\n]")
+STARTXREF_REGEX = re.compile(SPACE + rb"*(\d+)")
+TRAILER_REGEX = re.compile(SPACE + rb"*trailer")
+EOL_REGEX = re.compile(rb"[\r\n]")
+OCTAL_REGEX = re.compile(rb"[0-7]{1,3}")
+
+# PDFDocEncoding characters which are different in ISO-8859-1
+PDFDOC_ENCODING = str.maketrans(dict(zip(
+    list(range(0x18, 0x20)) + list(range(0x80, 0x9F)) + [0xA0],
+    "\u02d8\u02c7\u02c6\u02d9\u02dd\u02db\u02da\u02dc"
+    "\u2022\u2020\u2021\u2026\u2014\u2013\u0192\u2044\u2039\u203a\u2212"
+    "\u2030\u201e\u201c\u201d\u2018\u2019\u201a\u2122\ufb01\ufb02\u0141"
+    "\u0152\u0160\u0178\u017d\u0131\u0142\u0153\u0161\u017e\u20ac")))
+STRING_ESCAPES = {
+    ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t", ord("b"): b"\b",
+    ord("f"): b"\f", ord("("): b"(", ord(")"): b")", ord("\\"): b"\\",
+}
+
+
+class Reference(namedtuple("Reference", "number generation")):
+    """
+    Reference to an indirect object: "number generation R".
+    """
+
+    def __str__(self):
+        return "%s %s R" % self
+
+
+class StreamObject:
+    """
+    Stream object: dictionary and address in bytes of the (encoded) data.
+    """
+
+    def __init__(self, dictionary, address):
+        self.dictionary = dictionary
+        self.address = address
+
+    def __repr__(self):
+        return "<StreamObject %r at %s>" % (self.dictionary, self.address)
+
+
+class TruncatedObject(Exception):
+    """
+    The data ends in the middle of an object: more data has to be read.
+    """
+    pass
+
+
+def skipWhitespace(data, pos):
+    """
+    Skip whitespace and comments, raise TruncatedObject at the end of data.
+    """
+    while True:
+        if len(data) <= pos:
+            raise TruncatedObject()
+        char = data[pos]
+        if char == 0x25:   # "%": comment up to the end of the line
+            match = EOL_REGEX.search(data, pos)
+            if match is None:
+                raise TruncatedObject()
+            pos = match.end()
+        elif char in WHITESPACE:
+            pos += 1
+        else:
+            return pos
+
+
+def parseLiteralString(data, pos):
+    # Parse "(string)" starting at pos: (bytes, end)
+    value = bytearray()
+    depth = 1
+    pos += 1
+    while True:
+        if len(data) <= pos:
+            raise TruncatedObject()
+        char = data[pos]
+        pos += 1
+        if char == 0x5C:   # "\\"
+            if len(data) < pos + 3:
+                raise TruncatedObject()
+            char = data[pos]
+            if char in STRING_ESCAPES:
+                value += STRING_ESCAPES[char]
+                pos += 1
+            elif 0x30 <= char <= 0x37:
+                match = OCTAL_REGEX.match(data, pos)
+                value.append(int(match.group(), 8) & 0xFF)
+                pos = match.end()
+            elif char == 0x0D:
+                # Line continuation
+                pos += 2 if data[pos + 1] == 0x0A else 1
+            elif char == 0x0A:
+                pos += 1
+        elif char == 0x28:  # "("
+            depth += 1
+            value.append(char)
+        elif char == 0x29:  # ")"
+            depth -= 1
+            if not depth:
+                return bytes(value), pos
+            value.append(char)
+        else:
+            value.append(char)
+
+
+def decodeHexString(data):
+    """
+    Decode hexadecimal digits, whitespace is ignored and a missing final
+    digit is zero.
+
+    >>> decodeHexString(b"41 42 4")
+    b'AB@'
+    """
+    digits = bytes(char for char in data if char not in WHITESPACE)
+    if len(digits) % 2:
+        digits += b"0"
+    return bytes.fromhex(digits.decode("ascii"))
+
+
+def parseObject(data, pos=0):
+    """
+    Parse an object starting at pos: return (value, end). Values are
+    converted to Python objects: dict (dictionary, keys are names), list
+    (array), str (name), bytes (string), int or float (number), bool, None
+    (null) and Reference.
+
+    >>> parseObject(b"<< /Type /Page /Kids [3 0 R (a\\\\(b\\\\)) <41 42>] >>")[0]
+    {'Type': 'Page', 'Kids': [Reference(number=3, generation=0), b'a(b)', b'AB']}
+
+    Raise TruncatedObject if the data ends before the end of the object.
+    """
+    pos = skipWhitespace(data, pos)
+    char = data[pos:pos + 1]
+    if char == b"/":
+        end = REGULAR_REGEX.match(data, pos + 1).end()
+        if end == len(data):
+            raise TruncatedObject()
+        name = NAME_ESCAPE_REGEX.sub(
+            lambda match: bytes.fromhex(match.group(1).decode("ascii")),
+            data[pos + 1:end])
+        return name.decode("latin-1"), end
+    if char == b"<":
+        if len(data) <= pos + 1:
+            raise TruncatedObject()
+        if data[pos + 1] == 0x3C:  # "<<": dictionary
+            value = {}
+            pos += 2
+            while True:
+                pos = skipWhitespace(data, pos)
+                if data[pos:pos + 2] == b">>":
+                    return value, pos + 2
+                key, pos = parseObject(data, pos)
+                if not isinstance(key, str):
+                    raise ParserError("PDF: invalid dictionary key %r" % (key,))
+                value[key], pos = parseObject(data, pos)
+        end = data.find(b">", pos)
+        if end < 0:
+            raise TruncatedObject()
+        try:
+            return decodeHexString(data[pos + 1:end]), end + 1
+        except ValueError:
+            raise ParserError("PDF: invalid hexadecimal string")
+    if char == b"[":
+        value = []
+        pos += 1
+        while True:
+            pos = skipWhitespace(data, pos)
+            if data[pos:pos + 1] == b"]":
+                return value, pos + 1
+            item, pos = parseObject(data, pos)
+            value.append(item)
+    if char == b"(":
+        return parseLiteralString(data, pos)
+    end = REGULAR_REGEX.match(data, pos).end()
+    if end == len(data):
+        raise TruncatedObject()
+    token = data[pos:end]
+    if token == b"true":
+        return True, end
+    if token == b"false":
+        return False, end
+    if token == b"null":
+        return None, end
+    try:
+        if token.isdigit():
+            value = int(token)
+            match = REFERENCE_REGEX.match(data, end)
+            if match:
+                return Reference(value, int(match.group(1))), match.end()
+            if PARTIAL_REFERENCE_REGEX.match(data, end).end() == len(data):
+                raise TruncatedObject()
+            return value, end
+        if b"." in token:
+            return float(token), end
+        return int(token), end
+    except ValueError:
+        raise ParserError("PDF: invalid object %r" % token[:20])
+
+
+def parseIndirectObject(data):
+    """
+    Parse an indirect object: "number generation obj ... endobj". Return
+    (number, generation, value, end). The value of a stream is a
+    StreamObject, its address is relative to the beginning of data.
+    """
+    match = OBJECT_REGEX.match(data)
+    if not match:
+        if len(data) < 32:
+            raise TruncatedObject()
+        raise ParserError("PDF: invalid indirect object")
+    number, generation = int(match.group(1)), int(match.group(2))
+    value, pos = parseObject(data, match.end())
+    pos = skipWhitespace(data, pos)
+    if len(data) < pos + 7:
+        raise TruncatedObject()
+    if isinstance(value, dict) and data.startswith(b"stream", pos):
+        pos += 6
+        if data[pos:pos + 2] == b"\r\n":
+            pos += 2
+        elif data[pos] in b"\r\n":
+            pos += 1
+        value = StreamObject(value, pos)
+    return number, generation, value, pos
+
+
+def decodeTextString(value):
+    """
+    Decode a text string: UTF-16 with a byte order mark, UTF-8 with a byte
+    order mark or PDFDocEncoding.
+
+    >>> decodeTextString(b"\\xfe\\xff\\x00P\\x00D\\x00F")
+    'PDF'
+    >>> decodeTextString(b"5 \\xa0")
+    '5 \u20ac'
+    """
+    if value.startswith((b"\xfe\xff", b"\xff\xfe")):
+        return value.decode("UTF-16", "replace")
+    if value.startswith(b"\xef\xbb\xbf"):
+        return value[3:].decode("UTF-8", "replace")
+    return value.decode("ISO-8859-1").translate(PDFDOC_ENCODING)
+
+
+def paethPredictor(left, up, up_left):
+    estimate = left + up - up_left
+    left_distance = abs(estimate - left)
+    up_distance = abs(estimate - up)
+    up_left_distance = abs(estimate - up_left)
+    if left_distance <= up_distance and left_distance <= up_left_distance:
+        return left
+    if up_distance <= up_left_distance:
+        return up
+    return up_left
+
+
+def decodePNGPredictor(data, columns, colors=1, bits_per_component=8):
+    """
+    Reverse the PNG predictors (Predictor >= 10) of decoded stream data:
+    each row starts with its PNG filter type.
+
+    >>> decodePNGPredictor(bytes((2, 1, 2, 2, 1, 1)), 2)
+    b'\\x01\\x02\\x02\\x03'
+    """
+    bpp = max(1, colors * bits_per_component // 8)
+    row_size = (columns * colors * bits_per_component + 7) // 8
+    previous = bytearray(row_size)
+    output = bytearray()
+    for pos in range(0, len(data) - row_size, row_size + 1):
+        filter_type = data[pos]
+        row = bytearray(data[pos + 1:pos + 1 + row_size])
+        if filter_type == 1:
+            for index in range(bpp, row_size):
+                row[index] = (row[index] + row[index - bpp]) & 0xFF
+        elif filter_type == 2:
+            for index in range(row_size):
+                row[index] = (row[index] + previous[index]) & 0xFF
+        elif filter_type == 3:
+            for index in range(row_size):
+                left = row[index - bpp] if bpp <= index else 0
+                row[index] = (row[index]
+                              + (left + previous[index]) // 2) & 0xFF
+        elif filter_type == 4:
+            for index in range(row_size):
+                if bpp <= index:
+                    left = row[index - bpp]
+                    up_left = previous[index - bpp]
+                else:
+                    left = up_left = 0
+                row[index] = (row[index] + paethPredictor(
+                    left, previous[index], up_left)) & 0xFF
+        elif filter_type:
+            raise ParserError("PDF: invalid PNG predictor %s" % filter_type)
+        output += row
+        previous = row
+    return bytes(output)
 
 
 def getLineEnd(s, pos=None):
@@ -64,7 +389,7 @@ class PDFNumber(Field):
 
         # Get value
         val = parent.stream.readBytes(self.absolute_address, size)
-        self.info("Number: size=%u value='%s'" % (size, val))
+        self.info("Number: size=%u value=%r" % (size, val))
         if val.find(b'.') != -1:
             self.createValue = lambda: float(val)
         else:
@@ -271,11 +596,11 @@ def parsePDFType(s):
             yield Catalog(s, "catalog[]")
         elif name[:1] in (b'.', b'-', b'+', b'0', b'1', b'2', b'3',
                           b'4', b'5', b'6', b'7', b'8', b'9'):
-            s.info("Not a catalog: %u spaces and end='%s'" %
+            s.info("Not a catalog: %u spaces and end=%r" %
                    (name.count(b' '), char))
             yield PDFNumber(s, "integer[]")
         else:
-            s.info("Trying to parse '%s': %u bytes" %
+            s.info("Trying to parse %r: %u bytes" %
                    (s.stream.readBytes(s.absolute_address + s.current_size, 4), size))
             yield String(s, "unknown[]", size)
 
@@ -300,11 +625,8 @@ class Body(FieldSet):
 
     def __init__(self, parent, name, desc=None):
         FieldSet.__init__(self, parent, name, desc)
-        pos = self.stream.searchBytesLength(CrossReferenceTable.MAGIC, False)
-        if pos is None:
-            raise ParserError("Can't find xref starting at %u" %
-                              (self.absolute_address // 8))
-        self._size = 8 * pos - self.absolute_address
+        # The body ends at the last cross-reference section
+        self._size = 8 * self.root.getBodyEnd() - self.absolute_address
 
     def createFields(self):
         while self.stream.readBytes(self.absolute_address + self.current_size, 1) == b'%':
@@ -321,19 +643,18 @@ class Body(FieldSet):
                 RawBytes(self, "unknown_data[]", size)
             yield LineEnd(self, "line_end[]")
 
-        # abs_offset = self.current_size//8
-        # TODO: yield objects that read offsets and deduce size from
-        # "/cross_ref_table/sub_section[]/entries/item[]"
-        offsets = []
-        for subsection in self.array("/cross_ref_table/sub_section"):
-            for obj in subsection.array("entries/item"):
-                if "byte_offset" in obj:
-                    # Could be inserted already sorted
-                    offsets.append(obj["byte_offset"].value)
-
-        offsets.append(self["/cross_ref_table"].absolute_address // 8)
-        offsets.sort()
+        # Object offsets are read from the cross-reference index, the size
+        # of an object is deduced from the offset of the next object
+        start = (self.absolute_address + self.current_size) // 8
+        end = (self.absolute_address + self.size) // 8
+        offsets = sorted(set(
+            entry[1] for entry in self.root.xref.values()
+            if entry[0] == 1 and start <= entry[1] < end))
+        offsets.append(end)
         for index in range(len(offsets) - 1):
+            padding = self.seekByte(offsets[index], relative=False)
+            if padding:
+                yield padding
             yield Catalog(self, "object[]", size=offsets[index + 1] - offsets[index])
 
 
@@ -392,11 +713,12 @@ class CrossReferenceTable(FieldSet):
 
     def __init__(self, parent, name, desc=None):
         FieldSet.__init__(self, parent, name, description=desc)
-        pos = self.stream.searchBytesLength(Trailer.MAGIC, False)
-        if pos is None:
-            raise ParserError("Can't find '%s' starting at %u" %
+        size = self.stream.searchBytesLength(Trailer.MAGIC, False,
+                                             self.absolute_address)
+        if size is None:
+            raise ParserError("Can't find %r starting at %u" %
                               (Trailer.MAGIC, self.absolute_address // 8))
-        self._size = 8 * pos - self.absolute_address
+        self._size = 8 * size
 
     def createFields(self):
         yield RawBytes(self, "marker", len(self.MAGIC))
@@ -477,14 +799,24 @@ class Trailer(FieldSet):
 
 
 class PDFDocument(Parser):
+    """
+    PDF document. Objects can be read without creating fields: the
+    cross-reference index (xref attribute) is built from the last
+    cross-reference section ("startxref" at the end of the file) and the
+    sections of the previous revisions. Cross-reference tables, streams and
+    object streams are supported. If startxref is invalid, the index is
+    rebuilt by scanning the file for the "number generation obj" keywords.
+    """
     endian = LITTLE_ENDIAN
+    _xref = None
+    _xref_table = False
     PARSER_TAGS = {
         "id": "pdf",
         "category": "misc",
         "file_ext": ("pdf",),
         "mime": ("application/pdf",),
         "min_size": (5 + 4) * 8,
-        "magic": ((MAGIC, 5),),
+        "magic": ((MAGIC, 0),),
         "description": "Portable Document Format (PDF) document"
     }
 
@@ -501,5 +833,399 @@ class PDFDocument(Parser):
     def createFields(self):
         yield Header(self, "header")
         yield Body(self, "body")
-        yield CrossReferenceTable(self, "cross_ref_table")
-        yield Trailer(self, "trailer")
+        if self._xref_table:
+            yield CrossReferenceTable(self, "cross_ref_table")
+            yield Trailer(self, "trailer")
+        else:
+            # Cross-reference stream: the body contains the stream object
+            size = (self.size - self.current_size) // 8
+            if size:
+                yield RawBytes(self, "end", size, "startxref and end of file")
+
+    @property
+    def xref(self):
+        """
+        Cross-reference index: object number => (type, field2, field3)
+        entries of cross-reference streams. Type 1 entries are
+        (1, offset, generation), objects of object streams are
+        (2, object stream number, index) and free objects are
+        (0, next free object, generation).
+        """
+        if self._xref is None:
+            self._readXref()
+        return self._xref
+
+    @property
+    def trailer_dict(self):
+        """
+        Trailer dictionary of the last revision of the document.
+        """
+        if self._xref is None:
+            self._readXref()
+        return self._trailer
+
+    def getBodyEnd(self):
+        """
+        Offset in bytes of the end of the body: address of the last
+        cross-reference table, or of the "startxref" keyword if the
+        document uses a cross-reference stream.
+        """
+        if self._xref is None:
+            self._readXref()
+        return self._body_end
+
+    def _readXref(self):
+        try:
+            self._readXrefSections()
+        except ParserError as err:
+            self.warning("%s, rebuilding the cross-reference index" % err)
+            self._rebuildXref()
+
+    def _findStartXref(self):
+        # Return the address in bytes of the last "startxref" keyword and
+        # its value
+        size = min(self.stream.size // 8, STARTXREF_SEARCH_SIZE)
+        tail = self.stream.readBytes(self.stream.size - size * 8, size)
+        pos = tail.rfind(STARTXREF)
+        match = STARTXREF_REGEX.match(tail, pos + len(STARTXREF))
+        if pos < 0 or not match:
+            return None, None
+        return self.stream.size // 8 - size + pos, int(match.group(1))
+
+    def _resetXref(self):
+        self._xref = {}
+        self._trailer = None
+        self._objects = {}
+        self._object_streams = {}
+
+    def _readXrefSections(self):
+        # Read the cross-reference section at startxref and the sections
+        # of the previous revisions
+        self.startxref_address, self.startxref = self._findStartXref()
+        if self.startxref is None:
+            raise ParserError("PDF: unable to find startxref")
+        if self.startxref_address <= self.startxref:
+            raise ParserError("PDF: invalid startxref")
+        self._resetXref()
+        offset = self.startxref
+        visited = set()
+        while isinstance(offset, int) and offset not in visited:
+            visited.add(offset)
+            trailer = self._readXrefSection(offset)
+            if self._trailer is None:
+                self._trailer = trailer
+            offset = trailer.get("Prev")
+        self._xref_table = (self.stream.readBytes(self.startxref * 8, 4)
+                            == CrossReferenceTable.MAGIC)
+        if self._xref_table:
+            self._body_end = self.startxref
+        else:
+            self._body_end = self.startxref_address
+
+    def _rebuildXref(self):
+        # Rebuild the cross-reference index from the "number generation obj"
+        # keywords of the whole file: the last definition of an object wins
+        self._resetXref()
+        trailers = []
+        for offset, number, generation in self._scanObjects():
+            self._xref[number] = (1, offset, generation)
+            try:
+                value = self._readIndirectObject(offset)[2]
+                if not isinstance(value, StreamObject):
+                    continue
+                dictionary = value.dictionary
+                if dictionary.get("Type") == "XRef":
+                    trailers.append((offset, dictionary))
+                elif dictionary.get("Type") == "ObjStm":
+                    numbers = self._readObjectStream(number)[2]
+                    for index, item in enumerate(numbers):
+                        if isinstance(item, int):
+                            self._xref[item] = (2, number, index)
+            except ParserError as err:
+                self.warning("Unable to read object %s: %s" % (number, err))
+        self._objects.clear()
+
+        # The body ends at the first cross-reference table, if any
+        address = 0
+        while True:
+            address = self.stream.searchBytes(
+                CrossReferenceTable.MAGIC, address)
+            if address is None:
+                break
+            if address == 0 or self.stream.readBytes(
+                    address - 8, 1) in WHITESPACE:
+                break
+            address += 8
+        startxref_address = self._findStartXref()[0]
+        if address is not None:
+            self._xref_table = True
+            self._body_end = address // 8
+        elif startxref_address is not None:
+            self._body_end = startxref_address
+        else:
+            self._body_end = self.stream.size // 8
+
+        end = self.stream.size if startxref_address is None \
+            else startxref_address * 8
+        address = self.stream.searchBytesBackward(Trailer.MAGIC, 0, end)
+        if address is not None:
+            try:
+                trailer = self._readAt(address // 8 + len(Trailer.MAGIC),
+                                       lambda data: parseObject(data)[0])
+                if isinstance(trailer, dict):
+                    trailers.append((address // 8, trailer))
+            except ParserError:
+                pass
+        if trailers:
+            self._trailer = max(trailers, key=lambda item: item[0])[1]
+        else:
+            self._trailer = {}
+
+    def _scanObjects(self):
+        # Generate (offset, number, generation) of the "number generation
+        # obj" keywords of the file
+        file_size = self.stream.size // 8
+        address = 0
+        while address < file_size:
+            # Read one more byte before the block for the lookbehind, and
+            # some bytes after the block for the keywords on its boundary
+            start = max(address - 1, 0)
+            end = min(address + SCAN_BLOCK_SIZE + 32, file_size)
+            data = self.stream.readBytes(start * 8, end - start)
+            if end == file_size:
+                data += b" "
+            for match in OBJECT_SCAN_REGEX.finditer(data, address - start):
+                offset = start + match.start()
+                if address + SCAN_BLOCK_SIZE <= offset:
+                    break
+                yield offset, int(match.group(1)), int(match.group(2))
+            address += SCAN_BLOCK_SIZE
+
+    def _readXrefSection(self, offset):
+        # Read a cross-reference section, entries of the more recent
+        # sections are kept. Return the trailer dictionary.
+        if self.stream.readBytes(offset * 8, 4) != CrossReferenceTable.MAGIC:
+            return self._readXrefStream(offset)
+        entries, trailer = self._readXrefTable(offset + 4)
+        xref_stream = trailer.get("XRefStm")
+        if isinstance(xref_stream, int):
+            # Hybrid-reference file: objects hidden from PDF 1.4 readers
+            self._readXrefStream(xref_stream)
+        for number, entry in entries.items():
+            self._xref.setdefault(number, entry)
+        return trailer
+
+    def _readXrefTable(self, address):
+        # Parse the subsections of a cross-reference table and its trailer
+        entries = {}
+        file_size = self.stream.size // 8
+        while True:
+            header = self.stream.readBytes(address * 8,
+                                           min(64, file_size - address))
+            match = TRAILER_REGEX.match(header)
+            if match:
+                trailer = self._readAt(address + match.end(),
+                                       lambda data: parseObject(data)[0])
+                if not isinstance(trailer, dict):
+                    raise ParserError("PDF: invalid trailer")
+                return entries, trailer
+            match = XREF_SUBSECTION_REGEX.match(header)
+            if not match:
+                raise ParserError("PDF: invalid cross-reference table at %s"
+                                  % address)
+            number, count = int(match.group(1)), int(match.group(2))
+            address += match.end()
+            # Entries are 20 bytes long, but some writers use 19 or 21 bytes
+            data = self.stream.readBytes(
+                address * 8, min(count * 21 + 2, file_size - address))
+            end = 0
+            for match in XREF_ENTRY_REGEX.finditer(data):
+                if not count:
+                    break
+                entry_type = 1 if match.group(3) == b"n" else 0
+                entries[number] = (entry_type, int(match.group(1)),
+                                   int(match.group(2)))
+                number += 1
+                count -= 1
+                end = match.end()
+            if count:
+                raise ParserError("PDF: truncated cross-reference table")
+            address += end
+
+    def _readXrefStream(self, offset):
+        # Read the entries of a cross-reference stream
+        stream = self._readIndirectObject(offset)[2]
+        if not isinstance(stream, StreamObject) \
+                or stream.dictionary.get("Type") != "XRef":
+            raise ParserError("PDF: invalid cross-reference stream at %s"
+                              % offset)
+        dictionary = stream.dictionary
+        widths = dictionary.get("W")
+        index = dictionary.get("Index", [0, dictionary.get("Size")])
+        if not isinstance(widths, list) or len(widths) != 3 \
+                or not all(isinstance(value, int) for value in widths + index):
+            raise ParserError("PDF: invalid cross-reference stream at %s"
+                              % offset)
+        data = self.readStreamData(stream)
+        entry_size = sum(widths)
+        pos = 0
+        for number, count in zip(index[0::2], index[1::2]):
+            for number in range(number, number + count):
+                if len(data) < pos + entry_size:
+                    break
+                entry = []
+                for width in widths:
+                    entry.append(int.from_bytes(data[pos:pos + width], "big"))
+                    pos += width
+                if not widths[0]:
+                    # The default type is 1 (uncompressed object)
+                    entry[0] = 1
+                self._xref.setdefault(number, tuple(entry))
+        return dictionary
+
+    def _readAt(self, address, parse):
+        # Call parse(data) on the data starting at address (in bytes), more
+        # data is read while parse() raises TruncatedObject
+        file_size = self.stream.size // 8
+        size = OBJECT_READ_SIZE
+        while True:
+            end = min(address + size, file_size)
+            if end <= address:
+                raise ParserError("PDF: invalid object address %s" % address)
+            data = self.stream.readBytes(address * 8, end - address)
+            if end == file_size:
+                # The end of the file ends the last token
+                data += b" "
+            try:
+                return parse(data)
+            except TruncatedObject:
+                if end == file_size:
+                    raise ParserError("PDF: truncated object at %s" % address)
+            size *= 4
+
+    def _readIndirectObject(self, address):
+        # Read the indirect object at address (in bytes):
+        # (number, generation, value)
+        number, generation, value, end = self._readAt(
+            address, parseIndirectObject)
+        if isinstance(value, StreamObject):
+            value.address += address
+        return number, generation, value
+
+    def _readCompressedObject(self, stream_number, index):
+        # Read the object at index in an object stream
+        data, first, numbers, offsets = self._readObjectStream(stream_number)
+        try:
+            return parseObject(data, first + offsets[index])[0]
+        except (TruncatedObject, IndexError, TypeError):
+            raise ParserError("PDF: invalid object %s of object stream %s"
+                              % (index, stream_number))
+
+    def _readObjectStream(self, stream_number):
+        # Read the header of an object stream:
+        # (data, first, object numbers, object offsets)
+        objects = self._object_streams.get(stream_number)
+        if objects is None:
+            # An object stream can't be stored in an object stream
+            if self.xref.get(stream_number, (0,))[0] == 1:
+                stream = self.getObject(stream_number)
+            else:
+                stream = None
+            if not isinstance(stream, StreamObject) \
+                    or not isinstance(stream.dictionary.get("N"), int) \
+                    or not isinstance(stream.dictionary.get("First"), int):
+                raise ParserError("PDF: invalid object stream %s"
+                                  % stream_number)
+            data = self.readStreamData(stream) + b" "
+            offsets = []
+            pos = 0
+            try:
+                for item in range(stream.dictionary["N"] * 2):
+                    value, pos = parseObject(data, pos)
+                    offsets.append(value)
+            except TruncatedObject:
+                raise ParserError("PDF: truncated object stream %s"
+                                  % stream_number)
+            objects = (data, stream.dictionary["First"],
+                       offsets[0::2], offsets[1::2])
+            self._object_streams[stream_number] = objects
+        return objects
+
+    def getObject(self, number):
+        """
+        Read the indirect object identified by its number, using the
+        cross-reference index. Return None (null object) if the object
+        doesn't exist. Stream objects are StreamObject instances: see
+        readStreamData().
+        """
+        entry = self.xref.get(number)
+        if number in self._objects:
+            return self._objects[number]
+        if entry is None or entry[0] not in (1, 2):
+            value = None
+        elif entry[0] == 1:
+            object_number, generation, value = \
+                self._readIndirectObject(entry[1])
+            if object_number != number:
+                raise ParserError("PDF: object %s expected at %s, got %s"
+                                  % (number, entry[1], object_number))
+        else:
+            value = self._readCompressedObject(entry[1], entry[2])
+        self._objects[number] = value
+        return value
+
+    def resolve(self, value):
+        """
+        Read the object of a reference, other values are returned unchanged.
+        """
+        if isinstance(value, Reference):
+            return self.getObject(value.number)
+        return value
+
+    def readStreamData(self, stream):
+        """
+        Read and decode the data of a stream object. Supported filters:
+        FlateDecode (with PNG predictors), ASCII85Decode and ASCIIHexDecode.
+        """
+        dictionary = stream.dictionary
+        length = self.resolve(dictionary.get("Length"))
+        if not isinstance(length, int) or length < 0:
+            end = self.stream.searchBytes(b"endstream", stream.address * 8)
+            if end is None:
+                raise ParserError("PDF: unable to find the end of a stream")
+            length = end // 8 - stream.address
+        if self.stream.size < (stream.address + length) * 8:
+            raise ParserError("PDF: truncated stream at %s" % stream.address)
+        data = self.stream.readBytes(stream.address * 8, length)
+        filters = self.resolve(dictionary.get("Filter"))
+        params = self.resolve(dictionary.get("DecodeParms"))
+        if not isinstance(filters, list):
+            filters = [filters] if filters else []
+        if not isinstance(params, list):
+            params = [params] * len(filters)
+        for name, param in zip(filters, params):
+            try:
+                if name in ("FlateDecode", "Fl"):
+                    data = zlib.decompressobj().decompress(data)
+                elif name in ("ASCII85Decode", "A85"):
+                    data = a85decode(data.split(b"~>", 1)[0].strip(),
+                                     ignorechars=WHITESPACE)
+                elif name in ("ASCIIHexDecode", "AHx"):
+                    data = decodeHexString(data.split(b">", 1)[0])
+                else:
+                    raise ParserError("PDF: unsupported stream filter %s"
+                                      % name)
+            except (zlib.error, ValueError) as err:
+                raise ParserError("PDF: unable to decode a stream (%s): %s"
+                                  % (name, err))
+            param = self.resolve(param)
+            if not isinstance(param, dict):
+                continue
+            predictor = param.get("Predictor", 1)
+            if 10 <= predictor:
+                data = decodePNGPredictor(data, param.get("Columns", 1),
+                                          param.get("Colors", 1),
+                                          param.get("BitsPerComponent", 8))
+            elif predictor != 1:
+                raise ParserError("PDF: unsupported predictor %s" % predictor)
+        return data
@@ -151,7 +151,9 @@ class Word2DocumentParser(OLE2FragmentParser):
     def validate(self):
         if self.stream.readBytes(0, 2) != self.MAGIC:
             return "Invalid magic."
-        if self['FIB/nFib'].value not in (45,):
+        # Read nFib from the stream: creating the FIB field set parses
+        # all its fields
+        if self.stream.readBits(16, 16, self.endian) not in (45,):
             return "Unknown FIB version."
         return True
 
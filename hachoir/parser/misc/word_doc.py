@@ -281,7 +281,9 @@ class WordDocumentParser(OLE2FragmentParser):
     def validate(self):
         if self.stream.readBytes(0, 2) != self.MAGIC:
             return "Invalid magic."
-        if self['FIB/nFib'].value not in (192, 193):
+        # Read nFib from the stream: creating the FIB field set parses
+        # all its fields
+        if self.stream.readBits(16, 16, self.endian) not in (192, 193):
             return "Unknown FIB version."
         return True
 
@@ -1 +1,5 @@
-from hachoir.parser.network.tcpdump import TcpdumpFile  # noqa
+from hachoir.core.lazy import lazyModule
+
+__getattr__, __dir__ = lazyModule(__name__, {
+    "TcpdumpFile": "tcpdump",
+})
@@ -439,10 +439,13 @@ class Packet(FieldSet):
 
     def __init__(self, parent, name, parser, first_name):
         FieldSet.__init__(self, parent, name)
-        self._size = (16 + self["caplen"].value) * 8
         self._first_parser = parser
         self._first_name = first_name
 
+    def createSize(self):
+        caplen = self.stream.readBits(self.absolute_address + 64, 32, self.endian)
+        return (16 + caplen) * 8
+
     def createFields(self):
         yield TimestampUnix32(self, "ts_epoch", "Timestamp (Epoch)")
         yield UInt32(self, "ts_nanosec", "Timestamp (nano second)")
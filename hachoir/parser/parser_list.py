@@ -1,9 +1,232 @@
+import importlib
+import pprint
 import re
-import types
 from hachoir.core.error import error
 from hachoir.parser import Parser, HachoirParser
+from hachoir.stream import InputStreamError
 import sys
 
+# Packages of hachoir.parser containing parsers
+PARSER_PACKAGES = ("archive", "audio", "container", "file_system", "game",
+                   "image", "misc", "network", "program", "video")
+
+# Lazy parsers ###############################################################
+
+
+class ParserDocstring(object):
+    """
+    Docstring of a lazy parser: docstring of the parser class (the module is
+    imported), or of the LazyParser class.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+
+    def __get__(self, lazy, cls=None):
+        if lazy is None:
+            return self.doc
+        return lazy.load().__doc__
+
+
+class LazyParser(object):
+    """
+    Parser class loaded on demand: the parser tags are known without
+    importing the parser module, the module is only imported when the parser
+    is created (or when another class attribute is read).
+
+    A lazy parser is equal to its parser class.
+    """
+
+    def __init__(self, module, name, tags):
+        self.module = module
+        self.__name__ = name
+        self.PARSER_TAGS = tags
+        self._parser = None
+
+    def load(self):
+        """
+        Import the parser module and return the parser class.
+        """
+        if self._parser is None:
+            module = importlib.import_module(self.module)
+            self._parser = getattr(module, self.__name__)
+        return self._parser
+
+    def getParserTags(self):
+        return dict(self.PARSER_TAGS)
+
+    def __call__(self, *args, **kw):
+        return self.load()(*args, **kw)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyParser):
+            return (self.module, self.__name__) == \
+                (other.module, other.__name__)
+        if isinstance(other, type):
+            return (self.module, self.__name__) == \
+                (other.__module__, other.__name__)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.module, self.__name__))
+
+    def __repr__(self):
+        return "<LazyParser %s.%s>" % (self.module, self.__name__)
+
+
+LazyParser.__doc__ = ParserDocstring(LazyParser.__doc__)
+
+
+def findParsers():
+    """
+    Import all parser packages and return the list of parser classes.
+    """
+    parsers = []
+    for package in PARSER_PACKAGES:
+        module = importlib.import_module("hachoir.parser." + package)
+        for name in dir(module):
+            attr = getattr(module, name)
+            if isinstance(attr, type) \
+                    and issubclass(attr, HachoirParser) \
+                    and attr not in (Parser, HachoirParser) \
+                    and attr not in parsers:
+                parsers.append(attr)
+    return parsers
+
+
+def createManifest(parsers):
+    """
+    Create the manifest of parser classes: list of (module name, class name,
+    parser tags) sorted by module and class names.
+    """
+    manifest = [(parser.__module__, parser.__name__, parser.getParserTags())
+                for parser in parsers]
+    manifest.sort(key=lambda item: item[:2])
+    return manifest
+
+
+def writeManifest(out):
+    """
+    Write the parser manifest module (hachoir/parser/manifest.py).
+    """
+    print('"""', file=out)
+    print("List of parsers with their tags, used to load parsers on demand.",
+          file=out)
+    print(file=out)
+    print("File generated by tools/gen_parser_manifest.py, don't edit it.",
+          file=out)
+    print('"""', file=out)
+    print(file=out)
+    print("PARSERS = [", file=out)
+    for item in createManifest(findParsers()):
+        lines = pprint.pformat(item, width=75).splitlines()
+        lines[-1] += ","
+        for line in lines:
+            print("    " + line, file=out)
+    print("]", file=out)
+
+# Magic index ################################################################
+
+
+class MagicIndex(object):
+    """
+    Index of the "magic" and "magic_regex" tags of a parser list, used to
+    sort candidate parsers of a stream before validating them.
+
+    A parser declaring magics is not tried on a stream matching none of
+    them, unless the caller keeps mismatches (eg. for parsers selected by
+    the file extension): the magics of a parser must cover all the streams
+    accepted by its validate() method.
+    """
+    # Maximum number of bytes read to match regular expressions
+    REGEX_SIZE = 64
+
+    # Ranks used to sort parsers
+    MATCH = 0
+    NO_MAGIC = 1
+    MISMATCH = 2
+
+    def __init__(self, parsers):
+        # (offset in bytes, length) => {magic: set of parsers}
+        self.strings = {}
+        # [(offset in bytes, compiled regex, parser), ...]
+        self.regexs = []
+        self.parsers = set()
+        self.size = 0
+        for parser in parsers:
+            tags = parser.getParserTags()
+            for magic, offset in tags.get("magic", ()):
+                if offset % 8:
+                    continue
+                key = (offset // 8, len(magic))
+                self.strings.setdefault(key, {}) \
+                    .setdefault(magic, set()).add(parser)
+                self.parsers.add(parser)
+                self.size = max(self.size, sum(key))
+            for regex, offset in tags.get("magic_regex", ()):
+                if offset % 8:
+                    continue
+                offset //= 8
+                self.regexs.append((offset, re.compile(regex, re.DOTALL),
+                                    parser))
+                self.parsers.add(parser)
+                self.size = max(self.size, offset + self.REGEX_SIZE)
+
+    def match(self, data):
+        """
+        Set of parsers with a magic matching data (the start of a stream).
+        """
+        parsers = set()
+        for (offset, length), magics in self.strings.items():
+            found = magics.get(data[offset:offset + length])
+            if found:
+                parsers |= found
+        for offset, regex, parser in self.regexs:
+            if regex.match(data, offset):
+                parsers.add(parser)
+        return parsers
+
+    def readHeader(self, stream):
+        """
+        Read the bytes needed to match magics at the start of the stream,
+        or less if the stream is smaller. Returns None on error.
+        """
+        size = self.size
+        try:
+            if not stream.sizeGe(8 * size):
+                size = min(size, stream.size // 8)
+            return stream.readBytes(0, size)
+        except InputStreamError:
+            return None
+
+    def rank(self, parser, matches):
+        if parser in matches:
+            return self.MATCH
+        if parser in self.parsers:
+            return self.MISMATCH
+        return self.NO_MAGIC
+
+    def sortParsers(self, stream, parsers, mismatch=True):
+        """
+        Sort parsers: first parsers with a magic matching the stream, then
+        parsers without magic, and finally parsers with no matching magic,
+        which are dropped if mismatch is False. The sort is stable.
+        """
+        data = self.readHeader(stream)
+        if data is None:
+            return list(parsers)
+        matches = self.match(data)
+        if not mismatch:
+            parsers = [parser for parser in parsers
+                       if self.rank(parser, matches) != self.MISMATCH]
+        return sorted(parsers, key=lambda parser: self.rank(parser, matches))
+
+
 # Parser list ################################################################
 
 
@@ -15,6 +238,7 @@ class ParserList(object):
     def __init__(self):
         self.parser_list = []
         self.bytag = {"id": {}, "category": {}}
+        self._magic_index = None
 
     def translate(self, name, value):
         if name in ("magic",):
@@ -76,6 +300,7 @@ class ParserList(object):
                 return
 
         self.parser_list.append(parser)
+        self._magic_index = None
 
         for name, values in _tags:
             byname = self.bytag.setdefault(name, {})
@@ -85,6 +310,15 @@ class ParserList(object):
     def __iter__(self):
         return iter(self.parser_list)
 
+    def getMagicIndex(self):
+        """
+        Get the magic index (MagicIndex) of the parsers, create it on the
+        first call.
+        """
+        if self._magic_index is None:
+            self._magic_index = MagicIndex(self.parser_list)
+        return self._magic_index
+
     def print_(self, title=None, out=None, verbose=False, format="one-line"):
         """Display a list of parser with its title
          * out: output file
@@ -193,7 +427,9 @@ class HachoirParserList(ParserList):
 
     def _load(self):
         """
-        Load all parsers from "hachoir.parser" module.
+        Load all parsers from the parser manifest (hachoir.parser.manifest):
+        parser modules are only imported when a parser is used (see
+        LazyParser).
 
         Return the list of loaded parsers.
         """
@@ -201,19 +437,8 @@ class HachoirParserList(ParserList):
         if self.parser_list:
             return self.parser_list
 
-        todo = []
-        module = __import__("hachoir.parser").parser
-        for attrname in dir(module):
-            attr = getattr(module, attrname)
-            if isinstance(attr, types.ModuleType):
-                todo.append(attr)
-
-        for module in todo:
-            for name in dir(module):
-                attr = getattr(module, name)
-                if isinstance(attr, type) \
-                        and issubclass(attr, HachoirParser) \
-                        and attr not in (Parser, HachoirParser):
-                    self.add(attr)
+        from hachoir.parser.manifest import PARSERS
+        for module, name, tags in PARSERS:
+            self.add(LazyParser(module, name, tags))
         assert 1 <= len(self.parser_list)
         return self.parser_list
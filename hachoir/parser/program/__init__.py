@@ -1,8 +1,13 @@
-from hachoir.parser.program.elf import ElfFile  # noqa
-from hachoir.parser.program.exe import ExeFile  # noqa
-from hachoir.parser.program.macho import MachoFile, MachoFatFile  # noqa
-from hachoir.parser.program.python import PythonCompiledFile  # noqa
-from hachoir.parser.program.java import JavaCompiledClassFile  # noqa
-from hachoir.parser.program.prc import PRCFile  # noqa
-from hachoir.parser.program.nds import NdsFile  # noqa
-from hachoir.parser.program.java_serialized import JavaSerializedFile  # noqa
+from hachoir.core.lazy import lazyModule
+
+__getattr__, __dir__ = lazyModule(__name__, {
+    "ElfFile": "elf",
+    "ExeFile": "exe",
+    "MachoFile": "macho",
+    "MachoFatFile": "macho",
+    "PythonCompiledFile": "python",
+    "JavaCompiledClassFile": "java",
+    "PRCFile": "prc",
+    "NdsFile": "nds",
+    "JavaSerializedFile": "java_serialized",
+})
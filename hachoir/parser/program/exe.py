@@ -66,7 +66,9 @@ class ExeFile(HachoirParser, RootSeekableFieldSet):
         "mime": ("application/x-dosexec",),
         "min_size": 64 * 8,
         # "magic": ((b"MZ", 0),),
-        "magic_regex": ((b"MZ.[\0\1].{4}[^\0\1\2\3]", 0),),
+        # (magic, size_mod_512 < 512, <size_div_512, reloc_entries>,
+        #  code_offset >= 4)
+        "magic_regex": ((b"MZ.[\0\1].{4}(?:[^\0\1\2\3].|.[^\0])", 0),),
         "description": "Microsoft Windows Portable Executable"
     }
     endian = LITTLE_ENDIAN
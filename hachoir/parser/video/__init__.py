@@ -1,4 +1,8 @@
-from hachoir.parser.video.asf import AsfFile  # noqa
-from hachoir.parser.video.flv import FlvFile  # noqa
-from hachoir.parser.video.mpeg_video import MPEGVideoFile  # noqa
-from hachoir.parser.video.mpeg_ts import MPEG_TS  # noqa
+from hachoir.core.lazy import lazyModule
+
+__getattr__, __dir__ = lazyModule(__name__, {
+    "AsfFile": "asf",
+    "FlvFile": "flv",
+    "MPEGVideoFile": "mpeg_video",
+    "MPEG_TS": "mpeg_ts",
+})
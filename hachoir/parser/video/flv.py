@@ -134,12 +134,8 @@ class FlvFile(Parser):
         "file_ext": ("flv",),
         "mime": ("video/x-flv",),
         "min_size": 9 * 4,
-        "magic": (
-            # Signature, version=1, flags=5 (video+audio), header size=9
-            (b"FLV\1\x05\0\0\0\x09", 0),
-            # Signature, version=1, flags=5 (video), header size=9
-            (b"FLV\1\x01\0\0\0\x09", 0),
-        ),
+        # Signature, version, flags, header size=9
+        "magic_regex": ((b"FLV..\0\0\0\x09", 0),),
         "description": "Macromedia Flash video"
     }
     endian = BIG_ENDIAN
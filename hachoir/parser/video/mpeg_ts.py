@@ -118,6 +118,27 @@ class Packet(FieldSet):
 # M2TS 4 bytes + 188 bytes payload + 4 errors
 MAX_PACKET_SIZE = 208
 
+# Frequency of the program clock reference (PCR) in Hz
+PCR_FREQUENCY = 27000000
+
+# Maximum size in bytes of the start and of the end of the file scanned to
+# find a program clock reference
+MAX_PCR_DISTANCE = 4 * 1024 * 1024
+
+
+def readPCR(header):
+    """
+    Read the program clock reference of a packet from its first 12 bytes
+    (starting at the synchronization byte): return (pid, pcr) where pcr is
+    in 27 MHz ticks, or None if the packet has no PCR.
+    """
+    if header[0] != 0x47 or header[1] & 0x80 \
+            or not header[3] & 0x20 or header[4] < 7 or not header[5] & 0x10:
+        return None
+    pid = (header[1] & 0x1F) << 8 | header[2]
+    pcr = int.from_bytes(header[6:12], "big")
+    return (pid, (pcr >> 15) * 300 + (pcr & 0x1FF))
+
 
 class MPEG_TS(Parser):
     PARSER_TAGS = {
@@ -172,3 +193,48 @@ class MPEG_TS(Parser):
                 yield RawBytes(self, "incomplete_packet[]",
                                (sync - current) // 8)
             yield Packet(self, "packet[]", m2ts=m2ts)
+
+    def findPCR(self, pid=None, backward=False):
+        """
+        Find the first program clock reference of the file, or the last one
+        if backward is True: only the start or the end of the file is read.
+        If pid is set, only consider the packets of this program identifier.
+        Return (pid, pcr) where pcr is in 27 MHz ticks, or None if no PCR
+        is found.
+        """
+        stream = self.stream
+        size = stream.size
+        if size is None:
+            return None
+        if self.is_m2ts():
+            packet_size = 192 * 8
+            sync_offset = 4 * 8
+        else:
+            packet_size = 188 * 8
+            sync_offset = 0
+        if backward:
+            # Find the synchronization byte of the last complete packet
+            start = max(0, size - MAX_PCR_DISTANCE * 8)
+            end = size
+            while True:
+                address = stream.searchBytesBackward(b"\x47", start, end)
+                if address is None:
+                    return None
+                end = address
+                if address + packet_size - sync_offset <= size \
+                        and packet_size <= address \
+                        and stream.readBytes(address - packet_size, 1) == b"\x47":
+                    break
+            addresses = range(address, start - 1, -packet_size)
+        else:
+            address = stream.searchBytes(b"\x47", sync_offset,
+                                         sync_offset + MAX_PACKET_SIZE * 8)
+            if address is None:
+                return None
+            end = min(size, address + MAX_PCR_DISTANCE * 8)
+            addresses = range(address, end - 12 * 8 + 1, packet_size)
+        for address in addresses:
+            found = readPCR(stream.readBytes(address, 12))
+            if found and (pid is None or found[0] == pid):
+                return found
+        return None
@@ -2,8 +2,10 @@ from hachoir.core.endian import BIG_ENDIAN, LITTLE_ENDIAN  # noqa
 from hachoir.stream.stream import StreamError  # noqa
 from hachoir.stream.input import (InputStreamError,  # noqa
                                   InputStream, InputIOStream, StringInputStream,
+                                  MmapInputStream,
                                   InputSubStream, InputFieldStream,
-                                  FragmentedStream, ConcatStream)
+                                  FragmentedStream, ConcatStream,
+                                  ExtentStream)
 from hachoir.stream.input_helper import FileInputStream, guessStreamCharset  # noqa
 from hachoir.stream.output import (OutputStreamError,  # noqa
                                    FileOutputStream, StringOutputStream, OutputStream)
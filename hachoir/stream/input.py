@@ -1,12 +1,37 @@
 from hachoir.core.endian import BIG_ENDIAN, LITTLE_ENDIAN, MIDDLE_ENDIAN
-from hachoir.core.error import info
 from hachoir.core.log import Logger
 from hachoir.core.bits import str2long
 from hachoir.core.tools import lowerBound
 from hachoir.core.tools import alignValue
+from hachoir.core import config
+from bisect import bisect_right
+from collections import OrderedDict
 from errno import ESPIPE
+import io
+import mmap
+import os
+import tempfile
 from weakref import ref as weakref_ref
 from hachoir.stream import StreamError
+from struct import Struct
+
+
+def _createIntegerReaders():
+    readers = {}
+    for nbits, code in ((8, "b"), (16, "h"), (32, "i"), (64, "q")):
+        for endian, prefix in ((BIG_ENDIAN, ">"), (LITTLE_ENDIAN, "<")):
+            readers[(nbits, True, endian)] = Struct(prefix + code).unpack
+            readers[(nbits, False, endian)] = \
+                Struct(prefix + code.upper()).unpack
+    return readers
+
+
+# (nbits, signed, endian) => unpack function of a byte aligned integer
+INTEGER_READERS = _createIntegerReaders()
+BYTE_ORDER = {BIG_ENDIAN: "big", LITTLE_ENDIAN: "little"}
+
+# Size in bytes of the blocks read by InputStream.searchBytesBackward()
+BACKWARD_SEARCH_BLOCK = 64 * 1024
 
 
 class InputStreamError(StreamError):
@@ -187,9 +212,25 @@ class InputStream(Logger):
         """
         raise NotImplementedError
 
+    def _readAlignedInteger(self, address, signed, nbits, endian):
+        """
+        Fast path of readBits() and readInteger(): read an integer
+        starting and ending on byte boundaries (address and nbits must be
+        multiple of 8) in big or little endian.
+        """
+        shift, data, missing = self.read(address, nbits)
+        if missing:
+            raise ReadStreamError(nbits, address)
+        reader = INTEGER_READERS.get((nbits, signed, endian))
+        if reader is not None:
+            return reader(data)[0]
+        return int.from_bytes(data, BYTE_ORDER[endian], signed=signed)
+
     def readBits(self, address, nbits, endian):
         assert endian in (BIG_ENDIAN, LITTLE_ENDIAN, MIDDLE_ENDIAN)
 
+        if not (address | nbits) & 7 and endian is not MIDDLE_ENDIAN:
+            return self._readAlignedInteger(address, False, nbits, endian)
         if endian is MIDDLE_ENDIAN:
             # read an aligned chunk of words
             wordaddr, remainder = divmod(address, 16)
@@ -209,6 +250,8 @@ class InputStream(Logger):
 
     def readInteger(self, address, signed, nbits, endian):
         """ Read an integer number """
+        if not (address | nbits) & 7 and endian is not MIDDLE_ENDIAN:
+            return self._readAlignedInteger(address, signed, nbits, endian)
         value = self.readBits(address, nbits, endian)
 
         # Signe number. Example with nbits=8:
@@ -275,94 +318,123 @@ class InputStream(Logger):
             if found >= 0:
                 return start_address + (found - len(buffer)) * 8
 
+    def searchBytesBackward(self, needle, start_address=0, end_address=None):
+        """
+        Search the last occurrence of some bytes in [start_address;end_address[
+        reading blocks backward from end_address (the end of the stream if
+        None, its size must be known). Addresses must be aligned to byte.
+        Returns the address of the bytes if found, None else.
+        """
+        if self._size and (end_address is None or self._size < end_address):
+            end_address = self._size
+        if end_address is None:
+            raise InputStreamError(
+                "Unable to search bytes backward in a stream of unknown size")
+        if (start_address | end_address) % 8:
+            raise InputStreamError(
+                "Unable to search bytes with address with bit granularity")
+        length = len(needle)
+        size = max(3 * length, BACKWARD_SEARCH_BLOCK)
+        buffer = b''
+
+        while start_address < end_address:
+            size = min(size, (end_address - start_address) >> 3)
+            end_address -= 8 * size
+            buffer = self.readBytes(end_address, size) + buffer[:length - 1]
+            found = buffer.rfind(needle)
+            if found >= 0:
+                return end_address + found * 8
+        return None
+
     def file(self):
         return FileFromInputStream(self)
 
+    def fileOffset(self, address):
+        """
+        If the data at address (in bits) are stored in a regular file,
+        return (file object, offset in bytes), None otherwise. It is used to
+        copy data without reading it in Python (see
+        OutputStream.copyBytesFrom()).
+        """
+        return None
+
 
 class InputPipe(object):
     """
-    InputPipe makes input streams seekable by caching a certain
-    amount of data. The memory usage may be unlimited in worst cases.
-    A function (set_size) is called when the size of the stream is known.
+    InputPipe makes input streams seekable by caching the data read from
+    the input. A function (set_size) is called when the size of the stream
+    is known.
 
     InputPipe sees the input stream as an array of blocks of
-    size = (2 ^ self.buffer_size) and self.buffers maps to this array.
-    It also maintains a circular ordered list of non-discarded blocks,
-    sorted by access time.
-
-    Each element of self.buffers is an array of 3 elements:
-     * self.buffers[i][0] is the data.
-       len(self.buffers[i][0]) == 1 << self.buffer_size
-       (except at the end: the length may be smaller)
-     * self.buffers[i][1] is the index of a more recently used block
-     * self.buffers[i][2] is the opposite of self.buffers[1],
-       in order to have a double-linked list.
-    For any discarded block, self.buffers[i] = None
-
-    self.last is the index of the most recently accessed block.
-    self.first is the first (= smallest index) non-discarded block.
-
-    How InputPipe discards blocks:
-     * Just before returning from the read method.
-     * Only if there are more than self.buffer_nb_min blocks in memory.
-     * While self.buffers[self.first] is that least recently used block.
-
-    Property: There is no hole in self.buffers, except at the beginning.
+    size = (2 ^ self.buffer_size). At most max_memory bytes of blocks are
+    kept in memory (default: config.input_pipe_max_memory): the least
+    recently used blocks are written ("spilled") into an anonymous
+    temporary file and read again from it on demand, so the memory usage
+    is bounded and seeking backward is always possible.
+
+    Statistics: spill_writes and spill_reads are the number of blocks
+    written into and read from the temporary file.
     """
-    buffer_nb_min = 256
     buffer_size = 16
-    last = None
     size = None
 
-    def __init__(self, input, set_size=None):
+    def __init__(self, input, set_size=None, max_memory=None):
+        if max_memory is None:
+            max_memory = config.input_pipe_max_memory
         self._input = input
-        self.first = self.address = 0
-        self.buffers = []
+        self.address = 0
         self.set_size = set_size
+        self.block_count = max(max_memory >> self.buffer_size, 1)
+        # index => data of the blocks kept in memory, least recently used
+        # first
+        self.blocks = OrderedDict()
+        # Number of blocks read from the input
+        self.count = 0
+        # Temporary file, created on demand, and indexes of blocks stored
+        # in it
+        self.spill = None
+        self.spilled = set()
+        self.spill_writes = 0
+        self.spill_reads = 0
+
+    current_size = property(lambda self: self.count << self.buffer_size)
 
-    current_size = property(lambda self: len(self.buffers) << self.buffer_size)
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+        self.blocks.clear()
+        self._input.close()
 
-    def _append(self, data):
-        if self.last is None:
-            self.last = next = prev = 0
-        else:
-            prev = self.last
-            last = self.buffers[prev]
-            next = last[1]
-            self.last = self.buffers[next][2] = last[1] = len(self.buffers)
-        self.buffers.append([data, next, prev])
+    def _store(self, index, data):
+        self.blocks[index] = data
+        while len(self.blocks) > self.block_count:
+            index, data = self.blocks.popitem(last=False)
+            if index in self.spilled:
+                continue
+            if self.spill is None:
+                self.spill = tempfile.TemporaryFile()
+            self.spill.seek(index << self.buffer_size)
+            self.spill.write(data)
+            self.spilled.add(index)
+            self.spill_writes += 1
 
     def _get(self, index):
-        if index >= len(self.buffers):
+        if index >= self.count:
             return b''
-        buf = self.buffers[index]
-        if buf is None:
-            raise InputStreamError(
-                "Error: Buffers too small. Can't seek backward.")
-        if self.last != index:
-            next = buf[1]
-            prev = buf[2]
-            self.buffers[next][2] = prev
-            self.buffers[prev][1] = next
-            first = self.buffers[self.last][1]
-            buf[1] = first
-            buf[2] = self.last
-            self.buffers[first][2] = index
-            self.buffers[self.last][1] = index
-            self.last = index
-        return buf[0]
-
-    def _flush(self):
-        lim = len(self.buffers) - self.buffer_nb_min
-        while self.first < lim:
-            buf = self.buffers[self.first]
-            if buf[2] != self.last:
-                break
-            info("Discarding buffer %u." % self.first)
-            self.buffers[self.last][1] = buf[1]
-            self.buffers[buf[1]][2] = self.last
-            self.buffers[self.first] = None
-            self.first += 1
+        try:
+            data = self.blocks[index]
+        except KeyError:
+            size = 1 << self.buffer_size
+            if index == self.count - 1 and self.size is not None:
+                size = self.size - (index << self.buffer_size)
+            self.spill.seek(index << self.buffer_size)
+            data = self.spill.read(size)
+            self.spill_reads += 1
+            self._store(index, data)
+        else:
+            self.blocks.move_to_end(index)
+        return data
 
     def seek(self, address):
         assert 0 <= address
@@ -370,37 +442,120 @@ class InputPipe(object):
 
     def read(self, size):
         end = self.address + size
-        for i in range(len(self.buffers), (end >> self.buffer_size) + 1):
+        for i in range(self.count, (end >> self.buffer_size) + 1):
+            if self.size is not None:
+                break
             data = self._input.read(1 << self.buffer_size)
             if len(data) < 1 << self.buffer_size:
-                self.size = (len(self.buffers) << self.buffer_size) + len(data)
+                self.size = (self.count << self.buffer_size) + len(data)
                 if self.set_size:
                     self.set_size(self.size)
                 if data:
-                    self._append(data)
+                    self.count += 1
+                    self._store(self.count - 1, data)
                 break
-            self._append(data)
+            self.count += 1
+            self._store(self.count - 1, data)
         block, offset = divmod(self.address, 1 << self.buffer_size)
         data = b''.join(self._get(index)
                         for index in range(block, (end - 1 >> self.buffer_size) + 1)
                         )[offset:offset + size]
-        self._flush()
         self.address += len(data)
         return data
 
 
+class InputCache(object):
+    """
+    InputCache sits between an InputIOStream and a seekable file object
+    to avoid a seek() + read() pair of system calls per field value.
+
+    The file is seen as an array of aligned blocks of block_size bytes. The
+    most recently used blocks are kept in memory, at most block_count of
+    them: the least recently used block is discarded first. Reads larger
+    than a block bypass the cache.
+
+    Statistics: hits and misses are the number of block lookups served
+    from memory and from the file.
+    """
+
+    def __init__(self, input, block_size=None, block_count=None):
+        if block_size is None:
+            block_size = config.input_cache_block_size
+        if block_count is None:
+            block_count = config.input_cache_block_count
+        assert 0 < block_size and 0 < block_count
+        self._input = input
+        self.block_size = block_size
+        self.block_count = block_count
+        self.blocks = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.blocks.clear()
+
+    def _get(self, index):
+        try:
+            data = self.blocks[index]
+        except KeyError:
+            self.misses += 1
+            self._input.seek(index * self.block_size)
+            data = self._input.read(self.block_size)
+            self.blocks[index] = data
+            if len(self.blocks) > self.block_count:
+                self.blocks.popitem(last=False)
+        else:
+            self.hits += 1
+            self.blocks.move_to_end(index)
+        return data
+
+    def read(self, address, size):
+        """
+        Read size bytes at address (in bytes). Returns less bytes at
+        the end of the file.
+        """
+        block_size = self.block_size
+        if block_size <= size:
+            self._input.seek(address)
+            return self._input.read(size)
+        first, offset = divmod(address, block_size)
+        data = self._get(first)
+        if offset + size <= len(data):
+            return data[offset:offset + size]
+        if len(data) < block_size:
+            # end of file
+            return data[offset:]
+        data = data[offset:] + self._get(first + 1)
+        return data[:size]
+
+
 class InputIOStream(InputStream):
+    """
+    Input stream of a file object. Reads of a seekable file go through an
+    InputCache (the cache attribute), unless it is disabled by the cache
+    argument or by config.input_cache_block_count.
+    """
 
-    def __init__(self, input, size=None, **args):
+    def __init__(self, input, size=None, cache=True, **args):
         if not hasattr(input, "seek"):
             if size is None:
                 input = InputPipe(input, self._setSize)
             else:
                 input = InputPipe(input)
+        elif hasattr(input, "set_size"):
+            # seekable input of unknown size (eg. a CompressedStream):
+            # set_size() is called when the end is reached
+            if size is None and input.size is None:
+                input.set_size = self._setSize
+            elif size is None:
+                size = input.size * 8
         elif size is None:
             try:
                 input.seek(0, 2)
                 size = input.tell() * 8
+            except io.UnsupportedOperation:
+                # buffered file object of a pipe
+                input = InputPipe(input, self._setSize)
             except IOError as err:
                 if err.errno == ESPIPE:
                     input = InputPipe(input, self._setSize)
@@ -409,9 +564,15 @@ class InputIOStream(InputStream):
                     raise InputStreamError(
                         "Unable to get size of %s: %s" % (source, err))
         self._input = input
+        if cache and config.input_cache_block_count \
+                and not isinstance(input, InputPipe):
+            self.cache = InputCache(input)
+        else:
+            self.cache = None
         InputStream.__init__(self, size=size, **args)
 
     def close(self):
+        self.cache = None
         self._input.close()
 
     def __current_size(self):
@@ -428,9 +589,12 @@ class InputIOStream(InputStream):
         assert size > 0
         _size = self._size
         address, shift = divmod(address, 8)
-        self._input.seek(address)
         size = (size + shift + 7) >> 3
-        data = self._input.read(size)
+        if self.cache is not None:
+            data = self.cache.read(address, size)
+        else:
+            self._input.seek(address)
+            data = self._input.read(size)
         got = len(data)
         missing = size != got
         if missing and _size == self._size:
@@ -446,6 +610,12 @@ class InputIOStream(InputStream):
             return new_file
         return InputStream.file(self)
 
+    def fileOffset(self, address):
+        if address % 8 or isinstance(self._input, InputPipe) \
+                or not hasattr(self._input, "fileno"):
+            return None
+        return (self._input, address // 8)
+
 
 class StringInputStream(InputStream):
 
@@ -466,6 +636,59 @@ class StringInputStream(InputStream):
             raise ReadStreamError(8 * size, 8 * address, 8 * got)
         return shift, data, False
 
+    def searchBytes(self, needle, start_address=0, end_address=None):
+        if start_address % 8:
+            raise InputStreamError(
+                "Unable to search bytes with address with bit granularity")
+        if end_address is None or self._size < end_address:
+            end_address = self._size
+        found = self.data.find(needle, start_address // 8, end_address // 8)
+        if found < 0:
+            return None
+        return 8 * found
+
+    def searchBytesBackward(self, needle, start_address=0, end_address=None):
+        if (start_address | (end_address or 0)) % 8:
+            raise InputStreamError(
+                "Unable to search bytes with address with bit granularity")
+        if end_address is None or self._size < end_address:
+            end_address = self._size
+        found = self.data.rfind(needle, start_address // 8, end_address // 8)
+        if found < 0:
+            return None
+        return 8 * found
+
+
+class MmapInputStream(StringInputStream):
+    """
+    Input stream of a regular file mapped in memory: read() slices the
+    mapping, no system call is needed, and searchBytes() runs directly on
+    the whole mapping.
+    """
+
+    def __init__(self, input, source=None, **args):
+        if source is None:
+            source = "<mmap:%r>" % input
+        if not os.fstat(input.fileno()).st_size:
+            raise NullStreamError(source)
+        data = mmap.mmap(input.fileno(), 0, access=mmap.ACCESS_READ)
+        self._input = input
+        StringInputStream.__init__(self, data, source=source, **args)
+
+    def close(self):
+        self.data.close()
+        self._input.close()
+
+    def file(self):
+        new_file = os.fdopen(os.dup(self._input.fileno()), "rb")
+        new_file.seek(0)
+        return new_file
+
+    def fileOffset(self, address):
+        if address % 8:
+            return None
+        return (self._input, address // 8)
+
 
 class InputSubStream(InputStream):
 
@@ -493,6 +716,37 @@ class InputSubStream(InputStream):
     def read(self, address, size):
         return self.stream.read(self._offset + address, size)
 
+    def fileOffset(self, address):
+        return self.stream.fileOffset(self._offset + address)
+
+    def searchBytes(self, needle, start_address=0, end_address=None):
+        if self._offset % 8:
+            return InputStream.searchBytes(self, needle,
+                                           start_address, end_address)
+        if self._size and (end_address is None or self._size < end_address):
+            end_address = self._size
+        if end_address is not None:
+            end_address += self._offset
+        found = self.stream.searchBytes(needle, self._offset + start_address,
+                                        end_address)
+        if found is None:
+            return None
+        return found - self._offset
+
+    def searchBytesBackward(self, needle, start_address=0, end_address=None):
+        if self._offset % 8:
+            return InputStream.searchBytesBackward(self, needle,
+                                                   start_address, end_address)
+        if self._size and (end_address is None or self._size < end_address):
+            end_address = self._size
+        if end_address is not None:
+            end_address += self._offset
+        found = self.stream.searchBytesBackward(
+            needle, self._offset + start_address, end_address)
+        if found is None:
+            return None
+        return found - self._offset
+
 
 def InputFieldStream(field, **args):
     if not field.parent:
@@ -577,6 +831,71 @@ class FragmentedStream(InputStream):
             i += 1
 
 
+class ExtentStream(InputStream):
+    """
+    Stream of data stored in extents of another stream: extents is a list
+    of (address, size) in bits, address is None for a hole (read as null
+    bytes). The stream size is the sum of the extent sizes.
+
+    read() reads the parent stream once per extent.
+    """
+
+    def __init__(self, stream, extents, **args):
+        self.stream = stream
+        self.extents = extents
+        self.offsets = []
+        size = 0
+        for address, extent_size in extents:
+            self.offsets.append(size)
+            size += extent_size
+        args.setdefault("source", "<extents input=%s>" % stream.source)
+        InputStream.__init__(self, size=size, **args)
+        self._current_size = size
+
+    def close(self):
+        self.stream = None
+
+    def getExtents(self, address, size):
+        """
+        Get the extents of the parent stream storing size bits at address:
+        list of (address, size), address is None for a hole.
+        """
+        extents = []
+        index = bisect_right(self.offsets, address) - 1
+        while size:
+            extent_address, extent_size = self.extents[index]
+            delta = address - self.offsets[index]
+            length = min(extent_size - delta, size)
+            if extent_address is not None:
+                extent_address += delta
+            extents.append((extent_address, length))
+            address += length
+            size -= length
+            index += 1
+        return extents
+
+    def read(self, address, size):
+        if self._size < address + size:
+            raise ReadStreamError(size, address, max(0, self._size - address))
+        shift = None
+        data = []
+        for extent_address, length in self.getExtents(address, size):
+            if extent_address is None:
+                part_shift = address % 8
+                part = bytes((part_shift + length + 7) // 8)
+            else:
+                part_shift, part, missing = self.stream.read(
+                    extent_address, length)
+                if missing:
+                    raise ReadStreamError(length, extent_address)
+            if shift is None:
+                shift = part_shift
+            else:
+                assert not part_shift
+            data.append(part)
+        return shift, b''.join(data), False
+
+
 class ConcatStream(InputStream):
     # TODO: concatene any number of any type of stream
 
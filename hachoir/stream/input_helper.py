@@ -1,5 +1,28 @@
 from hachoir.core.i18n import guessBytesCharset
-from hachoir.stream import InputIOStream, InputSubStream, InputStreamError
+from hachoir.core import config
+from hachoir.stream import (InputIOStream, InputSubStream, InputStreamError,
+                            MmapInputStream)
+import os
+import stat
+
+
+def _isRegularFile(inputio):
+    try:
+        return stat.S_ISREG(os.fstat(inputio.fileno()).st_mode)
+    except (AttributeError, OSError, ValueError):
+        # not a real file (ex: BytesIO)
+        return False
+
+
+def _openStream(inputio, **args):
+    if config.input_mmap and _isRegularFile(inputio):
+        try:
+            return MmapInputStream(inputio, **args)
+        except (OSError, ValueError, OverflowError):
+            # mmap is not supported, or the file is too large
+            # for the address space
+            pass
+    return InputIOStream(inputio, **args)
 
 
 def FileInputStream(filename, real_filename=None, **args):
@@ -11,6 +34,9 @@ def FileInputStream(filename, real_filename=None, **args):
     its type can be 'str' or 'unicode'. Use real_filename when you are
     not able to convert filename to real unicode string (ie. you have to
     use unicode(name, 'replace') or unicode(name, 'ignore')).
+
+    Regular files are mapped in memory (see MmapInputStream) if
+    config.input_mmap is true.
     """
     if not real_filename:
         real_filename = (filename if isinstance(filename, str)
@@ -31,11 +57,11 @@ def FileInputStream(filename, real_filename=None, **args):
     if offset or size:
         if size:
             size = 8 * size
-        stream = InputIOStream(inputio, source=source, **args)
+        stream = _openStream(inputio, source=source, **args)
         return InputSubStream(stream, 8 * offset, size, **args)
     else:
         args.setdefault("tags", []).append(("filename", filename))
-        return InputIOStream(inputio, source=source, **args)
+        return _openStream(inputio, source=source, **args)
 
 
 def guessStreamCharset(stream, address, size, default=None):
@@ -4,9 +4,49 @@ from hachoir.core.bits import long2raw
 from hachoir.stream import StreamError
 from hachoir.core import config
 from errno import EBADF
+import os
 
 MAX_READ_NBYTES = 2 ** 16
 
+# Buffer size (in bytes) of copyBytesFrom() when data are read in Python
+COPY_BUFFER_SIZE = 1 << 20
+
+# Maximum number of bytes copied by a single system call
+COPY_CHUNK_SIZE = 1 << 30
+
+
+def copyFileRange(src, offset, dst, size):
+    """
+    Copy size bytes of the file descriptor src at offset (in bytes) to the
+    file descriptor dst (at its current position) without reading them in
+    Python: use os.copy_file_range() or os.sendfile() if available.
+
+    Return the number of copied bytes, which is smaller than size if the
+    copy failed or if the end of src has been reached.
+    """
+    done = 0
+    for name in ("copy_file_range", "sendfile"):
+        copy = getattr(os, name, None)
+        if copy is None:
+            continue
+        try:
+            while done < size:
+                chunk = min(size - done, COPY_CHUNK_SIZE)
+                if name == "sendfile":
+                    copied = copy(dst, src, offset + done, chunk)
+                else:
+                    copied = copy(src, dst, chunk, offset + done)
+                if not copied:
+                    # end of file
+                    return done
+                done += copied
+            return done
+        except OSError:
+            # Unsupported file types or file systems: try the next
+            # function
+            continue
+    return done
+
 
 class OutputStreamError(StreamError):
     pass
@@ -122,10 +162,21 @@ class OutputStream(object):
             self.writeBits(nb_bits, data, endian)
 
     def copyBytesFrom(self, input, address, nb_bytes):
+        """
+        Copy nb_bytes bytes of the input stream at address (in bits).
+
+        If the input data are stored in a regular file and the output is a
+        file, the data are copied by the kernel (see copyFileRange()),
+        otherwise they are copied using large buffers.
+        """
         if (address % 8):
             raise OutputStreamError(
                 "Unable to copy bytes with address with bit granularity")
-        buffer_size = 1 << 12   # 8192 (8 KB)
+        if self._bit_pos == 0 and nb_bytes:
+            copied = self._copyFileFrom(input, address, nb_bytes)
+            address += copied * 8
+            nb_bytes -= copied
+        buffer_size = COPY_BUFFER_SIZE
         while 0 < nb_bytes:
             # Compute buffer size
             if nb_bytes < buffer_size:
@@ -141,6 +192,28 @@ class OutputStream(object):
             address += buffer_size * 8
             nb_bytes -= buffer_size
 
+    def _copyFileFrom(self, input, address, nb_bytes):
+        """
+        Zero-copy path of copyBytesFrom(): return the number of copied
+        bytes.
+        """
+        source = input.fileOffset(address)
+        if source is None or not hasattr(self._output, "fileno"):
+            return 0
+        source, offset = source
+        try:
+            src = source.fileno()
+            dst = self._output.fileno()
+        except (AttributeError, OSError, ValueError):
+            # eg. io.BytesIO has a fileno() method which raises an error
+            return 0
+        self._output.flush()
+        copied = copyFileRange(src, offset, dst, nb_bytes)
+        if copied and self._output.seekable():
+            # Update the position of the file object
+            self._output.seek(os.lseek(dst, 0, os.SEEK_CUR))
+        return copied
+
     def writeBytes(self, bytes):
         if self._bit_pos != 0:
             raise NotImplementedError()
@@ -21,6 +21,8 @@ def parseOptions():
                       action="store", type='str', default=None)
     common.add_option("--version", help="Display version and exit",
                       action="callback", callback=displayVersion)
+    common.add_option("--jobs", help="Number of worker processes used to search in parallel (default: 1)",
+                      action="store", type='int', default=1)
     common.add_option("--quiet", help="Be quiet",
                       action="store_true", default=False)
     common.add_option("--profiler", help="Run profiler",
@@ -41,7 +43,7 @@ def parseOptions():
 
 
 def displaySearchStat(subfile):
-    stats = [(parser.tags["id"], stats[0], stats[1])
+    stats = [(parser.PARSER_TAGS["id"], stats[0], stats[1])
              for parser, stats in subfile.stats.items()]
     print()
     print("[ Match statistics ]")
@@ -87,6 +89,8 @@ def main():
         subfile = SearchSubfile(stream, values.offset, values.size)
         subfile.verbose = not values.quiet
         subfile.debug = values.debug
+        subfile.jobs = values.jobs
+        subfile.filename = filename
         if output:
             subfile.setOutput(output)
         if values.profiler:
@@ -41,8 +41,9 @@ class Output:
         output = FileOutputStream(filename)
 
         # Write output
-        try:
-            output.copyBytesFrom(stream, offset, size // 8)
-        except StreamError as err:
-            error("copyBytesFrom() error: %s" % err)
+        with output:
+            try:
+                output.copyBytesFrom(stream, offset, size // 8)
+            except StreamError as err:
+                error("copyBytesFrom() error: %s" % err)
         return filename
@@ -1,15 +1,102 @@
 from hachoir.parser import QueryParser
-from hachoir.regex import PatternMatching
+from hachoir.regex import parse as parseRegex, RegexAnd, RegexString
+import re
 
+# Minimum length of an anchor: shorter anchors match too often
+MIN_ANCHOR = 3
 
-# XXX hachoir.regex uses str but the rest of hachoir uses bytes,
-# which means we have to convert bytes to str using latin1 encoding
-# (the closest "raw bytes" encoding) in order for matching to work.
-class HachoirPatternMatching(PatternMatching):
+# Bytes skipped at the start of magic strings to choose their anchor:
+# they are very common in binary files (eg. blocks filled with zeros)
+COMMON_BYTES = b"\0\xff "
 
-    def __init__(self, categories=None, parser_ids=None):
-        PatternMatching.__init__(self)
 
+def literalAnchor(magic):
+    """
+    Choose the anchor of a magic string: returns (anchor, delta) where delta
+    is the position of the anchor in the magic string.
+
+    >>> literalAnchor(b"\\0\\0\\0\\1Bud1")
+    (b'\\x01Bud1', 3)
+    >>> literalAnchor(b"\\0\\0a")
+    (b'\\x00\\x00a', 0)
+    """
+    delta = 0
+    while MIN_ANCHOR < len(magic) - delta and magic[delta] in COMMON_BYTES:
+        delta += 1
+    return magic[delta:], delta
+
+
+def regexAnchor(regex):
+    r"""
+    Choose the anchor of a regular expression (bytes): the longest string
+    at a fixed position. Returns (anchor, delta), or None if the regular
+    expression has no string of MIN_ANCHOR bytes at a fixed position.
+
+    >>> regexAnchor(b"\0{16}.{24}_FVH")
+    (b'_FVH', 40)
+    >>> regexAnchor(b"MZ.[\0\1]") is None
+    True
+    """
+    regex = parseRegex(regex.decode('latin1'))
+    if isinstance(regex, RegexAnd):
+        items = regex.content
+    else:
+        items = [regex]
+    best = None
+    delta = 0
+    for item in items:
+        if isinstance(item, RegexString) and MIN_ANCHOR <= len(item.text) \
+                and (best is None or len(best[0]) < len(item.text)):
+            best = (item.text.encode('latin1'), delta)
+        length = item.minLength()
+        if length != item.maxLength():
+            break
+        delta += length
+    return best
+
+
+def createTrieRegex(strings):
+    """
+    Create a regular expression matching the strings (bytes), factorized
+    as a trie to match faster than a flat alternation.
+
+    >>> createTrieRegex([b"ab", b"ac", b"d"])
+    b'(?:a(?:b|c)|d)'
+    """
+    groups = {}
+    end = False
+    for text in strings:
+        if not text:
+            end = True
+            continue
+        groups.setdefault(text[:1], []).append(text[1:])
+    items = [re.escape(first) + createTrieRegex(groups[first])
+             for first in sorted(groups)]
+    if not items:
+        return b""
+    if len(items) == 1 and not end:
+        return items[0]
+    regex = b"(?:" + b"|".join(items) + b")"
+    if end:
+        regex += b"?"
+    return regex
+
+
+class HachoirPatternMatching:
+    """
+    Search the magic strings ("magic" tag) and the magic regular expressions
+    ("magic_regex" tag) of parsers in bytes.
+
+    Each pattern has an anchor (a string at a fixed position in the
+    pattern). Anchors are searched using a single regular expression, and
+    then patterns are checked at the candidate positions: a dictionary
+    lookup per magic string length, and a match of the regular
+    expressions. Regular expressions with no anchor are searched
+    separately. Matches can overlap and all parsers sharing a magic string
+    are reported.
+    """
+
+    def __init__(self, categories=None, parser_ids=None):
         # Load parser list
         tags = []
         if categories:
@@ -20,17 +107,112 @@ class HachoirPatternMatching(PatternMatching):
             tags += [None]
         parser_list = QueryParser(tags)
 
-        # Create string patterns
+        # magic length => {magic: [(offset, parser), ...]}
+        self.strings = {}
+        # [(compiled regex, offset, parser), ...]
+        self.regexs = []
+        # anchor => set of deltas (position of the anchor in the pattern)
+        self.anchors = {}
+        # compiled regexs without anchor
+        self.unanchored = []
+        self.max_length = 0
+
         for parser in parser_list:
             for (magic, offset) in parser.getParserTags().get("magic", ()):
-                self.addString(magic.decode('latin1'), (offset, parser))
-
-        # Create regex patterns
+                magics = self.strings.setdefault(len(magic), {})
+                if magic not in magics:
+                    magics[magic] = []
+                    self.addAnchor(*literalAnchor(magic))
+                magics[magic].append((offset, parser))
+                self.max_length = max(self.max_length, len(magic))
         for parser in parser_list:
             for (regex, offset) in parser.getParserTags().get("magic_regex", ()):
-                self.addRegex(regex.decode('latin1'), (offset, parser))
-        self.commit()
+                length = parseRegex(regex.decode('latin1')).maxLength()
+                if length is None:
+                    raise ValueError(
+                        "Regular expression with no maximum size is forbidden")
+                compiled = re.compile(regex, re.DOTALL)
+                self.regexs.append((compiled, offset, parser))
+                anchor = regexAnchor(regex)
+                if anchor:
+                    self.addAnchor(*anchor)
+                else:
+                    self.unanchored.append(compiled)
+                self.max_length = max(self.max_length, length)
+
+        # Longest strings first: the position of a match is the same
+        self.lengths = sorted(self.strings, reverse=True)
+        self.anchor_lengths = sorted(set(len(anchor) for anchor in self.anchors))
+        if self.anchors:
+            self.anchor_regex = re.compile(createTrieRegex(self.anchors))
+        else:
+            self.anchor_regex = None
+
+    def addAnchor(self, anchor, delta):
+        self.anchors.setdefault(anchor, set()).add(delta)
+
+    def __str__(self):
+        return "%s magic strings and %s magic regular expressions" % (
+            sum(len(magics) for magics in self.strings.values()),
+            len(self.regexs))
+
+    def match(self, data, pos):
+        """
+        Generate (offset, parser) of all patterns matching data at position
+        pos. offset is the offset of the magic in the file (in bits).
+        """
+        for length in self.lengths:
+            found = self.strings[length].get(data[pos:pos + length])
+            if found:
+                yield from found
+        for regex, offset, parser in self.regexs:
+            if regex.match(data, pos):
+                yield (offset, parser)
+
+    def findCandidates(self, data, end):
+        """
+        Find the positions where a pattern may match (before end).
+        """
+        candidates = set()
+        anchors = self.anchors
+        if self.anchor_regex is not None:
+            search = self.anchor_regex.search
+            pos = 0
+            while True:
+                match = search(data, pos)
+                if match is None:
+                    break
+                pos = match.start()
+                for length in self.anchor_lengths:
+                    deltas = anchors.get(data[pos:pos + length])
+                    if deltas:
+                        for delta in deltas:
+                            if 0 <= pos - delta < end:
+                                candidates.add(pos - delta)
+                pos += 1
+        for regex in self.unanchored:
+            search = regex.search
+            pos = 0
+            while True:
+                match = search(data, pos, end + self.max_length)
+                if match is None or end <= match.start():
+                    break
+                pos = match.start()
+                candidates.add(pos)
+                pos += 1
+        return candidates
+
+    def search(self, data, end=None):
+        """
+        Search patterns in data (bytes). Generate (parser, address) where
+        address is the address (in bits) of the beginning of the file,
+        relative to data. Results are sorted by magic position.
 
-    def search(self, data):
-        for start, stop, item in PatternMatching.search(self, data.decode('latin1')):
-            yield (item.user[1], start * 8 - item.user[0])
+        Only patterns starting before end (in bytes, default: len(data))
+        are reported: data can overlap the next block of data.
+        """
+        if end is None:
+            end = len(data)
+        for pos in sorted(self.findCandidates(data, end)):
+            for offset, parser in self.match(data, pos):
+                yield (parser, pos * 8 - offset)
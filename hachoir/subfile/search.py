@@ -1,11 +1,13 @@
-from hachoir.stream import InputSubStream
+from hachoir.stream import FileInputStream, InputSubStream
 from hachoir.core.tools import humanFilesize, humanDuration
 from hachoir.core.memory import limitedMemory
+from hachoir.parser import HachoirParserList
 from hachoir.subfile.data_rate import DataRate
 from hachoir.subfile.output import Output
 from hachoir.subfile.pattern import HachoirPatternMatching as PatternMatching
 from sys import stderr
 from time import time
+import multiprocessing
 
 
 def skipSubfile(parser):
@@ -15,9 +17,24 @@ def skipSubfile(parser):
 
 FILE_MAX_SIZE = 100 * 1024 * 1024   # Max. file size in bytes (100 MB)
 SLICE_SIZE = 64 * 1024                # Slice size in bytes (64 KB)
+REGION_SIZE = 16 * 1024 * 1024     # Region size in bytes of parallel mode (16 MB)
 MEMORY_LIMIT = 50 * 1024 * 1024
 PROGRESS_UPDATE = 1.5   # Minimum number of second between two progress messages
 
+# SearchSubfile of a worker process of the parallel mode
+_worker_subfile = None
+
+
+def _initWorker(filename, categories, parser_ids, slice_size):
+    global _worker_subfile
+    _worker_subfile = SearchSubfile(FileInputStream(filename))
+    _worker_subfile.loadParsers(categories, parser_ids)
+    _worker_subfile.slice_size = slice_size
+
+
+def _searchRegionWorker(region):
+    return _worker_subfile.searchRegion(*region)
+
 
 class SearchSubfile:
     """
@@ -26,6 +43,8 @@ class SearchSubfile:
     To use it:
     - instanciate the class: subfile = SearchSubfile()
     - (optional) choose magics with: subfile.loadMagics(categories, parser_ids)
+    - (optional) search in parallel: set subfile.jobs and subfile.filename
+      (the workers open the file)
     - run the search: subfile.main()
     """
 
@@ -62,12 +81,20 @@ class SearchSubfile:
         self.debug = False
         self.output = None
         self.filter = None
+        self.categories = None
+        self.parser_ids = None
+
+        # Parallel mode: number of worker processes and input filename
+        self.jobs = 1
+        self.filename = None
 
     def setOutput(self, directory):
         self.output = Output(directory)
 
     def loadParsers(self, categories=None, parser_ids=None):
         before = time()
+        self.categories = categories
+        self.parser_ids = parser_ids
         self.patterns = PatternMatching(categories, parser_ids)
         if self.debug:
             print("Regex compilation: %.1f ms" % ((time() - before) * 1000))
@@ -127,6 +154,9 @@ class SearchSubfile:
         """
         Search all subfiles in the stream, call processParser() for each parser.
         """
+        if 1 < self.jobs and self.filename:
+            self.searchSubfilesParallel()
+            return
         self.next_offset = None
         self.next_progress = time() + PROGRESS_UPDATE
         while self.current_offset < self.size:
@@ -167,6 +197,94 @@ class SearchSubfile:
         print(text)
         self.next_progress = time() + PROGRESS_UPDATE
 
+    def regions(self):
+        """
+        Split the search interval in regions for the parallel mode:
+        generate (start, end) tuples (in bits).
+        """
+        size = self.size - self.start_offset
+        region_size = min(REGION_SIZE * 8, -(-size // self.jobs))
+        # Round to a multiple of the slice size
+        region_size = -(-region_size // self.slice_size) * self.slice_size
+        for start in range(self.start_offset, self.size, region_size):
+            yield (start, min(start + region_size, self.size))
+
+    def searchSubfilesParallel(self):
+        """
+        Parallel version of searchSubfiles(): worker processes search and
+        validate subfiles in regions (see searchRegion()), and results are
+        processed in offset order. Hits in skipped subfiles (next_offset)
+        are ignored, and valid subfiles are parsed again by this process to
+        call processParser().
+        """
+        self.next_offset = None
+        self.next_progress = time() + PROGRESS_UPDATE
+        parsers = HachoirParserList.getInstance().bytag["id"]
+        args = (self.filename, self.categories, self.parser_ids,
+                self.slice_size)
+        with multiprocessing.Pool(self.jobs, _initWorker, args) as pool:
+            results = pool.imap(_searchRegionWorker, self.regions())
+            for (start, end), hits in zip(self.regions(), results):
+                for offset, parser_id, valid in hits:
+                    if self.next_offset and offset < self.next_offset:
+                        continue
+                    parser_cls = parsers[parser_id][0]
+                    if parser_cls not in self.stats:
+                        self.stats[parser_cls] = [0, 0]
+                    self.stats[parser_cls][0] += 1
+                    if not valid:
+                        continue
+                    parser = self.guess(offset, parser_cls)
+                    if not parser:
+                        continue
+                    self.stats[parser_cls][1] += 1
+                    if self.debug:
+                        print("Found %s at offset %s" % (
+                            parser.__class__.__name__, offset // 8),
+                            file=stderr)
+                    self.processParser(offset, parser)
+                    if parser.content_size is not None\
+                            and skipSubfile(parser):
+                        self.next_offset = offset + parser.content_size
+                self.current_offset = max(end, self.next_offset or 0)
+                self.current_offset = min(self.current_offset, self.size)
+                self.datarate.update(self.current_offset)
+                if self.verbose and self.next_progress <= time():
+                    self.displayProgress()
+
+    def searchRegion(self, start, end):
+        """
+        Search and validate subfiles with a magic in the interval start..end
+        (in bits), used by worker processes of the parallel mode. Subfiles
+        are not skipped.
+
+        Returns a list of (offset, parser_id, valid) sorted by offset.
+        """
+        hits = []
+        for offset in range(start, end, self.slice_size):
+            slice_end = min(offset + self.slice_size, end)
+            for offset, parser_cls in self.iterMagics(offset, slice_end):
+                valid = self.guess(offset, parser_cls) is not None
+                hits.append((offset, parser_cls.PARSER_TAGS["id"], valid))
+        return hits
+
+    def iterMagics(self, start, end):
+        """
+        Find magics starting in the interval start..end (in bits).
+        Generate (offset, parser_cls) where offset is beginning of a file
+        (relative to stream begin), and not the position of the magic.
+        """
+        # Read the beginning of the next slice to find magics crossing
+        # the end of the slice
+        read_end = min(end + (self.patterns.max_length - 1) * 8, self.size)
+        data = self.stream.readBytes(start, (read_end - start) // 8)
+        for parser_cls, offset in self.patterns.search(data, (end - start) // 8):
+            offset += start
+            # Skip invalid offset
+            if offset < 0:
+                continue
+            yield offset, parser_cls
+
     def findMagic(self, offset):
         """
         Find all 'magic_str' strings in stream in offset interval:
@@ -179,12 +297,7 @@ class SearchSubfile:
         start = offset
         end = start + self.slice_size
         end = min(end, self.size)
-        data = self.stream.readBytes(start, (end - start) // 8)
-        for parser_cls, offset in self.patterns.search(data):
-            offset += start
-            # Skip invalid offset
-            if offset < 0:
-                continue
+        for offset, parser_cls in self.iterMagics(start, end):
             if self.next_offset and offset < self.next_offset:
                 continue
 
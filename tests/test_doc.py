@@ -58,15 +58,30 @@ class TestDoc(unittest.TestCase):
         self.check_module("hachoir.core.text_handler")
         self.check_module("hachoir.core.tools")
 
+    def test_hachoir_field(self):
+        self.check_module("hachoir.field.vector")
+
     def test_hachoir_metadata(self):
+        self.check_module("hachoir.metadata.export")
+        self.check_module("hachoir.metadata.misc")
         self.check_module("hachoir.metadata.metadata")
         self.check_module("hachoir.metadata.setter")
 
+    def test_hachoir_parser(self):
+        self.check_module("hachoir.parser.audio.flac")
+        self.check_module("hachoir.parser.common.allocation_table")
+        self.check_module("hachoir.parser.common.file_tree")
+        self.check_module("hachoir.parser.file_system.ntfs")
+        self.check_module("hachoir.parser.misc.pdf")
+
     def test_hachoir_regex(self):
         self.check_module("hachoir.regex.parser")
         self.check_module("hachoir.regex.regex")
         self.check_module("hachoir.regex.pattern")
 
+    def test_hachoir_subfile(self):
+        self.check_module("hachoir.subfile.pattern")
+
 
 if __name__ == "__main__":
     setup_tests()
@@ -3,15 +3,26 @@
 Test hachoir-metadata using the testcase.
 """
 
-from hachoir.parser import createParser
+from hachoir.parser import createParser, guessParser
+from hachoir.parser.image import PngFile
+from hachoir.parser.video import MPEG_TS
 from hachoir.core.language import Language
 from hachoir.metadata import extractMetadata
+from hachoir.metadata.image import PngMetadata
+from hachoir.metadata.metadata import extractors, registerExtractor
+from hachoir.metadata.cache import MetadataCache
 from hachoir.metadata.timezone import createTimezone
+from hachoir.stream import StringInputStream
 from hachoir.test import setup_tests
 from datetime import date, timedelta, datetime
+import csv
+import io
+import json
 import os
+import shutil
 import subprocess
 import sys
+import tempfile
 import unittest
 
 DATADIR = os.path.join(os.path.dirname(__file__), 'files')
@@ -142,6 +153,21 @@ class TestMetadata(unittest.TestCase):
             sys.stdout.write("ok\n")
         return True
 
+    def test_register_parser_class(self):
+        class PngTest(PngFile):
+            PARSER_TAGS = {"id": "png_test"}
+
+        # parser classes are still accepted, mapped to their identifier
+        registerExtractor(PngTest, PngMetadata)
+        self.addCleanup(extractors.pop, "png_test")
+        self.assertIs(extractors["png_test"], PngMetadata)
+        with open(os.path.join(DATADIR, "logo-kubuntu.png"), "rb") as fp:
+            parser = PngTest(StringInputStream(fp.read()))
+        metadata = extractMetadata(parser)
+        self.check_attr(metadata, "bits_per_pixel", 32)
+
+        self.assertRaises(TypeError, registerExtractor, 1, PngMetadata)
+
     def test_png(self):
         metadata = self.extract("logo-kubuntu.png")
         self.check_attr(metadata, "bits_per_pixel", 32)
@@ -488,6 +514,52 @@ class TestMetadata(unittest.TestCase):
         self.check_attr(meta, 'author', 'Soroosh Radpoor')
         self.check_attr(meta, 'creation_date', datetime(2008, 9, 2, 16, 8, 30))
 
+    def test_pdf(self):
+        meta = self.extract("incremental_update.pdf")
+        self.check_attr(meta, 'title', "Incremental (1)")
+        self.check_attr(meta, 'author', "Jane")
+        self.check_attr(meta, 'nb_page', 8)
+        self.check_attr(meta, 'creation_date',
+                        datetime(2024, 1, 2, 3, 4, 5,
+                                 tzinfo=createTimezone(1)))
+        meta = self.extract("object_streams.pdf")
+        self.check_attr(meta, 'title', "Stream update")
+        self.check_attr(meta, 'nb_page', 7)
+        self.check_attr(meta, 'format_version', "PDF version 1.5")
+
+    def test_tail_duration(self):
+        # FLAC without total number of samples: use the last frame
+        with open(os.path.join(DATADIR, "hotel_california.flac"), "rb") as fp:
+            data = bytearray(fp.read())
+        data[21] &= 0xF0
+        data[22:26] = bytes(4)
+        meta = extractMetadata(guessParser(StringInputStream(bytes(data))))
+        self.check_attr(meta, 'duration',
+                        timedelta(seconds=5 * 4608 / 44100.0))
+
+        # MPEG audio followed by garbage: ignore data after the last frame
+        with open(os.path.join(DATADIR, "marc_kravetz.mp3"), "rb") as fp:
+            data = fp.read()
+        meta = extractMetadata(guessParser(
+            StringInputStream(data + bytes(3000))))
+        self.check_attr(meta, 'duration', timedelta(0, 2, 400000))
+
+    def test_mpeg_ts(self):
+        def packet(pcr=None):
+            if pcr is None:
+                adaptation = b"\xb7\x00" + b"\xff" * 182
+            else:
+                pcr = (pcr // 300) << 15 | 0x3f << 9 | pcr % 300
+                adaptation = b"\xb7\x10" + pcr.to_bytes(6, "big") \
+                    + b"\xff" * 176
+            return bytes(4) + b"\x47\x01\x00\x20" + adaptation
+
+        # the PCR wraps around between the first and the last packets
+        data = (packet() + packet((1 << 33) * 300 - 27000000)
+                + packet() * 100 + packet(2 * 27000000) + packet())
+        meta = extractMetadata(MPEG_TS(StringInputStream(data)))
+        self.check_attr(meta, 'duration', timedelta(seconds=3))
+
     def test_mpeg4(self):
         meta = self.extract("quicktime.mp4")
         self.check_attr(meta, 'width', 190)
@@ -547,6 +619,119 @@ class TestMetadataCommandLine(unittest.TestCase):
 - MIME type: image/jpeg
 - Endianness: Big endian""")
 
+    def run_program(self, *args):
+        args = [sys.executable, PROGRAM] + list(args)
+        proc = subprocess.Popen(args,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT)
+        stdout, _ = proc.communicate()
+        return stdout.decode('ascii', 'replace').strip()
+
+    def test_lazy_import(self):
+        # Extractors are registered without importing parser modules
+        code = ("import sys, hachoir.metadata; "
+                "print([name for name in sys.modules "
+                "if name.startswith('hachoir.parser.') "
+                "and name.count('.') == 3])")
+        stdout = subprocess.check_output(
+            [sys.executable, "-c", code],
+            cwd=os.path.join(os.path.dirname(__file__), ".."))
+        self.assertEqual(stdout.strip(), b"[]")
+
+    def test_jobs(self):
+        filenames = [os.path.join(DATADIR, filename)
+                     for filename in ('gps.jpg', 'flashmob.mkv',
+                                      'cercle.exe', 'hachoir.org.sxw')]
+        serial = self.run_program('--mime', *filenames)
+        self.assertEqual(serial.splitlines()[1],
+                         "%s: video/x-matroska" % filenames[1])
+        parallel = self.run_program('--mime', '--jobs', '2', *filenames)
+        self.assertEqual(parallel, serial)
+        unordered = self.run_program('--mime', '--jobs', '2', '--unordered',
+                                     *filenames)
+        self.assertEqual(sorted(unordered.splitlines()),
+                         sorted(serial.splitlines()))
+
+    def test_json(self):
+        filename = os.path.join(DATADIR, 'flashmob.mkv')
+        stdout = self.run_program('--format', 'json', filename)
+        record = json.loads(stdout)
+        self.assertEqual(record["filename"], filename)
+        self.assertEqual(record["parser"], "matroska")
+        self.assertEqual(record["metadata"]["duration"], 17.844)
+        self.assertEqual(record["metadata"]["creation_date"],
+                         "2006-08-16T11:04:36")
+        self.assertEqual(record["groups"]["video[1]"]["width"], 384)
+
+    def test_json_errors(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        # undecodable filename
+        image = os.path.join(os.fsencode(tmpdir), b'caf\xe9.jpg')
+        shutil.copyfile(os.path.join(DATADIR, 'gps.jpg'), image)
+        garbage = os.path.join(tmpdir, 'garbage.bin')
+        with open(garbage, 'wb') as fp:
+            fp.write(b'\0garbage' * 16)
+        proc = subprocess.Popen([sys.executable, PROGRAM, '--format', 'json',
+                                 '--recursive', tmpdir],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL)
+        stdout, _ = proc.communicate()
+        records = [json.loads(line) for line in stdout.splitlines()]
+        self.assertEqual(len(records), 2)
+        # files which can't be parsed are not dropped
+        self.assertEqual(records[1], {"filename": garbage, "parser": None,
+                                      "error": "Unable to parse file"})
+        self.assertEqual(os.fsencode(records[0]["filename"]), image)
+        self.assertEqual(records[0]["parser"], "jpeg")
+
+    def test_csv_recursive(self):
+        stdout = self.run_program('--format', 'csv', '--recursive',
+                                  '--fields', 'width,creation_date', DATADIR)
+        rows = list(csv.reader(io.StringIO(stdout)))
+        self.assertEqual(rows[0],
+                         ["filename", "parser", "width", "creation_date"])
+        filename = os.path.join(DATADIR, 'gps.jpg')
+        self.assertIn([filename, "jpeg", "144", "2003-05-24T22:29:14"], rows)
+
+    def test_cache(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        database = os.path.join(tmpdir, 'cache.db')
+        filename = os.path.join(DATADIR, 'gps.jpg')
+        expected = self.run_program(filename)
+        self.assertEqual(self.run_program('--cache', database, filename),
+                         expected)
+        with MetadataCache(database) as cache:
+            rows = cache.db.execute("SELECT path, parser FROM metadata")
+            # The cache is keyed by absolute paths
+            self.assertEqual(rows.fetchall(),
+                             [(os.path.abspath(filename), "jpeg")])
+        self.assertEqual(self.run_program('--cache', database, filename),
+                         expected)
+
+
+class TestMetadataCache(unittest.TestCase):
+
+    def test_file_identity(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        filename = os.path.join(tmpdir, 'file')
+        with open(filename, 'wb') as fp:
+            fp.write(b'abc')
+        with MetadataCache(os.path.join(tmpdir, 'cache.db'), 'a') as cache:
+            self.assertIsNone(cache.get(filename))
+            cache.set(filename, 'parser', {'key': [1, 'text']})
+            self.assertEqual(cache.get(filename),
+                             ('parser', {'key': [1, 'text']}))
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+            with open(filename, 'ab') as fp:
+                fp.write(b'def')
+            self.assertIsNone(cache.get(filename))
+        with MetadataCache(os.path.join(tmpdir, 'cache.db'), 'b') as cache:
+            self.assertIsNone(cache.get(filename))
+
 
 if __name__ == "__main__":
     setup_tests()
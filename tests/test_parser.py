@@ -3,9 +3,17 @@
 Test hachoir-parser using the testcase.
 """
 
+from hachoir.core.endian import BIG_ENDIAN, LITTLE_ENDIAN, MIDDLE_ENDIAN
 from hachoir.core.error import error
 from hachoir.stream import StringInputStream
-from hachoir.parser import createParser, HachoirParserList, ValidateError
+from hachoir.parser import (createParser, guessParser, HachoirParserList,
+                            ValidateError)
+from hachoir.parser.archive.lzx import LZXDecompressor
+from hachoir.parser.archive.zlib import build_tree
+from hachoir.parser.image.jpeg import scanEntropyCodedData, SCAN_BLOCK_SIZE
+from hachoir.parser.manifest import PARSERS
+from hachoir.parser.misc.pdf import Reference, StreamObject
+from hachoir.parser.parser_list import LazyParser, createManifest, findParsers
 from hachoir.test import setup_tests
 from array import array
 from datetime import datetime
@@ -131,6 +139,56 @@ class TestParsers(unittest.TestCase):
                         'Stainless Steel Provider is compilated to the car of Twinstar.')
         self.checkValue(parser, "/frames/frame[0]/use_padding", False)
 
+    def test_mp3_last_frame(self):
+        parser = self.parse("sheep_on_drugs.mp3")
+        # the last frame of the file is truncated
+        frame = parser["frames"].createLastFrame()
+        self.assertEqual(frame.address, 8 * 20016)
+        self.assertEqual(frame.getFrameSize(), 417)
+        parser = self.parse("marc_kravetz.mp3")
+        frame = parser["frames"].createLastFrame()
+        self.assertEqual(frame.address + 8 * frame.getFrameSize(),
+                         parser["frames"].size)
+
+    def test_ogg_last_page(self):
+        parser = self.parse("interlude_david_aubrun.ogg")
+        page = parser.createLastPage()
+        self.assertEqual(page.absolute_address, 8 * 933503)
+        self.assertTrue(page["last_page"].value)
+        self.assertEqual(parser.createContentSize(), 8 * 936599)
+        self.assertIsNone(parser.createLastPage(serial=1))
+
+        # truncated last page followed by garbage: use the previous page
+        with open(os.path.join(DATADIR, "interlude_david_aubrun.ogg"), "rb") as fp:
+            data = fp.read()
+        parser = guessParser(StringInputStream(data[:-100] + b"OggS\0garbage"))
+        page = parser.createLastPage(serial=page["serial"].value,
+                                     with_granule=True)
+        self.assertEqual(page.absolute_address, 8 * 929346)
+        self.assertEqual(page["page"].value, 219)
+        self.assertEqual(page["abs_granule_pos"].value, 3163328)
+
+    def test_ogg_content_size(self):
+        with open(os.path.join(DATADIR, "interlude_david_aubrun.ogg"), "rb") as fp:
+            data = fp.read()
+        # the content ends with the end-of-stream page of the first file
+        for tail in (data, b"\0" * 100 + data, bytes(range(256)) * 40000):
+            parser = guessParser(StringInputStream(data + tail))
+            self.assertEqual(parser.content_size, 8 * 936599)
+        # no end-of-stream page
+        parser = guessParser(StringInputStream(data[:-100]))
+        self.assertIsNone(parser.content_size)
+
+    def test_flac(self):
+        parser = self.parse("hotel_california.flac")
+        self.checkValue(parser, "/frames/frame[0]/frame_number", 0)
+        self.checkValue(parser, "/frames/frame[0]/crc8", 0x24)
+        self.assertTrue(parser["frames/frame[0]"].isValid())
+        self.assertEqual(parser["frames/frame[0]"].getBlockSize(), 4608)
+        frame = parser.createLastFrame()
+        self.assertEqual(frame.absolute_address, 8 * 30438)
+        self.assertEqual(frame["frame_number"].value, 4)
+
     def test_au(self):
         parser = self.parse("audio_8khz_8bit_ulaw_4s39.au")
         self.checkValue(parser, "info", "../tmp/temp.snd")
@@ -286,6 +344,76 @@ class TestParsers(unittest.TestCase):
         self.checkValue(parser, "/packet[3]/ipv4/src", "212.27.54.252")
         self.checkDisplay(parser, "/packet[7]/udp/src", "DNS")
 
+    def test_lazy_field_sets(self):
+        # createSize() gives the size of atoms and packets:
+        # walking the first level doesn't create their fields
+        parser = self.parse("quicktime.mp4")
+        self.assertEqual([field.size for field in parser],
+                         [192, 24368, 64, 64, 1941544])
+        self.assertEqual([field.current_length for field in parser],
+                         [0, 0, 0, 0, 0])
+        self.checkValue(parser, "/atom[1]/tag", "moov")
+        self.checkValue(parser, "/atom[1]/movie/atom[0]/movie_hdr/time_scale",
+                        600)
+
+        parser = self.parse("arp_dns_ping_dns.tcpdump")
+        self.assertEqual(len(parser), 15)
+        self.assertEqual(parser["packet[7]"].current_length, 0)
+        self.checkValue(parser, "/packet[7]/caplen", 110)
+
+    def test_mp4_sample_tables(self):
+        parser = self.parse("quicktime.mp4")
+        stbl = "/atom[1]/movie/atom[2]/track/atom[2]/media/atom[2]/minf/atom[2]/stbl"
+        sizes = parser[stbl + "/atom[4]/stsz/sample_size"]
+        self.assertEqual(len(sizes), 149)
+        self.assertEqual(sizes.value[:3].tolist(), [1156, 105, 287])
+        self.assertEqual(sizes[1], 105)
+        self.assertEqual(sizes.size, 149 * 32)
+        self.checkDisplay(parser, stbl + "/atom[2]/stss/sample_number",
+                          "[1, 31, 61, 91, 121]")
+        self.assertEqual(parser[stbl + "/atom[1]/stts/entries"].value.tolist(),
+                         [149, 1])
+
+    def test_max_resident_fields(self):
+        def walk(fieldset, values):
+            for field in fieldset:
+                if field.is_field_set:
+                    walk(field, values)
+                else:
+                    values.append((field.path, field.value))
+            return values
+
+        expected = walk(self.parse("10min.mkv"), [])
+        parser = self.parse("10min.mkv")
+        parser.max_resident_fields = 500
+        self.assertEqual(walk(parser, []), expected)
+        self.assertLessEqual(parser._countResidentFields(), 500)
+        # evicted field sets are parsed again
+        self.assertEqual(walk(parser, []), expected)
+
+    def test_max_resident_fields_pinned(self):
+        expected = [field.path for field in
+                    self.parse("10min.mkv")["Segment[0]/Cluster[0]"]]
+        parser = self.parse("10min.mkv")
+        parser.max_resident_fields = 100
+        segment = parser["Segment[0]"]
+        cluster = segment["Cluster[0]"]
+        len(cluster)
+        fields = iter(cluster)
+        paths = [next(fields).path]
+        cluster1 = segment["Cluster[1]"]
+        length = len(cluster1)
+        for index in range(2, 40):
+            len(segment["Cluster[%s]" % index])
+        # a field set being iterated is kept, other ones are reset even if
+        # they are referenced
+        self.assertEqual(cluster.current_length, len(expected))
+        self.assertEqual(cluster1.current_length, 0)
+        paths.extend(field.path for field in fields)
+        self.assertEqual(paths, expected)
+        self.assertEqual(cluster._pinned, 0)
+        self.assertEqual(len(cluster1), length)
+
     def test_ext2(self):
         parser = self.parse("my60k.ext2")
         self.checkDisplay(parser, "/superblock/last_check",
@@ -332,6 +460,26 @@ class TestParsers(unittest.TestCase):
         self.checkDisplay(parser, "/superblock/rev_level",
                           "V2 format w/ dynamic inode sizes")
 
+    def test_ext2_files(self):
+        parser = self.parse("my60k.ext2")
+        self.assertEqual(list(parser.walk()), [
+            ("/boot", 11, True),
+            ("/cross.xcf", 12, False),
+            ("/pyc_example_2.5c1.pyc", 13, False),
+            ("/CD_0008_5C48_1m53s.cda", 15, False),
+            ("/empty_dir", 16, True),
+            ("/boot/mbr_linux_and_ext", 14, False)])
+        self.assertEqual(parser.lookup("/boot/mbr_linux_and_ext"), 14)
+        self.assertIsNone(parser.lookup("/boot/missing"))
+        self.assertIsNone(parser.lookup("/cross.xcf/file"))
+        self.assertRaises(KeyError, parser.getFileExtents, "/missing")
+        self.assertEqual(parser.getFileExtents("/cross.xcf"),
+                         [(21 * 1024 * 8, 1816 * 8)])
+        data = b"".join(parser.iterFileData(12, chunk_size=1000))
+        self.assertEqual(len(data), 1816)
+        self.assertTrue(data.startswith(b"gimp xcf file\0"))
+        self.assertEqual(parser.openFile(12).readBytes(0, 1816), data)
+
     def test_ext2_default_mount_opts(self):
         parser = self.parse("default_mount_opts.ext2")
         self.checkValue(parser, "/superblock/default_mount_opts/debug", False)
@@ -357,6 +505,120 @@ class TestParsers(unittest.TestCase):
             self.checkDesc(parser, "/group[0]/inode_table/inode[12]",
                            "Inode 13: Symbolic link (-> source), size=6 bytes, mode=lrwxrwxrwx")
             self.checkValue(parser, "/group[0]/inode[11]block[0]", b"hello\n" + b'\0' * (bsize - 6))
+            self.assertEqual(b"".join(parser.iterFileData("/source")),
+                             b"hello\n")
+            # fast symbolic link: the target is stored in the inode
+            self.assertEqual(parser.openFile("/target").readBytes(0, 6),
+                             b"source")
+
+    def fileContent(self, name, size):
+        # content of the files stored in ntfs_tree.img and joliet_tree.iso
+        data = b"".join(b"%04d %s\n" % (index, name.encode())
+                        for index in range(size // (len(name) + 6) + 1))
+        return data[:size]
+
+    def test_iso9660_files(self):
+        parser = self.parse("joliet_tree.iso")
+        names = ["file number %02d with a long name.txt" % index
+                 for index in range(20)]
+        # the associated file ASSOC.TXT is skipped
+        self.assertEqual([(path, is_dir) for path, inode, is_dir
+                          in parser.walk()],
+                         [("/big file.bin", False),
+                          ("/empty.txt", False),
+                          ("/noext", False),
+                          ("/readme.txt", False),
+                          ("/Sub Dir", True),
+                          ("/Sub Dir/deep", True)]
+                         + [("/Sub Dir/" + name, False) for name in names]
+                         + [("/Sub Dir/deep/x.dat", False)])
+        # the second directory sector starts with padding
+        self.assertEqual(parser.lookup("/Sub Dir/" + names[19]),
+                         ((54, 1893),))
+        self.assertEqual(b"".join(parser.iterFileData("/Sub Dir/" + names[19])),
+                         self.fileContent("file 19", 1893))
+        self.assertEqual(b"".join(parser.iterFileData("/empty.txt")), b"")
+
+        # multi-extent file, the second extent is stored first
+        self.assertEqual(parser.getFileExtents("/big file.bin"),
+                         [(30 * 2048 * 8, 4096 * 8), (29 * 2048 * 8, 1000 * 8)])
+        data = self.fileContent("big file.bin", 5096)
+        self.assertEqual(b"".join(parser.iterFileData("/big file.bin",
+                                                      chunk_size=1000)),
+                         data)
+        self.assertEqual(parser.openFile("/big file.bin").readBytes(4000 * 8, 200),
+                         data[4000:4200])
+        self.assertEqual(parser.openFile("/Sub Dir/deep/x.dat")
+                         .readBytes(0, 2100),
+                         self.fileContent("x.dat", 2100))
+
+    def test_iso9660_primary_names(self):
+        with open(os.path.join(DATADIR, "joliet_tree.iso"), "rb") as fp:
+            data = bytearray(fp.read())
+        # replace the Joliet descriptor with a terminator
+        data[17 * 2048] = 255
+        parser = guessParser(StringInputStream(bytes(data)))
+        self.assertEqual([path for path, inode, is_dir in parser.walk()][:6],
+                         ["/BIG.BIN", "/EMPTY.TXT", "/NOEXT", "/README.TXT",
+                          "/SUB", "/SUB/DEEP"])
+        self.assertEqual(b"".join(parser.iterFileData("/README.TXT")),
+                         self.fileContent("readme.txt", 300))
+
+    def test_ntfs_files(self):
+        parser = self.parse("ntfs_tree.img")
+        # DOS names and the entry of the unused INDX block are skipped
+        self.assertEqual(list(parser.walk()),
+                         [("/big.bin", 22, False)]
+                         + [("/file%02d.txt" % index, 27 + index, False)
+                            for index in range(12)]
+                         + [("/listed.bin", 25, False),
+                            ("/resident.txt", 20, False),
+                            ("/sparse.bin", 23, False),
+                            ("/subdir", 16, True),
+                            ("/tiny", 21, False),
+                            ("/uninit.bin", 24, False)]
+                         + [("/subdir/sub file %d.bin" % index, 17 + index,
+                             False) for index in range(3)])
+        self.assertIsNone(parser.lookup("/stale.txt"))
+        for path, inode, is_dir in parser.walk():
+            if path in ("/sparse.bin", "/uninit.bin") or is_dir:
+                continue
+            name = path.rsplit("/", 1)[1]
+            data = b"".join(parser.iterFileData(inode))
+            if name != "tiny":
+                self.assertEqual(data, self.fileContent(name, len(data)))
+            self.assertEqual(parser.openFile(inode).readBytes(0, len(data)),
+                             data)
+        self.assertEqual(b"".join(parser.iterFileData("/tiny")), b"x")
+        self.assertEqual(len(b"".join(parser.iterFileData("/big.bin"))),
+                         20000)
+        # the attribute list points to an extension record
+        self.assertEqual(len(b"".join(parser.iterFileData("/listed.bin"))),
+                         10000)
+
+        # resident value crossing a sector boundary: the last two bytes of
+        # the sector are stored in the update sequence array
+        extents = parser.getFileExtents("/resident.txt")
+        self.assertEqual([size for address, size in extents],
+                         [310 * 8, 2 * 8, 288 * 8])
+        self.assertEqual(b"".join(parser.iterFileData("/resident.txt")),
+                         self.fileContent("resident.txt", 600))
+
+        # sparse run: clusters 2..41 are a hole
+        self.assertEqual([(address is None, size) for address, size
+                          in parser.getFileExtents("/sparse.bin")],
+                         [(False, 2 * 512 * 8), (True, 40 * 512 * 8),
+                          (False, 2 * 512 * 8)])
+        data = self.fileContent("sparse.bin", 44 * 512)
+        self.assertEqual(b"".join(parser.iterFileData("/sparse.bin")),
+                         data[:1024] + bytes(40 * 512) + data[-1024:])
+
+        # bytes after the initialized size are read as zeros
+        data = self.fileContent("uninit.bin", 6000)
+        self.assertEqual(parser.getFileExtents("/uninit.bin")[-1],
+                         (None, 3000 * 8))
+        self.assertEqual(parser.openFile("/uninit.bin").readBytes(0, 6000),
+                         data[:3000] + bytes(3000))
 
     def test_bmp2(self):
         parser = self.parse("article01.bmp")
@@ -665,6 +927,91 @@ class TestParsers(unittest.TestCase):
         self.checkDesc(
             parser, "/root[0]/entry[2]/modify", "2005-07-26 00:48:26")
         self.checkValue(parser, "/root[0]/entry[2]/size", 29690)
+        self.assertEqual(parser.fat_table[2:6].tolist(), [3, 4, 5, 6])
+        self.assertEqual(len(parser.fat_table), 24064)
+        # COMMAND.COM: 27 clusters of 2048 bytes from cluster 2
+        self.assertEqual(parser.getExtents(2),
+                         [(parser.data_start + 2 * 2048 * 8, 27 * 2048 * 8)])
+        root = list(parser.listDirectory(parser.getRootInode()))
+        self.assertEqual(len(root), 77)
+        self.assertEqual(root[:2], [("command.com", (2, 53569), False),
+                                    ("DELLBIO.BIN", (29, 29690), False)])
+        self.assertEqual(root[4], ("DELL", (62, None), True))
+        self.assertEqual(parser.lookup("/config.sys"), (70, 77))
+        self.assertEqual(parser.getFileExtents("/command.com"),
+                         [(parser.data_start + 2 * 2048 * 8, 53569 * 8)])
+
+    def test_ole2(self):
+        parser = self.parse("radpoor.doc")
+        self.checkDesc(parser, "/root[1]",
+                       "Big blocks 195..199 (5) of 512 bytes")
+        self.checkDesc(parser, "/summary[1]",
+                       "Big blocks 129..194 (66) of 512 bytes")
+        self.assertEqual(list(parser.getChain(200)), [200, 201])
+        self.assertEqual(list(parser.getExtents(3)), [(3, 4), (195, 5)])
+        self.assertEqual(list(parser.getExtents(8, use_sfat=True)),
+                         [(8, 20)])
+
+        # the allocation tables are decoded on demand
+        parser = self.parse("radpoor.doc")
+        self.assertEqual(parser.content_size, 8 * 103936)
+        self.assertEqual(list(parser.getChain(8, use_sfat=True))[:3],
+                         [8, 9, 10])
+
+    def test_pdf_xref(self):
+        parser = self.parse("incremental_update.pdf")
+        # Entries of the update and of the original revision (/Prev)
+        self.assertEqual(len(parser.xref), 22)
+        self.assertEqual(parser.xref[0], (0, 0, 65535))
+        self.assertEqual(parser.xref[21], (1, 3800, 0))
+        self.assertEqual(parser.trailer_dict["Prev"], 3227)
+        info = parser.resolve(parser.trailer_dict["Info"])
+        self.assertEqual(info["Title"], b"Incremental (1)")
+        catalog = parser.getObject(1)
+        self.assertEqual(catalog["Pages"], Reference(3, 0))
+        self.assertEqual(parser.resolve(catalog["Pages"])["Count"], 8)
+        self.assertIsNone(parser.getObject(100))
+        self.checkValue(parser, "/body/object[0]/index", 1)
+        self.assertEqual(parser["cross_ref_table"].absolute_address,
+                         3937 * 8)
+
+    def test_pdf_object_streams(self):
+        parser = self.parse("object_streams.pdf")
+        # Cross-reference streams: compressed and uncompressed objects
+        self.assertEqual(parser.xref[11], (2, 1, 9))
+        self.assertEqual(parser.xref[22], (1, 1936, 0))
+        self.assertEqual(parser.getObject(11)["Type"], "Catalog")
+        page = parser.getObject(4)
+        self.assertEqual(page["MediaBox"], [0, 0, 595.2756, 841.8898])
+        contents = parser.resolve(page["Contents"])
+        self.assertIsInstance(contents, StreamObject)
+        self.assertEqual(parser.readStreamData(contents)[-21:],
+                         b" (Page 0) Tj T* ET\n \n")
+
+    def test_pdf_invalid_startxref(self):
+        for filename, body_end in (("incremental_update.pdf", 3227),
+                                   ("object_streams.pdf", 2292)):
+            with open(os.path.join(DATADIR, filename), "rb") as fp:
+                data = fp.read()
+            expected = guessParser(StringInputStream(data))
+            # Shift the offset of the last cross-reference section
+            pos = data.rindex(b"startxref") + len(b"startxref\n")
+            end = data.index(b"\n", pos)
+            data = (data[:pos] + str(int(data[pos:end]) + 7).encode()
+                    + data[end:])
+            parser = guessParser(StringInputStream(data))
+            # Free entries are not rebuilt
+            self.assertEqual(parser.xref, {
+                number: entry for number, entry in expected.xref.items()
+                if entry[0]})
+            self.assertEqual(parser.trailer_dict, expected.trailer_dict)
+            for number in expected.xref:
+                self.assertEqual(repr(parser.getObject(number)),
+                                 repr(expected.getObject(number)))
+            self.assertEqual(parser.getBodyEnd(), body_end)
+            self.assertEqual(parser["body"].size, 8 * body_end
+                             - parser["body"].absolute_address)
+            self.checkValue(parser, "/body/object[0]/index", 1)
 
     def test_xm(self):
         parser = self.parse("dontyou.xm")
@@ -728,6 +1075,14 @@ class TestParsers(unittest.TestCase):
         self.checkDisplay(parser, "/dir/itsp/lang_id", "English United States")
         self.checkValue(parser, "/dir/pmgl[0]/entry[1]/name", "/#IDXHDR")
 
+        # LZX compressed content
+        stream = parser["MSCompressed_content"].getSubIStream()
+        entry = parser.getFile("/start.htm")
+        self.assertEqual(entry["section"].value, 1)
+        data = stream.readBytes(entry["start"].value * 8, entry["length"].value)
+        self.assertTrue(data.startswith(b"<!DOCTYPE HTML"), data[:20])
+        self.assertTrue(data.rstrip().endswith(b"</HTML>"), data[-20:])
+
     def test_blp(self):
         parser = self.parse("swat.blp")
         self.checkValue(parser, "flags", 8)
@@ -796,6 +1151,13 @@ class TestParsers(unittest.TestCase):
         self.checkValue(
             parser, "/packet[78]/payload_unit_start", True)
 
+    def test_mpeg_ts_pcr(self):
+        parser = self.parse("sample.ts")
+        self.assertEqual(parser.findPCR(), (481, 44 * 300 + 138))
+        self.assertEqual(parser.findPCR(481, backward=True),
+                         (481, 44 * 300 + 138))
+        self.assertIsNone(parser.findPCR(1, backward=True))
+
     def test_m2ts(self):
         parser = self.parse("Panasonic_AG_HMC_151.MTS")
         self.checkValue(
@@ -961,6 +1323,42 @@ class TestParsers(unittest.TestCase):
         # FIXME: also check parsing of objects (with sub-parsers)
         self.checkValue(parser, "/checksum", 0x31c691f659cbc7841ca55a26a342fdaf0b89c533)
 
+        # without pack index: the end of the compressed data is searched and
+        # the decompressed data are reused
+        with open(os.path.join(DATADIR, "pack-31c691f659cbc7841ca55a26a342fdaf0b89c533.pack"), "rb") as fp:
+            data = fp.read()
+        parser = guessParser(StringInputStream(data))
+        self.assertIsNone(parser.getPackIndex())
+        self.assertEqual(parser["object[3]"].size, 8 * (1135 - 407))
+        stream = parser["object[3]/compressed_data"].getSubIStream()
+        self.assertIsInstance(stream, StringInputStream)
+        self.assertEqual(stream.size, 8 * 1510)
+
+    def test_git_pack_index(self):
+        index = self.parse("pack-31c691f659cbc7841ca55a26a342fdaf0b89c533.idx")
+        self.checkValue(index, "/version", 2)
+        self.assertEqual(index.count, 7)
+        self.assertEqual(index.findOffset("55dda19383a204c787c71217ed483400e3662305"), 407)
+        self.assertIsNone(index.findOffset("55dda19383a204c787c71217ed483400e3662306"))
+
+        # the companion .idx file is used to access objects directly
+        parser = self.parse("pack-31c691f659cbc7841ca55a26a342fdaf0b89c533.pack")
+        self.assertIsNotNone(parser.getPackIndex())
+        obj = parser["object[6]"]
+        self.assertEqual(obj.address, 8 * 1260)
+        self.assertEqual(parser.current_length, 3)
+        self.checkDesc(parser, "/object[6]", "type=OBJ_OFS_DELTA, decompressed size=4")
+        stream = obj["compressed_data"].getSubIStream()
+        self.assertEqual(stream.readBytes(0, 4), b"xc\x90c")
+        obj = parser.findObject("55dda19383a204c787c71217ed483400e3662305")
+        self.assertEqual(obj.name, "object[3]")
+        self.assertEqual(obj.size, 8 * (1135 - 407))
+
+        # the .idx file is closed with the pack
+        index_file = parser.getPackIndex().stream._input
+        parser.close()
+        self.assertTrue(index_file.closed)
+
 
 class TestParserRandomStream(unittest.TestCase):
 
@@ -985,6 +1383,246 @@ class TestParserRandomStream(unittest.TestCase):
                     continue
 
 
+class TestMagicIndex(unittest.TestCase):
+
+    def test_sort_parsers(self):
+        parser_list = HachoirParserList.getInstance()
+        index = parser_list.getMagicIndex()
+        png = parser_list.bytag["id"]["png"][0]
+        gzip = parser_list.bytag["id"]["gzip"][0]
+
+        stream = StringInputStream(b"\x89PNG\r\n\x1a\n" + b"\0" * 100)
+        self.assertEqual(index.match(stream.data), {png})
+        parsers = index.sortParsers(stream, parser_list)
+        self.assertEqual(parsers[0], png)
+        self.assertEqual(set(parsers), set(parser_list))
+        # parsers with a mismatching magic are dropped
+        parsers = index.sortParsers(stream, parser_list, mismatch=False)
+        self.assertEqual(parsers[0], png)
+        self.assertNotIn(gzip, parsers)
+        self.assertEqual(set(parsers) - {png},
+                         set(parser_list) - index.parsers)
+
+        # regular expressions and streams smaller than the index
+        data = b"\x1f\x8b\x08\x00" + b"\0" * 6
+        self.assertEqual(index.sortParsers(StringInputStream(data),
+                                           parser_list)[0], gzip)
+
+    def test_guess_without_extension(self):
+        for filename in ("cacert_class3.der", "gps.jpg", "flashmob.mkv",
+                         "sheep_on_drugs.mp3", "quicktime.mp4",
+                         "angle-bear-48x48.ani", "wormux_32x32_16c.ico",
+                         "minimal_xcf3.xcf", "my60k.ext2", "test.txt.gz"):
+            with open(os.path.join(DATADIR, filename), "rb") as fp:
+                data = fp.read()
+            expected = createParser(os.path.join(DATADIR, filename))
+            parser = guessParser(StringInputStream(data))
+            self.assertIs(parser.__class__, expected.__class__)
+            expected.close()
+
+
+class TestHuffmanTree(unittest.TestCase):
+
+    def readCode(self, stream, address, tree, endian):
+        # read the code bit per bit
+        size = value = 0
+        while (size, value) not in tree:
+            value = (value << 1) | stream.readBits(address + size, 1, endian)
+            size += 1
+        return (size, value, tree[(size, value)])
+
+    def test_decode(self):
+        rng = random.Random(42)
+        # complete trees with short and long (two-level table) codes
+        lengths = [1, 1]
+        while len(lengths) < 100:
+            index = rng.randrange(len(lengths))
+            if lengths[index] < 14:
+                lengths[index:index + 1] = [lengths[index] + 1] * 2
+        trees = [build_tree([2, 1, 3, 3]),
+                 build_tree(list(range(1, 17)) + [16]),
+                 build_tree(lengths)]
+        data = bytes(rng.randrange(256) for i in range(400))
+        stream = StringInputStream(data)
+        for tree in trees:
+            for endian in (BIG_ENDIAN, LITTLE_ENDIAN, MIDDLE_ENDIAN):
+                address = 0
+                while address < 8 * 300:
+                    entry = tree.decode(stream, address, endian)
+                    if entry is None:
+                        break
+                    self.assertEqual(
+                        entry, self.readCode(stream, address, tree, endian))
+                    address += entry[0]
+                self.assertGreaterEqual(address, 8 * 300)
+        # end of stream
+        self.assertIsNone(trees[1].decode(stream, 8 * 399, BIG_ENDIAN))
+
+
+class TestLZX(unittest.TestCase):
+
+    def test_uncompressed(self):
+        # no Intel E8 header, uncompressed block of 5 bytes, 4 bits of
+        # padding, R0, R1, R2, data and a padding byte (odd size)
+        bits = (0 << 27) | (3 << 24) | 5
+        header = (bits >> 12).to_bytes(2, "little") \
+            + ((bits << 4) & 0xffff).to_bytes(2, "little")
+        data = header + bytes(12) + b"hello\0"
+        stream = StringInputStream(data)
+        self.assertEqual(LZXDecompressor(stream, 15).decompress(), b"hello")
+        stream = StringInputStream(data)
+        self.assertEqual(LZXDecompressor(stream, 15, output_size=3)
+                         .decompress(), b"hel")
+
+    @staticmethod
+    def huffmanCodes(lengths):
+        # canonical codes: {symbol: (length, code)}
+        codes = {}
+        code = 0
+        for length in range(1, max(lengths.values()) + 1):
+            for symbol in sorted(lengths):
+                if lengths[symbol] == length:
+                    codes[symbol] = (length, code)
+                    code += 1
+            code <<= 1
+        return codes
+
+    def encodeAlignedBlock(self, symbols, output):
+        """
+        Encode an aligned offset block with 16 bits main and length codes and
+        a 7 bits aligned code (window of 2^21 bytes). symbols: (literal,),
+        (main symbol, length symbol) for repeated offset matches,
+        (main symbol, length symbol, aligned symbol) for slot 8 matches and
+        (main symbol, length symbol, verbatim bits, aligned symbol) for
+        slot 36 matches.
+        """
+        bits = []
+
+        def write(value, nbits):
+            bits.extend((value >> index) & 1
+                        for index in range(nbits - 1, -1, -1))
+
+        def writeLengths(lengths, start, end):
+            # pretree: 12 codes of 4 bits and 8 codes of 5 bits
+            pretree = dict((code, 4 if code < 12 else 5) for code in range(20))
+            for code in range(20):
+                write(pretree[code], 4)
+            pretree = self.huffmanCodes(pretree)
+            for index in range(start, end):
+                write(*pretree[-lengths.get(index, 0) % 17][::-1])
+
+        main = {263: 1, 327: 16, 551: 16}
+        main.update((byte, 2 + byte) for byte in range(14))
+        length = {248: 1, 13: 15, 91: 16, 92: 16}
+        length.update((symbol, 2 + symbol) for symbol in range(13))
+        aligned = dict((symbol, min(symbol + 1, 7)) for symbol in range(8))
+        main_codes = self.huffmanCodes(main)
+        length_codes = self.huffmanCodes(length)
+        aligned_codes = self.huffmanCodes(aligned)
+
+        write(0, 1)   # no Intel E8 header
+        write(2, 3)
+        write(len(output), 24)
+        for symbol in range(8):
+            write(aligned[symbol], 3)
+        writeLengths(main, 0, 256)
+        writeLengths(main, 256, 256 + 50 * 8)
+        writeLengths(length, 0, 249)
+        size = 0
+        frame_end = 32768
+        for symbol in symbols:
+            write(*main_codes[symbol[0]][::-1])
+            if symbol[0] < 256:
+                size += 1
+            else:
+                write(*length_codes[symbol[1]][::-1])
+                size += symbol[1] + 9
+                if symbol[0] == 327:
+                    write(*aligned_codes[symbol[2]][::-1])
+                elif symbol[0] == 551:
+                    write(symbol[2], 14)
+                    write(*aligned_codes[symbol[3]][::-1])
+            if frame_end <= size:
+                # the input is aligned on 16 bits at the end of each frame
+                write(0, -len(bits) % 16)
+                frame_end += 32768
+        write(0, -len(bits) % 16)
+        return b"".join(int("".join(map(str, bits[index:index + 16])), 2)
+                        .to_bytes(2, "little")
+                        for index in range(0, len(bits), 16))
+
+    def test_aligned_block(self):
+        # literals 0..13, match at distance 14 (slot 8), matches of 257
+        # bytes at the same distance (slot 0), literals of 3 bits to test
+        # the position of the next match in the bit buffer, match of 100
+        # bytes at distance 262949 (slot 36: 53 bits), literal 5
+        far = 262142 + (100 << 3) + 7
+        for count in range(32):
+            symbols = [(byte,) for byte in range(14)]
+            symbols.append((327, 248, 0))
+            symbols.extend([(263, 248)] * 1023)
+            symbols.extend([(1,)] * count)
+            symbols.append((551, 91, 100, 7))
+            symbols.append((5,))
+            output = bytearray()
+            for symbol in symbols:
+                if symbol[0] < 256:
+                    output.append(symbol[0])
+                else:
+                    distance = {263: 14, 327: 14, 551: far}[symbol[0]]
+                    for index in range(symbol[1] + 9):
+                        output.append(output[-distance])
+            data = self.encodeAlignedBlock(symbols, output)
+            decompressor = LZXDecompressor(StringInputStream(data), 21,
+                                           output_size=len(output))
+            self.assertEqual(decompressor.decompress(), output)
+
+
+class TestJpegScan(unittest.TestCase):
+
+    def test_scan(self):
+        data = b"\x12\xff\x00\x34\xff\xd0\x56\xff\xd1\xff\xd9"
+        self.assertEqual(scanEntropyCodedData(StringInputStream(data), 8),
+                         (8 * 9, [8 * 4, 8 * 7]))
+        # truncated data
+        self.assertEqual(scanEntropyCodedData(StringInputStream(data), 0,
+                                              8 * 9),
+                         (None, [8 * 4, 8 * 7]))
+        # marker crossing the end of a block
+        data = bytes(SCAN_BLOCK_SIZE - 1) + b"\xff\xd3\xff\x00\xff\xc4"
+        self.assertEqual(scanEntropyCodedData(StringInputStream(data), 0),
+                         (8 * (SCAN_BLOCK_SIZE + 3),
+                          [8 * (SCAN_BLOCK_SIZE - 1)]))
+
+
+class TestParserManifest(unittest.TestCase):
+
+    def test_manifest(self):
+        # the manifest must be regenerated by tools/gen_parser_manifest.py
+        # when a parser is added or when parser tags are modified
+        self.assertEqual(createManifest(findParsers()), list(PARSERS))
+
+    def test_lazy_parser(self):
+        from hachoir.parser.image.png import PngFile
+        parser_list = HachoirParserList.getInstance()
+        png = parser_list.bytag["id"]["png"][0]
+        self.assertIsInstance(png, LazyParser)
+        self.assertEqual(png, PngFile)
+        self.assertIn(PngFile, parser_list.parser_list)
+        self.assertIs(png.load(), PngFile)
+        self.assertEqual(png.getParserTags(), PngFile.getParserTags())
+
+        parser = png(StringInputStream(b"\x89PNG\r\n\x1a\n" + b"\0" * 20),
+                     validate=False)
+        self.assertIsInstance(parser, PngFile)
+
+    def test_lazy_parser_doc(self):
+        from hachoir.parser.misc.pdf import PDFDocument
+        pdf = HachoirParserList.getInstance().bytag["id"]["pdf"][0]
+        self.assertEqual(pdf.__doc__, PDFDocument.__doc__)
+        self.assertIn("loaded on demand", LazyParser.__doc__)
+
+
 if __name__ == "__main__":
     setup_tests()
     unittest.main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Test hachoir.stream input streams.
+"""
+
+from hachoir.core.endian import BIG_ENDIAN, LITTLE_ENDIAN
+from hachoir.field.sub_file import CompressedStream
+from hachoir.parser.common.deflate import DeflateStream
+from hachoir.stream import (InputIOStream, InputStream, InputSubStream, MmapInputStream,
+                            ExtentStream, FileInputStream, StringInputStream,
+                            FileOutputStream, OutputStream)
+from hachoir.stream.input import InputCache, InputPipe, ReadStreamError
+from hachoir.test import setup_tests
+import io
+import os
+import tempfile
+import unittest
+import zlib
+
+DATA = bytes(range(256)) * 64
+
+
+class TestInputCache(unittest.TestCase):
+
+    def createStream(self, data=DATA, **kw):
+        stream = InputIOStream(io.BytesIO(data), source="<test>")
+        stream.cache = InputCache(stream._input, **kw)
+        return stream
+
+    def test_read(self):
+        stream = self.createStream(block_size=1000, block_count=4)
+        for address in (0, 999, 1000, 5000, len(DATA) - 3):
+            for size in (1, 2, 3, 999, 1000, 2500):
+                expected = DATA[address:address + size]
+                if len(expected) != size:
+                    continue
+                self.assertEqual(stream.readBytes(8 * address, size),
+                                 expected)
+
+    def test_read_bits(self):
+        stream = self.createStream(block_size=16, block_count=2)
+        # crosses the border of the first block
+        self.assertEqual(stream.readBits(8 * 15 + 4, 16, BIG_ENDIAN),
+                         0xF101)
+        self.assertEqual(stream.readBits(8 * 15 + 4, 16, LITTLE_ENDIAN),
+                         0x1100)
+        self.assertEqual(stream.readInteger(8 * 255, True, 8, BIG_ENDIAN),
+                         -1)
+
+    def test_lru(self):
+        stream = self.createStream(block_size=100, block_count=2)
+        cache = stream.cache
+        stream.readBytes(0, 4)
+        stream.readBytes(8 * 4, 4)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        stream.readBytes(8 * 100, 1)
+        stream.readBytes(8 * 200, 1)
+        self.assertEqual(list(cache.blocks), [1, 2])
+        stream.readBytes(8 * 100, 1)
+        self.assertEqual(list(cache.blocks), [2, 1])
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+    def test_end_of_file(self):
+        stream = self.createStream(b"abcdefghij", block_size=4)
+        self.assertEqual(stream.readBytes(8 * 6, 4), b"ghij")
+        self.assertRaises(ReadStreamError, stream.readBytes, 8 * 9, 2)
+
+    def test_disabled(self):
+        stream = InputIOStream(io.BytesIO(DATA), cache=False)
+        self.assertIsNone(stream.cache)
+        self.assertEqual(stream.readBytes(8 * 3, 2), DATA[3:5])
+
+
+class Pipe:
+    """
+    Non-seekable file object.
+    """
+
+    def __init__(self, data):
+        self.file = io.BytesIO(data)
+        self.read = self.file.read
+        self.close = self.file.close
+
+
+class TestInputPipe(unittest.TestCase):
+
+    def test_spill(self):
+        data = bytes(range(256)) * 2000 + b"end"
+        pipe = InputPipe(Pipe(data), max_memory=2 << 16)
+        stream = InputIOStream(pipe, source="<pipe>", size=8 * len(data))
+        self.assertEqual(stream.readBytes(8 * (len(data) - 3), 3), b"end")
+        self.assertEqual(len(pipe.blocks), 2)
+        self.assertEqual(pipe.spill_writes, pipe.count - 2)
+        # seek backward: read blocks from the temporary file
+        self.assertEqual(stream.readBytes(8 * 100, 70000), data[100:70100])
+        self.assertEqual(pipe.spill_reads, 2)
+        self.assertEqual(stream.readBytes(8 * 65000, 1000),
+                         data[65000:66000])
+        self.assertEqual(pipe.spill_reads, 2)
+        stream.close()
+
+    def test_size(self):
+        data = DATA + b"x"
+        stream = InputIOStream(Pipe(data), source="<pipe>")
+        self.assertIsInstance(stream._input, InputPipe)
+        self.assertIsNone(stream.size)
+        self.assertEqual(stream.readBytes(0, 3), DATA[:3])
+        self.assertFalse(stream.sizeGe(8 * (len(data) + 1)))
+        self.assertEqual(stream.size, 8 * len(data))
+        self.assertEqual(stream.readBytes(8 * len(DATA), 1), b"x")
+        stream.close()
+
+
+class TestCompressedStream(unittest.TestCase):
+
+    def test_seek(self):
+        data = b"".join(b"%08d" % index for index in range(40000))
+        compressed = StringInputStream(zlib.compress(data))
+        input = CompressedStream(compressed, DeflateStream,
+                                 checkpoint_interval=50000)
+        stream = InputIOStream(input, source="<compressed>")
+        self.assertIsNone(stream.size)
+        self.assertEqual(stream.readBytes(8 * 250000, 8), b"00031250")
+        self.assertEqual(input.checkpoint_positions[:2], [65536, 131072])
+        # seek backward: restart from the last checkpoint before address
+        self.assertEqual(stream.readBytes(8 * 140000, 16), data[140000:140016])
+        self.assertEqual(input.restarts, 1)
+        self.assertEqual(stream.readBytes(8 * 10, 5), data[10:15])
+        self.assertEqual(input.restarts, 2)
+        # end of the decompressed data
+        self.assertFalse(stream.sizeGe(8 * (len(data) + 1)))
+        self.assertEqual(stream.size, 8 * len(data))
+        self.assertEqual(stream.readBytes(8 * (len(data) - 8), 8),
+                         data[-8:])
+        stream.close()
+
+
+class TestReadInteger(unittest.TestCase):
+
+    def test_aligned(self):
+        stream = StringInputStream(b"\x81\x02\x03\x04\x05\x06\x07\xf8\x09")
+        for nbits in (8, 16, 24, 32, 40, 64):
+            for endian in (BIG_ENDIAN, LITTLE_ENDIAN):
+                data = stream.data[1:1 + nbits // 8]
+                byteorder = "big" if endian is BIG_ENDIAN else "little"
+                self.assertEqual(stream.readBits(8, nbits, endian),
+                                 int.from_bytes(data, byteorder))
+                for signed in (False, True):
+                    self.assertEqual(
+                        stream.readInteger(8, signed, nbits, endian),
+                        int.from_bytes(data, byteorder, signed=signed))
+
+    def test_unaligned(self):
+        stream = StringInputStream(b"\x81\x02\x03")
+        self.assertEqual(stream.readBits(4, 8, BIG_ENDIAN), 0x10)
+        self.assertEqual(stream.readBits(4, 8, LITTLE_ENDIAN), 0x28)
+        self.assertEqual(stream.readInteger(0, True, 4, BIG_ENDIAN), -8)
+        self.assertEqual(stream.readInteger(0, True, 12, LITTLE_ENDIAN), 0x281)
+
+    def test_truncated(self):
+        stream = InputIOStream(io.BytesIO(b"\x01\x02\x03"))
+        self.assertRaises(ReadStreamError,
+                          stream.readInteger, 8, False, 32, BIG_ENDIAN)
+
+
+class TestMmapInputStream(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(DATA + b"needle" + DATA)
+        self.addCleanup(os.unlink, self.filename)
+
+    def test_file_input_stream(self):
+        with FileInputStream(self.filename) as stream:
+            self.assertIsInstance(stream, MmapInputStream)
+            self.assertEqual(stream.size, 8 * (2 * len(DATA) + 6))
+            self.assertEqual(stream.readBytes(8 * 300, 3), DATA[300:303])
+            self.assertEqual(stream.readBits(8 * 300, 8, BIG_ENDIAN), 300 % 256)
+            self.assertRaises(ReadStreamError,
+                              stream.readBytes, stream.size - 8, 2)
+
+    def test_search(self):
+        with FileInputStream(self.filename) as stream:
+            address = 8 * len(DATA)
+            self.assertEqual(stream.searchBytes(b"needle"), address)
+            self.assertEqual(stream.searchBytes(b"needle", 8 * 100), address)
+            self.assertIsNone(stream.searchBytes(b"needle", address + 8))
+            self.assertIsNone(stream.searchBytes(b"needle", 0, address + 40))
+            self.assertEqual(stream.searchBytesLength(b"needle", True, 8 * 10),
+                             len(DATA) - 10 + 6)
+
+            sub = InputSubStream(stream, 8 * 1000, 8 * (len(DATA) - 1000))
+            self.assertIsNone(sub.searchBytes(b"needle"))
+            sub = InputSubStream(stream, 8 * 1000, 8 * len(DATA))
+            self.assertEqual(sub.searchBytes(b"needle"), address - 8 * 1000)
+            self.assertEqual(sub.searchBytes(b"\x00\x01"), 8 * (1024 - 1000))
+
+            self.assertEqual(stream.searchBytesBackward(b"needle"), address)
+            self.assertEqual(stream.searchBytesBackward(b"\x00\x01"),
+                             8 * (2 * len(DATA) + 6 - 256))
+            self.assertIsNone(
+                stream.searchBytesBackward(b"needle", 0, address + 40))
+            sub = InputSubStream(stream, 8 * 1000, 8 * len(DATA))
+            self.assertEqual(sub.searchBytesBackward(b"needle"),
+                             address - 8 * 1000)
+            self.assertEqual(sub.searchBytesBackward(b"\x00\x01"),
+                             8 * (len(DATA) + 6 + 3 * 256 - 1000))
+
+    def test_search_string(self):
+        stream = StringInputStream(b"abc" * 10 + b"xyz")
+        self.assertEqual(stream.searchBytes(b"xyz", 8), 8 * 30)
+        self.assertIsNone(stream.searchBytes(b"xyz", 0, 8 * 32))
+        self.assertEqual(stream.searchBytesBackward(b"abc", 0, 8 * 32), 8 * 27)
+        self.assertIsNone(stream.searchBytesBackward(b"xyz", 0, 8 * 32))
+
+    def test_search_backward(self):
+        # the needle crosses the border of the blocks read from the end
+        data = b"needle" + bytes(70000) + b"needle" + bytes(65534)
+        stream = InputIOStream(io.BytesIO(data), source="<test>")
+        address = 8 * (len(data) - 65540)
+        self.assertEqual(stream.searchBytesBackward(b"needle"), address)
+        self.assertEqual(stream.searchBytesBackward(b"needle", 0, address), 0)
+        self.assertIsNone(stream.searchBytesBackward(b"needle", 8, address))
+        self.assertIsNone(stream.searchBytesBackward(b"\x01"))
+        self.assertEqual(InputStream.searchBytesBackward(stream, b"\0needle"),
+                         address - 8)
+
+
+class TestCopyBytes(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(DATA)
+        self.addCleanup(os.unlink, self.filename)
+        fd, self.output = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.unlink, self.output)
+
+    def copy(self, stream, address, size):
+        with FileOutputStream(self.output) as output:
+            output.writeBytes(b"head")
+            output.copyBytesFrom(stream, 8 * address, size)
+            output.writeBytes(b"tail")
+        with open(self.output, "rb") as fp:
+            return fp.read()
+
+    def test_file(self):
+        expected = b"head" + DATA[100:5100] + b"tail"
+        with FileInputStream(self.filename) as stream:
+            self.assertIsNotNone(stream.fileOffset(8 * 100))
+            self.assertEqual(self.copy(stream, 100, 5000), expected)
+        with open(self.filename, "rb") as fp:
+            stream = InputIOStream(fp, source="<test>")
+            self.assertEqual(stream.fileOffset(8 * 100), (fp, 100))
+            self.assertEqual(self.copy(stream, 100, 5000), expected)
+            sub = InputSubStream(stream, 8 * 50)
+            self.assertEqual(sub.fileOffset(8 * 50), (fp, 100))
+            self.assertEqual(self.copy(sub, 50, 5000), expected)
+            self.assertRaises(ReadStreamError,
+                              self.copy, stream, 100, len(DATA))
+
+    def test_buffer(self):
+        stream = StringInputStream(DATA)
+        self.assertIsNone(stream.fileOffset(0))
+        self.assertEqual(self.copy(stream, 100, 5000),
+                         b"head" + DATA[100:5100] + b"tail")
+        output = OutputStream(io.BytesIO())
+        with FileInputStream(self.filename) as stream:
+            output.copyBytesFrom(stream, 8, 3)
+        self.assertEqual(output._output.getvalue(), DATA[1:4])
+
+
+class TestExtentStream(unittest.TestCase):
+
+    def test_read(self):
+        parent = StringInputStream(DATA)
+        extents = [(8 * 100, 8 * 10), (None, 8 * 5), (8 * 10, 8 * 20)]
+        stream = ExtentStream(parent, extents)
+        expected = DATA[100:110] + bytes(5) + DATA[10:30]
+        self.assertEqual(stream.size, 8 * len(expected))
+        self.assertEqual(stream.readBytes(0, len(expected)), expected)
+        self.assertEqual(stream.readBytes(8 * 8, 10), expected[8:18])
+        self.assertEqual(stream.readBits(8 * 9, 16, BIG_ENDIAN),
+                         int.from_bytes(expected[9:11], "big"))
+        self.assertEqual(stream.getExtents(8 * 8, 8 * 10),
+                         [(8 * 108, 8 * 2), (None, 8 * 5), (8 * 10, 8 * 3)])
+        self.assertRaises(ReadStreamError, stream.readBytes, 8 * 30, 10)
+
+
+if __name__ == "__main__":
+    setup_tests()
+    unittest.main()
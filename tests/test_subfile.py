@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test hachoir-subfile.
+"""
+
+from hachoir.stream import FileInputStream, StringInputStream
+from hachoir.subfile.pattern import HachoirPatternMatching
+from hachoir.subfile.search import SearchSubfile
+from hachoir.test import setup_tests
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+DATADIR = os.path.join(os.path.dirname(__file__), 'files')
+
+
+def readFile(filename):
+    with open(os.path.join(DATADIR, filename), 'rb') as fp:
+        return fp.read()
+
+
+class TestPatternMatching(unittest.TestCase):
+
+    def search(self, patterns, data, end=None):
+        return [(parser.PARSER_TAGS["id"], address // 8)
+                for parser, address in patterns.search(data, end)]
+
+    def test_magic(self):
+        patterns = HachoirPatternMatching(
+            parser_ids=("png", "gif", "riff", "mov"))
+        data = b"xxGIF89a....\x89PNG\r\n\x1a\nRIFF....WAVEfmt "
+        self.assertEqual(self.search(patterns, data),
+                         [("gif", 2), ("png", 12), ("riff", 20)])
+        # only magics starting before end are reported
+        self.assertEqual(self.search(patterns, data, 12),
+                         [("gif", 2)])
+        # negative address: magic at an offset in the file
+        self.assertEqual(self.search(patterns, b"..ftyp"),
+                         [("mov", -2)])
+
+    def test_shared_magic(self):
+        patterns = HachoirPatternMatching(parser_ids=("git_pack", "prs_pak"))
+        self.assertEqual(sorted(self.search(patterns, b"abPACK")),
+                         [("git_pack", 2), ("prs_pak", 2)])
+
+    def test_regex(self):
+        patterns = HachoirPatternMatching(parser_ids=("gzip", "exe"))
+        gzip = readFile("test.txt.gz")
+        self.assertEqual(self.search(patterns, b"ab" + gzip),
+                         [("gzip", 2)])
+
+
+class TestSearchSubfile(unittest.TestCase):
+
+    def test_search(self):
+        png = readFile("png_331x90x8_truncated.png")
+        data = b"\0" * 1000 + png + b"\0" * 70000 + b"GIF89a"
+        subfile = SearchSubfile(StringInputStream(data))
+        subfile.verbose = False
+        # magic crossing the end of the first slice
+        subfile.slice_size = 8 * (1000 + 4)
+        subfile.loadParsers(parser_ids=("png", "gif"))
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), \
+                contextlib.redirect_stderr(io.StringIO()):
+            subfile.mainHeader()
+            subfile.searchSubfiles()
+        self.assertEqual(stdout.getvalue().splitlines(),
+                         ["[+] File at 1000: PNG picture: 331x90x32 "
+                          "(alpha layer)"])
+
+    def test_parallel(self):
+        png = readFile("png_331x90x8_truncated.png")
+        gif = readFile("india_map.gif")
+        data = b"\0" * 1000 + png + b"\0" * 70000 + gif + b"GIF89a"
+        with tempfile.NamedTemporaryFile() as fp:
+            fp.write(data)
+            fp.flush()
+            results = []
+            for jobs in (1, 2):
+                stream = FileInputStream(fp.name)
+                subfile = SearchSubfile(stream)
+                subfile.verbose = False
+                subfile.slice_size = 8 * 4096
+                subfile.jobs = jobs
+                subfile.filename = fp.name
+                subfile.loadParsers(parser_ids=("png", "gif"))
+                stdout = io.StringIO()
+                with contextlib.redirect_stdout(stdout), \
+                        contextlib.redirect_stderr(io.StringIO()):
+                    subfile.mainHeader()
+                    subfile.searchSubfiles()
+                stream.close()
+                results.append(stdout.getvalue().splitlines())
+        self.assertEqual(len(results[0]), 2)
+        self.assertEqual(results[0], results[1])
+
+
+if __name__ == "__main__":
+    setup_tests()
+    unittest.main()
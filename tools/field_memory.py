@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: parse files, create all fields with their value and
+display, and report the memory used per field.
+"""
+from hachoir.parser import createParser
+from hachoir.core import config
+from sys import argv, stderr, exit
+import gc
+import tracemalloc
+
+
+def createAllFields(fieldset):
+    count = 0
+    for field in fieldset:
+        count += 1
+        if field.is_field_set:
+            count += createAllFields(field)
+        else:
+            field.value
+            field.display
+    return count
+
+
+def measure(filename):
+    parser = createParser(filename)
+    if not parser:
+        raise ValueError("Unable to parse %s" % filename)
+    with parser:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            count = createAllFields(parser)
+            gc.collect()
+            size = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+    return count, size
+
+
+def main():
+    if len(argv) < 2:
+        print("usage: %s filename [filename2 ...]" % argv[0], file=stderr)
+        exit(1)
+    config.quiet = True
+    total_count = total_size = 0
+    for filename in argv[1:]:
+        count, size = measure(filename)
+        print("%s: %s fields, %.0f bytes/field"
+              % (filename, count, float(size) / count))
+        total_count += count
+        total_size += size
+    print("Total: %s fields, %.0f bytes/field"
+          % (total_count, float(total_size) / total_count))
+    exit(0)
+
+
+if __name__ == "__main__":
+    main()
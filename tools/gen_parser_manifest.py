@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Generate hachoir/parser/manifest.py: the list of parsers with their tags.
+
+Run it after adding a parser or changing parser tags.
+"""
+from hachoir.parser.parser_list import writeManifest
+import os
+
+FILENAME = os.path.join(os.path.dirname(__file__), "..",
+                        "hachoir", "parser", "manifest.py")
+
+
+def main():
+    with open(FILENAME, "w") as out:
+        writeManifest(out)
+    print("Manifest written into %s" % os.path.normpath(FILENAME))
+
+
+if __name__ == "__main__":
+    main()
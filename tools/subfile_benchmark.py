@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Benchmark the magic search of hachoir-subfile: search the magics of all
+parsers in files, by slices of 64 KB, and display the throughput in MB/s.
+Parsers are not validated.
+"""
+from hachoir.subfile.pattern import HachoirPatternMatching
+from hachoir.subfile.search import SLICE_SIZE
+from sys import argv, stderr, exit
+from time import perf_counter
+
+
+def benchmark(patterns, data):
+    count = 0
+    overlap = patterns.max_length - 1
+    start_time = perf_counter()
+    for start in range(0, len(data), SLICE_SIZE):
+        chunk = data[start:start + SLICE_SIZE + overlap]
+        for item in patterns.search(chunk, SLICE_SIZE):
+            count += 1
+    return count, perf_counter() - start_time
+
+
+def main():
+    if len(argv) < 2:
+        print("usage: %s filename [filename2 ...]" % argv[0], file=stderr)
+        exit(1)
+    start_time = perf_counter()
+    patterns = HachoirPatternMatching()
+    print("Patterns: %s (%.1f ms)"
+          % (patterns, (perf_counter() - start_time) * 1000))
+    total_size = total_duration = 0
+    for filename in argv[1:]:
+        with open(filename, "rb") as fp:
+            data = fp.read()
+        count, duration = benchmark(patterns, data)
+        print("%s: %s magics, %.1f MB/s"
+              % (filename, count, len(data) / duration / 1e6))
+        total_size += len(data)
+        total_duration += duration
+    print("Total: %.1f MB/s" % (total_size / total_duration / 1e6))
+    exit(0)
+
+
+if __name__ == "__main__":
+    main()